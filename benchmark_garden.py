@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Knowledge Garden Benchmarks
+
+Load-tests the garden write path, autonomous exploration, hybrid retrieval,
+graph construction and the Flask routes against the deterministic fake LLM backend, so no network or API
+key is needed. Every run works on a fresh temporary garden.
+
+Example:
+    python benchmark_garden.py --notes 2000 --iterations 20 --latency uniform:0.05,0.2
+"""
+
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import hashlib
+import statistics
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import knowledge_garden
+from knowledge_garden import KnowledgeGarden, KnowledgeGardenAgent
+from llm_backends import create_client
+from llm_gateway import get_gateway
+from vector_index import get_embedder
+
+
+def summarize_timings(timings):
+    """Summarize a list of durations in seconds"""
+    if not timings:
+        return {}
+    ordered = sorted(timings)
+    return {
+        "count": len(ordered),
+        "total_s": round(sum(ordered), 4),
+        "mean_ms": round(statistics.mean(ordered) * 1000, 3),
+        "p50_ms": round(ordered[len(ordered) // 2] * 1000, 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3)
+    }
+
+
+def make_garden(args, garden_dir):
+    """Create a garden and agent wired to a fresh fake client"""
+    knowledge_garden.client = create_client("fake", latency=args.latency, error_rate=args.error_rate)
+    get_gateway(knowledge_garden.client, requests_per_minute=args.requests_per_minute,
+                tokens_per_minute=args.tokens_per_minute)
+    garden = KnowledgeGarden(garden_dir)
+    garden.load_index()
+    return garden, KnowledgeGardenAgent(garden)
+
+
+def populate_garden(garden, count, seed=0, batch_size=500):
+    """Fill a garden with synthetic, interlinked notes, saving the index once per batch"""
+    import random
+    rng = random.Random(seed)
+    titles = []
+    batch = []
+    for i in range(count):
+        related = rng.sample(titles, min(len(titles), rng.randint(0, 3)))
+        title = f"Synthetic Note {i}"
+        batch.append({"title": title, "content": f"Body of note {i} about topic {i % 37} and theme {i % 11}.",
+                      "tags": [f"topic-{i % 37}", f"theme-{i % 11}"], "related_notes": related})
+        titles.append(title)
+        if len(batch) == batch_size:
+            garden.add_notes(batch)
+            batch = []
+    if batch:
+        garden.add_notes(batch)
+    return titles
+
+
+def hashed_embeddings(texts, dim=384):
+    """Deterministic bag-of-words embeddings, used when sentence-transformers is not installed"""
+    vectors = np.zeros((len(texts), dim), dtype=np.float32)
+    for i, text in enumerate(texts):
+        for word in text.lower().split():
+            vectors[i, int(hashlib.md5(word.encode()).hexdigest()[:8], 16) % dim] += 1.0
+    return vectors
+
+
+def bench_write_path(args, garden_dir):
+    """Time add_note on a growing garden"""
+    garden, _ = make_garden(args, garden_dir)
+    timings = []
+    for i in range(args.notes):
+        related = [f"Write Note {i - 1}"] if i else []
+        start = time.perf_counter()
+        garden.add_note(f"Write Note {i}", f"Benchmark body {i}", tags=[f"tag-{i % 25}"], related_notes=related)
+        timings.append(time.perf_counter() - start)
+    result = summarize_timings(timings)
+    result["notes_per_s"] = round(len(timings) / sum(timings), 1)
+    return result
+
+
+def bench_exploration(args, garden_dir):
+    """Time autonomous exploration end to end"""
+    garden, agent = make_garden(args, garden_dir)
+    start = time.perf_counter()
+    agent.autonomous_exploration("distributed knowledge networks", iterations=args.iterations,
+                                 exploration_type=args.exploration_type)
+    elapsed = time.perf_counter() - start
+    notes = len(garden.index["notes"])
+    return {
+        "iterations": args.iterations,
+        "elapsed_s": round(elapsed, 3),
+        "iterations_per_s": round(args.iterations / elapsed, 2),
+        "notes_created": notes,
+        "notes_per_s": round(notes / elapsed, 2),
+        "llm": agent.gateway.get_metrics()
+    }
+
+
+def bench_retrieval(args, garden_dir):
+    """Time hybrid_search (BM25 + semantic + personalized PageRank) on a pre-populated garden"""
+    import random
+    garden, _ = make_garden(args, garden_dir)
+    populate_garden(garden, args.notes)
+
+    start = time.perf_counter()
+    garden.build_lexical_index()
+    garden.build_graph_index()
+    garden.build_vector_index(embed=get_embedder() or hashed_embeddings).flush()
+    garden.hybrid_search("warm up the approximate and champion indexes")
+    build_s = time.perf_counter() - start
+
+    rng = random.Random(1)
+    timings = []
+    for _ in range(args.requests):
+        query = f"how does topic {rng.randrange(37)} relate to theme {rng.randrange(11)} in note {rng.randrange(args.notes)}"
+        start = time.perf_counter()
+        garden.hybrid_search(query, limit=5)
+        timings.append(time.perf_counter() - start)
+
+    result = summarize_timings(timings)
+    result["notes"] = len(garden.index["notes"])
+    result["index_build_s"] = round(build_s, 3)
+    return result
+
+
+def legacy_path_links(graph, paths):
+    """Path-to-note links computed the way build_graph used to: every path against every note"""
+    links = set()
+    for topic, path_data in paths.items():
+        for note in graph.nodes():
+            if graph.nodes[note].get("type") == "note":
+                note_tags = graph.nodes[note].get("tags", [])
+                if (topic.lower() in note_tags or
+                    topic.lower() in note.lower() or
+                    any(subtopic.lower() in note.lower() for subtopic in path_data.get("subtopics", []))):
+                    links.add((f"path:{topic}", note))
+    return links
+
+
+def bench_graph(args, garden_dir):
+    """Time path-to-note linking in build_graph against the previous per-path loop"""
+    import random
+    from knowledge_graph_analysis import KnowledgeGraphAnalyzer
+    from path_matcher import PathMatcher
+
+    garden, _ = make_garden(args, garden_dir)
+    populate_garden(garden, args.notes)
+    rng = random.Random(2)
+    for i in range(args.paths):
+        # Some topics are tags, and some subtopics occur in note titles
+        topic = f"topic-{i % 37}" if i % 4 == 0 else f"Exploration {i}"
+        subtopics = [f"Note {rng.randrange(args.notes)}" for _ in range(3)] + [f"concept {i}", f"theme {i}x"]
+        garden.create_exploration_path(topic, subtopics)
+    paths = garden.index["paths"]
+
+    start = time.perf_counter()
+    analyzer = KnowledgeGraphAnalyzer(garden_dir, use_snapshot=False)
+    build_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matcher = PathMatcher({topic: data.get("subtopics", []) for topic, data in paths.items()})
+    indexed = set()
+    for note, attrs in analyzer.graph.nodes(data=True):
+        if attrs.get("type") == "note":
+            indexed.update((f"path:{topic}", note) for topic in matcher.match(note, attrs.get("tags", [])))
+    indexed_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    legacy = legacy_path_links(analyzer.graph, paths)
+    legacy_s = time.perf_counter() - start
+
+    return {
+        "notes": args.notes,
+        "paths": len(paths),
+        "path_links": len(indexed),
+        "links_match": indexed == legacy,
+        "build_graph_s": round(build_s, 3),
+        "indexed_linking_s": round(indexed_s, 4),
+        "legacy_linking_s": round(legacy_s, 4),
+        "speedup": round(legacy_s / indexed_s, 1) if indexed_s else None
+    }
+
+
+def bench_routes(args, garden_dir):
+    """Hit the Flask routes concurrently through the test client"""
+    import knowledge_garden_interface as interface
+
+    garden, agent = make_garden(args, garden_dir)
+    populate_garden(garden, args.notes)
+    interface.garden = garden
+    interface.agent = agent
+    interface.app.config["TESTING"] = True
+
+    requests = [
+        ("POST", "/preview_query", {"query": "topic 3 and theme 7", "query_type": "direct"}),
+        ("POST", "/query", {"query": "how does topic 5 relate to theme 2", "query_type": "direct"}),
+        ("POST", "/query", {"query": "connect topic 8 with theme 4", "query_type": "connect", "reasoning_depth": "2"})
+    ]
+    timings = {path + (f" [{data['query_type']}]" if data else ""): [] for _, path, data in requests}
+    lock = threading.Lock()
+
+    def worker(n):
+        client = interface.app.test_client()
+        for method, path, data in requests:
+            start = time.perf_counter()
+            response = client.get(path) if method == "GET" else client.post(path, data=data)
+            elapsed = time.perf_counter() - start
+            assert response.status_code < 500, f"{path} returned {response.status_code}"
+            with lock:
+                timings[path + (f" [{data['query_type']}]" if data else "")].append(elapsed)
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(worker, range(args.requests)))
+
+    return {route: summarize_timings(t) for route, t in timings.items()}
+
+
+BENCHMARKS = {
+    "write": bench_write_path,
+    "explore": bench_exploration,
+    "retrieval": bench_retrieval,
+    "graph": bench_graph,
+    "routes": bench_routes
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the knowledge garden with a fake LLM backend")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="Benchmarks to run (default: all)")
+    parser.add_argument("--notes", type=int, default=500, help="Number of notes to write / pre-populate")
+    parser.add_argument("--paths", type=int, default=200, help="Exploration paths for the graph benchmark")
+    parser.add_argument("--iterations", type=int, default=10, help="Exploration iterations")
+    parser.add_argument("--exploration-type", default="breadth", help="Exploration strategy to benchmark")
+    parser.add_argument("--requests", type=int, default=20, help="Route benchmark rounds / retrieval queries")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent route clients")
+    parser.add_argument("--latency", default="fixed:0", help="Fake LLM latency, e.g. fixed:0.1, uniform:0.05,0.3, lognormal:-2,0.5")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of fake LLM calls that fail with a 429")
+    parser.add_argument("--requests-per-minute", type=int, default=10**6, help="Gateway request limit (default: effectively unlimited)")
+    parser.add_argument("--tokens-per-minute", type=int, default=10**9, help="Gateway token limit (default: effectively unlimited)")
+    parser.add_argument("--output", type=str, help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.only or BENCHMARKS:
+        garden_dir = tempfile.mkdtemp(prefix=f"garden_bench_{name}_")
+        try:
+            print(f"Running {name} benchmark...")
+            results[name] = BENCHMARKS[name](args, garden_dir)
+        finally:
+            shutil.rmtree(garden_dir, ignore_errors=True)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import os
+import re
+import json
+import time
+import threading
+from pathlib import Path
+
+# Kinds of events in the change feed
+NOTE_ADDED = "note_added"
+TAG_ADDED = "tag_added"
+RELATION_ADDED = "relation_added"
+PATH_ADDED = "path_added"
+
+SEGMENT_PATTERN = re.compile(r"^(\d+)\.jsonl$")
+
+# The writer starts a new segment once the current one reaches this size
+SEGMENT_MAX_BYTES = 8 * 1024 * 1024
+
+# Appends between the writer's checks for a full segment
+ROTATION_CHECK_APPENDS = 256
+
+# A consumer that has not checkpointed for this long no longer holds back old segments (it rebuilds instead)
+CONSUMER_TIMEOUT = 7 * 24 * 3600
+
+
+class ChangeFeed:
+    """Append-only log of garden mutations, one JSON event per line
+
+    KnowledgeGarden appends an event for every note, tag, relation and
+    exploration path it adds. Consumers in any process read the events after
+    the position (generation, byte offset) they last processed, so they can
+    apply deltas to derived state (such as the analyzer's graph) instead of
+    rebuilding it from the index. Subscribers in the writing process are also
+    called directly.
+
+    The log is split into numbered segment files. The writer starts a new
+    segment once the current one reaches SEGMENT_MAX_BYTES, checking every
+    ROTATION_CHECK_APPENDS appends. Consumers checkpoint the generation they
+    have persisted their state at, and segments older than every registered
+    consumer's checkpoint are deleted, so the log stays bounded whether or not
+    a consumer is running. A consumer whose position falls in a deleted
+    segment has to rebuild from the index. Each garden has one writing process.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.lock = threading.Lock()
+        self.subscribers = []
+        self._file = None
+        self._generation = None
+        self._appends = 0
+
+    def _segment_path(self, generation):
+        return self.directory / f"{generation:08d}.jsonl"
+
+    def _segment_size(self, generation):
+        try:
+            return os.path.getsize(self._segment_path(generation))
+        except OSError:
+            return None
+
+    def generations(self):
+        """Generations of the segments on disk, oldest first"""
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        return sorted(int(match.group(1)) for match in map(SEGMENT_PATTERN.match, names) if match)
+
+    def subscribe(self, callback):
+        """Call callback(event) for every event appended from now on in this process"""
+        self.subscribers.append(callback)
+
+    def append(self, kind, **payload):
+        """Record an event"""
+        event = {"event": kind, **payload}
+        line = json.dumps(event) + "\n"
+        with self.lock:
+            if self._file is None:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                self._generation = max(self.generations(), default=1)
+                self._file = open(self._segment_path(self._generation), "a")
+            elif self._appends >= ROTATION_CHECK_APPENDS:
+                self._appends = 0
+                if self._file.tell() >= SEGMENT_MAX_BYTES:
+                    self._file.close()
+                    self._generation += 1
+                    self._file = open(self._segment_path(self._generation), "a")
+                    self.compact()
+            self._file.write(line)
+            self._file.flush()
+            self._appends += 1
+        for callback in self.subscribers:
+            callback(event)
+
+    def position(self):
+        """Current end of the log, as a (generation, byte offset) position"""
+        generation = max(self.generations(), default=1)
+        return generation, self._segment_size(generation) or 0
+
+    def covers(self, generation, offset):
+        """Whether the log still holds every event after a position"""
+        size = self._segment_size(generation)
+        if size is None:
+            # Nothing was ever written at or after a missing segment that is not older than the log
+            return offset == 0 and generation >= max(self.generations(), default=1)
+        return offset <= size
+
+    def read(self, generation, offset=0):
+        """Read the complete events after a position, following the log into newer segments
+
+        Returns:
+            The events and the (generation, offset) position to continue reading from
+        """
+        events = []
+        while True:
+            # The writer only starts a segment once it is done with the previous one
+            finished = bool(self._segment_size(generation + 1))
+            try:
+                with open(self._segment_path(generation), "rb") as f:
+                    f.seek(offset)
+                    data = f.read()
+            except OSError:
+                data = b""
+
+            # A line still being written is left for the next read; the last line of a finished
+            # segment was cut short by a crash and will never complete
+            end = data.rfind(b"\n") + 1
+            events.extend(json.loads(line) for line in data[:end].splitlines() if line.strip())
+            if not finished:
+                return events, (generation, offset + end)
+            generation, offset = generation + 1, 0
+
+    def checkpoint(self, consumer, generation):
+        """Record that a consumer has persisted its state at a position in `generation`
+
+        Events before that segment are no longer needed by the consumer, and
+        segments no registered consumer needs are deleted.
+        """
+        consumers_dir = self.directory / "consumers"
+        consumers_dir.mkdir(parents=True, exist_ok=True)
+        path = consumers_dir / f"{consumer}.json"
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"generation": generation}, f)
+        os.replace(tmp_path, path)
+        self.compact()
+
+    def compact(self):
+        """Delete the segments older than every registered consumer's checkpoint"""
+        generations = self.generations()
+        if len(generations) < 2:
+            return
+        needed = generations[-1]
+        now = time.time()
+        for path in (self.directory / "consumers").glob("*.json"):
+            try:
+                if now - path.stat().st_mtime > CONSUMER_TIMEOUT:
+                    continue
+                with open(path) as f:
+                    needed = min(needed, json.load(f)["generation"])
+            except (OSError, ValueError, KeyError):
+                continue
+        for old in generations:
+            if old >= needed:
+                break
+            try:
+                os.remove(self._segment_path(old))
+            except OSError:
+                pass
+
+    def close(self):
+        with self.lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,149 @@
+from knowledge_garden import count_tokens
+
+# Tokens charged for an image part of a message (low detail)
+IMAGE_TOKENS = 85
+
+# Longest excerpt of a single message passed to the summarizer
+MAX_EXCERPT_CHARS = 8000
+
+
+def message_tokens(message):
+    """Count the tokens of a chat message, including tool call arguments and images"""
+    content = message.get("content") if isinstance(message, dict) else getattr(message, "content", None)
+    tokens = 4  # Per-message overhead
+    if isinstance(content, str):
+        tokens += count_tokens(content)
+    elif isinstance(content, list):
+        for part in content:
+            if isinstance(part, dict) and part.get("type") == "text":
+                tokens += count_tokens(part.get("text", ""))
+            else:
+                tokens += IMAGE_TOKENS
+    tool_calls = message.get("tool_calls") if isinstance(message, dict) else getattr(message, "tool_calls", None)
+    for call in tool_calls or []:
+        function = call.get("function") if isinstance(call, dict) else getattr(call, "function", None)
+        arguments = function.get("arguments") if isinstance(function, dict) else getattr(function, "arguments", "")
+        tokens += count_tokens(arguments or "")
+    return tokens
+
+
+def messages_tokens(messages):
+    return sum(message_tokens(m) for m in messages)
+
+
+def _message_text(message):
+    content = message.get("content")
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+class ConversationCompactor:
+    """Keeps the history of an iterative reasoning loop under a token threshold
+
+    The first two messages (the system context and the original question) are
+    always kept. Once the rest of the history exceeds `token_threshold`, every
+    round except the last `keep_recent_rounds` is folded into a rolling
+    summary, so each round's prompt stays bounded instead of growing with the
+    number of rounds. The compactor also tallies what the query would have
+    sent without compaction, so the savings can be reported.
+    """
+
+    SUMMARY_PREFIX = "Summary of my reasoning so far:\n"
+
+    def __init__(self, gateway, token_threshold=4000, keep_recent_rounds=1, summary_tokens=500,
+                 summary_model="gpt-4o-mini"):
+        self.gateway = gateway
+        self.token_threshold = token_threshold
+        self.keep_recent_rounds = keep_recent_rounds
+        self.summary_tokens = summary_tokens
+        self.summary_model = summary_model
+
+        self.summary = None
+        self.rounds = 0
+        self.compactions = 0
+        self.prompt_tokens = 0
+        self.uncompacted_prompt_tokens = 0
+        self.summarizer_tokens = 0
+        self.removed_tokens = 0  # Tokens of original messages replaced by the summary
+
+    def _is_summary(self, message):
+        return message.get("role") == "assistant" and isinstance(message.get("content"), str) \
+            and message["content"].startswith(self.SUMMARY_PREFIX)
+
+    def compact(self, messages):
+        """Return the messages to send next, summarizing older rounds if the history is too long"""
+        head, history = messages[:2], messages[2:]
+        if messages_tokens(history) <= self.token_threshold:
+            return messages
+
+        # Rounds start at user messages; keep the pending one and the most recent complete rounds
+        user_positions = [i for i, m in enumerate(history) if m.get("role") == "user"]
+        if len(user_positions) <= self.keep_recent_rounds:
+            return messages
+        keep_from = user_positions[-(self.keep_recent_rounds + 1)]
+        older, recent = history[:keep_from], history[keep_from:]
+        if not older or (len(older) == 1 and self._is_summary(older[0])):
+            return messages
+
+        previous = [m for m in older if self._is_summary(m)]
+        self.removed_tokens += messages_tokens(m for m in older if not self._is_summary(m))
+        self.summary = self._summarize(previous[-1]["content"][len(self.SUMMARY_PREFIX):] if previous else None,
+                                       [m for m in older if not self._is_summary(m)])
+        self.compactions += 1
+
+        summary_message = {"role": "assistant", "content": self.SUMMARY_PREFIX + self.summary}
+        return head + [summary_message] + recent
+
+    def _summarize(self, previous_summary, messages):
+        """Fold older rounds into the rolling summary"""
+        transcript = []
+        for message in messages:
+            text = _message_text(message)
+            if text:
+                transcript.append(f"[{message.get('role')}] {text[:MAX_EXCERPT_CHARS]}")
+
+        prompt = "Update the summary of an ongoing reasoning session with the new turns below. " \
+                 f"Keep every concrete conclusion, connection and open question, and keep note titles verbatim. " \
+                 f"Answer with concise bullet points, at most {self.summary_tokens * 3 // 4} words.\n\n"
+        if previous_summary:
+            prompt += f"Current summary:\n{previous_summary}\n\n"
+        prompt += "New turns:\n" + "\n\n".join(transcript)
+
+        response = self.gateway.chat_completion(
+            model=self.summary_model,
+            messages=[
+                {"role": "system", "content": "You compress reasoning transcripts without losing conclusions."},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=self.summary_tokens
+        )
+        summary = response.choices[0].message.content or ""
+
+        usage = getattr(response, "usage", None)
+        if usage is not None and getattr(usage, "total_tokens", None):
+            self.summarizer_tokens += usage.total_tokens
+        else:
+            self.summarizer_tokens += count_tokens(prompt) + count_tokens(summary)
+        return summary
+
+    def record_round(self, messages):
+        """Account for a round about to be sent with these messages"""
+        sent = messages_tokens(messages)
+        summary_tokens = sum(message_tokens(m) for m in messages[2:] if self._is_summary(m))
+        self.rounds += 1
+        self.prompt_tokens += sent
+        self.uncompacted_prompt_tokens += sent - summary_tokens + self.removed_tokens
+
+    def report(self):
+        """Token savings of this query"""
+        saved = self.uncompacted_prompt_tokens - self.prompt_tokens - self.summarizer_tokens
+        return {
+            "rounds": self.rounds,
+            "compactions": self.compactions,
+            "prompt_tokens": self.prompt_tokens,
+            "uncompacted_prompt_tokens": self.uncompacted_prompt_tokens,
+            "summarizer_tokens": self.summarizer_tokens,
+            "saved_tokens": saved,
+            "saved_ratio": round(saved / self.uncompacted_prompt_tokens, 3) if self.uncompacted_prompt_tokens else 0.0
+        }
@@ -0,0 +1,389 @@
+import datetime
+
+import numpy as np
+
+try:
+    from scipy import sparse
+    from scipy.sparse import csgraph
+except ImportError:  # Optional: the analyzer falls back to NetworkX without it
+    sparse = None
+    csgraph = None
+
+# Integer codes of the node and edge types in the attribute arrays (-1 for anything else)
+NODE_TYPES = ("note", "tag", "path")
+EDGE_TYPES = ("related", "tagged", "path")
+
+# Sources per block of breadth-first searches, bounding the distance matrix held in memory
+BFS_BLOCK_SOURCES = 64
+
+
+def available():
+    """Whether SciPy is installed, so the CSR engine can be used"""
+    return sparse is not None
+
+
+def _type_code(types, value):
+    try:
+        return types.index(value)
+    except ValueError:
+        return -1
+
+
+def _creation_day(created):
+    try:
+        return datetime.datetime.fromisoformat(created).toordinal()
+    except (TypeError, ValueError):
+        return -1
+
+
+class CSRGraph:
+    """Immutable array-backed snapshot of an undirected graph
+
+    Nodes get integer IDs in `nodes` order; adjacency is a symmetric CSR
+    matrix (`indptr`/`indices`), and node and edge attributes live in typed
+    arrays aligned with it (`node_type`, `created_day`, `edge_type`). Graph
+    kernels are SciPy csgraph routines or sparse matrix products over whole
+    frontiers, instead of Python loops over dict-of-dict adjacency. Self-loops
+    are dropped.
+    """
+
+    def __init__(self, nodes, adjacency, node_type, created_day):
+        self.nodes = nodes
+        self.index = {node: i for i, node in enumerate(nodes)}
+        self.adjacency = adjacency  # scipy CSR matrix, data = edge type code + 2
+        self.indptr = adjacency.indptr
+        self.indices = adjacency.indices
+        self.edge_type = (adjacency.data - 2).astype(np.int8)
+        self.binary = sparse.csr_matrix((np.ones(len(self.indices), dtype=np.int32), self.indices, self.indptr),
+                                        shape=adjacency.shape)
+        self.node_type = node_type
+        self.created_day = created_day
+        self.degrees = np.diff(self.indptr)
+
+    @classmethod
+    def from_networkx(cls, graph):
+        """Convert a NetworkX graph built by KnowledgeGraphAnalyzer"""
+        nodes = list(graph.nodes())
+        index = {node: i for i, node in enumerate(nodes)}
+        node_type = np.fromiter((_type_code(NODE_TYPES, attrs.get("type")) for _, attrs in graph.nodes(data=True)),
+                                dtype=np.int8, count=len(nodes))
+        created_day = np.fromiter((_creation_day(attrs.get("created")) for _, attrs in graph.nodes(data=True)),
+                                  dtype=np.int32, count=len(nodes))
+
+        edges = [(index[u], index[v], _type_code(EDGE_TYPES, edge_type) + 2)
+                 for u, v, edge_type in graph.edges(data="type") if u != v]
+        if edges:
+            rows, cols, codes = (np.array(column) for column in zip(*edges))
+        else:
+            rows = cols = codes = np.empty(0, dtype=np.int64)
+        # Edge type codes are stored shifted by two, so that no stored entry is zero
+        adjacency = sparse.csr_matrix(
+            (np.concatenate([codes, codes]).astype(np.int8), (np.concatenate([rows, cols]), np.concatenate([cols, rows]))),
+            shape=(len(nodes), len(nodes)))
+        adjacency.sort_indices()
+        return cls(nodes, adjacency, node_type, created_day)
+
+    def number_of_nodes(self):
+        return len(self.nodes)
+
+    def number_of_edges(self):
+        return len(self.indices) // 2
+
+    def density(self):
+        n = len(self.nodes)
+        return 2 * self.number_of_edges() / (n * (n - 1)) if n > 1 else 0.0
+
+    def subgraph(self, mask):
+        """Induced subgraph on the nodes selected by a boolean mask (node IDs are renumbered)"""
+        selected = np.flatnonzero(mask)
+        adjacency = self.adjacency[selected][:, selected].tocsr()
+        adjacency.sort_indices()
+        return CSRGraph([self.nodes[i] for i in selected], adjacency, self.node_type[selected],
+                        self.created_day[selected])
+
+    def connected_components(self):
+        """Number of connected components and the component label of every node"""
+        return csgraph.connected_components(self.adjacency, directed=False)
+
+    def largest_component(self):
+        """Boolean mask of the nodes in the largest connected component"""
+        count, labels = self.connected_components()
+        if not count:
+            return np.zeros(0, dtype=bool)
+        return labels == np.argmax(np.bincount(labels))
+
+    def triangles(self):
+        """Number of triangles through every node
+
+        Edges are oriented from lower to higher degree, so every triangle
+        u < v < w is found once as a wedge u-v-w closed by u-w (credited to u
+        and w) and once as a wedge v-u-w at its middle node v. Hubs then only
+        ever sit at the top of wedges, which keeps the sparse products near
+        O(m^1.5) even with tags linked to thousands of notes.
+        """
+        n = len(self.nodes)
+        position = np.empty(n, dtype=np.int64)
+        position[np.lexsort((np.arange(n), self.degrees))] = np.arange(n)
+        rows = np.repeat(np.arange(n), self.degrees)
+        upward = position[rows] < position[self.indices]
+        oriented = sparse.csr_matrix((np.ones(int(upward.sum())), (rows[upward], self.indices[upward])), shape=(n, n))
+        closed = (oriented @ oriented).multiply(oriented)  # (lowest, highest) -> triangles
+        middle = (oriented.T @ oriented).multiply(oriented)  # (middle, highest) -> triangles
+        return (np.asarray(closed.sum(axis=1)).ravel() + np.asarray(closed.sum(axis=0)).ravel()
+                + np.asarray(middle.sum(axis=1)).ravel())
+
+    def average_clustering(self):
+        """Mean local clustering coefficient, counting nodes of degree below 2 as 0 (as NetworkX does)"""
+        n = len(self.nodes)
+        if not n:
+            return 0.0
+        triangles = self.triangles()
+        degrees = self.degrees.astype(np.float64)
+        possible = degrees * (degrees - 1) / 2
+        clustering = np.divide(triangles, possible, out=np.zeros(n), where=possible > 0)
+        return float(clustering.mean())
+
+    def bfs_distances(self, sources):
+        """Hop distances from each source to every node (inf where unreachable)
+
+        All sources are searched together, one sparse product per level
+        expanding every frontier at once.
+        """
+        sources = np.atleast_1d(np.asarray(sources))
+        columns = np.arange(len(sources))
+        adjacency = self.binary.astype(np.float32)
+        distances = np.full((len(self.nodes), len(sources)), np.inf)
+        distances[sources, columns] = 0
+        visited = np.zeros(distances.shape, dtype=bool)
+        visited[sources, columns] = True
+        frontier = visited.astype(np.float32)
+        level = 0
+        while True:
+            level += 1
+            reached = (adjacency @ frontier > 0) & ~visited
+            if not reached.any():
+                break
+            visited |= reached
+            distances[reached] = level
+            frontier = reached.astype(np.float32)
+        return distances.T
+
+    def map_blocks(self, method, sources, pool=None):
+        """Results of a block method (e.g. "distance_block") over consecutive blocks of sources
+
+        Args:
+            pool: parallel_analysis.AnalysisPool to spread the blocks over its worker
+                processes, which share this graph's arrays; blocks run here if None
+        """
+        if pool is None:
+            size = BFS_BLOCK_SOURCES
+        else:
+            size = max(1, min(BFS_BLOCK_SOURCES, -(-len(sources) // pool.workers)))
+        blocks = [sources[start:start + size] for start in range(0, len(sources), size)]
+        if pool is None:
+            return [getattr(self, method)(block) for block in blocks]
+        return pool.map_blocks(self, method, blocks)
+
+    def distance_block(self, sources):
+        """Sum and maximum of the finite hop distances from a block of sources"""
+        distances = self.bfs_distances(sources)
+        finite = distances[np.isfinite(distances)]
+        return float(finite.sum()), int(finite.max()) if finite.size else 0
+
+    def path_length_block(self, sources):
+        """Mean hop distance from each source of a block to the other nodes"""
+        return self.bfs_distances(sources).sum(axis=1) / (len(self.nodes) - 1)
+
+    def centrality_block(self, sources):
+        """Per-node sums over a block of sources of what sampled centrality needs
+
+        Returns:
+            Sums of Brandes dependencies and of their squares, sums of finite hop
+            distances and of their squares, and the number of sources reaching each node
+        """
+        distances, delta = self.dependencies(sources)
+        reachable = np.isfinite(distances)
+        finite = np.where(reachable, distances, 0)
+        return (delta.sum(axis=0), (delta ** 2).sum(axis=0), finite.sum(axis=0), (finite ** 2).sum(axis=0),
+                reachable.sum(axis=0))
+
+    def distance_stats(self, pool=None):
+        """Average shortest path length and diameter, exact, from blocks of breadth-first searches
+
+        The graph is expected to be connected (e.g. a largest component).
+        """
+        n = len(self.nodes)
+        if n < 2:
+            return 0.0, 0
+        blocks = self.map_blocks("distance_block", np.arange(n), pool)
+        total = sum(block_total for block_total, _ in blocks)
+        diameter = max(block_max for _, block_max in blocks)
+        return total / (n * (n - 1)), diameter
+
+    def sampled_path_length(self, samples, seed=None, pool=None):
+        """Estimate the average shortest path length from breadth-first searches out of sampled sources
+
+        The graph is expected to be connected (e.g. a largest component).
+
+        Returns:
+            The estimate and its 95% confidence half-width (0 if every node was a source)
+        """
+        n = len(self.nodes)
+        if n < 2:
+            return 0.0, 0.0
+        k = min(samples, n)
+        sources = np.random.default_rng(seed).choice(n, k, replace=False) if k < n else np.arange(n)
+        # Mean distance from each sampled source to the other nodes
+        means = np.concatenate(self.map_blocks("path_length_block", sources, pool))
+        if k == n or k < 2:
+            return float(means.mean()), 0.0 if k == n else float("inf")
+        error = 1.96 * means.std(ddof=1) / np.sqrt(k) * np.sqrt(1 - k / n)
+        return float(means.mean()), float(error)
+
+    def diameter_bounds(self, max_searches=None):
+        """Diameter by double sweep and iFUB (iterative fringe upper bound)
+
+        A double sweep from the highest-degree node gives a lower bound and a
+        central node u; then the eccentricities of the nodes farthest from u
+        are computed fringe by fringe (in blocks of searches) until the lower
+        bound meets twice the remaining fringe distance. The graph is expected
+        to be connected.
+
+        Args:
+            max_searches: Breadth-first searches to spend before stopping with bounds
+
+        Returns:
+            Lower and upper bound of the diameter (equal once it is exact)
+        """
+        n = len(self.nodes)
+        if n < 2:
+            return 0, 0
+        searches = 0
+
+        def eccentricities(sources):
+            nonlocal searches
+            searches += len(sources)
+            return self.bfs_distances(sources).max(axis=1)
+
+        # Double sweep: the farthest node from the farthest node of a hub
+        start = int(np.argmax(self.degrees))
+        a = int(np.argmax(self.bfs_distances([start])[0]))
+        from_a = self.bfs_distances([a])[0]
+        b = int(np.argmax(from_a))
+        from_b = self.bfs_distances([b])[0]
+        lower = int(from_a[b])
+        searches += 3
+
+        # Start iFUB from the best-connected node halfway along the a-b path
+        middle = np.flatnonzero((from_a + from_b == lower) & (from_a == lower // 2))
+        u = int(middle[np.argmax(self.degrees[middle])])
+        from_u = self.bfs_distances([u])[0]
+        searches += 1
+        level = int(from_u.max())
+        lower = max(lower, level)
+        upper = 2 * level
+
+        while upper > lower and level > 0:
+            fringe = np.flatnonzero(from_u == level)
+            for block in range(0, len(fringe), BFS_BLOCK_SOURCES):
+                if max_searches is not None and searches >= max_searches:
+                    return lower, upper
+                lower = max(lower, int(eccentricities(fringe[block:block + BFS_BLOCK_SOURCES]).max()))
+                if lower >= upper:
+                    return lower, lower
+            # Nodes nearer to u than this fringe have eccentricity at most 2 * (level - 1)
+            level -= 1
+            upper = max(lower, 2 * level)
+        return lower, upper
+
+    def within_distance(self, source, max_distance):
+        """Boolean mask of the nodes at most max_distance hops from source, by frontier expansion"""
+        reached = np.zeros(len(self.nodes), dtype=bool)
+        reached[source] = True
+        frontier = reached.copy()
+        for _ in range(max_distance):
+            frontier = (self.binary @ frontier.astype(np.int32)).astype(bool) & ~reached
+            if not frontier.any():
+                break
+            reached |= frontier
+        return reached
+
+    def core_numbers(self):
+        """k-core number of every node, by peeling all minimum-degree nodes at once"""
+        n = len(self.nodes)
+        core = np.zeros(n, dtype=np.int64)
+        degrees = self.degrees.astype(np.int64).copy()
+        alive = np.ones(n, dtype=bool)
+        binary = self.binary
+        k = 0
+        while alive.any():
+            k = max(k, int(degrees[alive].min()))
+            # Peel every node whose remaining degree is at most k, until none is left at this level
+            while True:
+                peel = alive & (degrees <= k)
+                if not peel.any():
+                    break
+                core[peel] = k
+                alive &= ~peel
+                degrees -= binary @ peel.astype(np.int32)
+        return core
+
+    def dependencies(self, sources):
+        """Brandes dependencies of each source on every node, for a block of sources at once
+
+        Shortest path counts are propagated level by level from all sources
+        together with one sparse product per level, then dependencies are
+        accumulated back up the levels the same way.
+
+        Returns:
+            Hop distances and dependencies, both of shape (len(sources), number of nodes)
+        """
+        sources = np.atleast_1d(np.asarray(sources))
+        distances = self.bfs_distances(sources).T  # One column per source, for products with the adjacency
+        finite = np.isfinite(distances)
+        depth = int(distances[finite].max()) if finite.any() else 0
+        levels = [distances == level for level in range(depth + 1)]
+        adjacency = self.binary.astype(np.float64)
+
+        sigma = np.zeros(distances.shape)
+        sigma[sources, np.arange(len(sources))] = 1
+        for level in range(1, depth + 1):
+            sigma[levels[level]] = (adjacency @ (sigma * levels[level - 1]))[levels[level]]
+
+        delta = np.zeros(distances.shape)
+        for level in range(depth - 1, 0, -1):
+            coefficients = np.divide(1 + delta, sigma, out=np.zeros(distances.shape), where=levels[level + 1])
+            delta[levels[level]] = (sigma * (adjacency @ coefficients))[levels[level]]
+        return distances.T, delta.T
+
+    def eigenvector(self, start=None, tol=1e-6, max_iter=1000):
+        """Principal eigenvector by power iteration on A + I, as NetworkX computes it
+
+        Args:
+            start: Starting vector (e.g. the previous result, to warm-start), all ones by default
+
+        Returns:
+            The L2-normalized vector, the number of iterations, and an estimate of
+            the largest remaining error of any entry, extrapolated from the rate at
+            which the last iterations converged
+        """
+        n = len(self.nodes)
+        if not n:
+            return np.zeros(0), 0, 0.0
+        x = np.ones(n) if start is None else np.asarray(start, dtype=np.float64)
+        x = x / x.sum()
+        adjacency = self.binary.astype(np.float64)
+        changes = []
+        for iteration in range(1, max_iter + 1):
+            last = x
+            x = last + adjacency @ last
+            x /= np.linalg.norm(x) or 1
+            changes.append(np.abs(x - last))
+            if changes[-1].sum() < n * tol:
+                break
+        error = float(changes[-1].max())
+        # The first iteration also renormalizes the start vector, so its change says nothing about the rate
+        if len(changes) > 2 and changes[-2].max() > 0:
+            rate = min(error / float(changes[-2].max()), 0.99)
+            error *= rate / (1 - rate)
+        return x, iteration, error
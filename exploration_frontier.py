@@ -0,0 +1,182 @@
+import math
+import heapq
+from collections import Counter, deque
+
+# Feature weights for each exploration strategy. Features are:
+#   degree   - log(1 + number of neighbours)
+#   bridge   - share of neighbours that belong to different tag clusters (betweenness proxy)
+#   novelty  - rarity of the note's tags, discounted when its region keeps producing duplicates
+#   recency  - how recently the note was added
+#   hops     - distance from the seed note
+STRATEGY_WEIGHTS = {
+    'breadth': {'degree': -0.25, 'bridge': 0.0, 'novelty': 1.0, 'recency': 0.0, 'hops': -1.0},
+    'depth': {'degree': 0.0, 'bridge': 0.0, 'novelty': 0.5, 'recency': 1.5, 'hops': 1.0},
+    'hub': {'degree': 1.5, 'bridge': 0.25, 'novelty': 0.5, 'recency': 0.0, 'hops': -0.25},
+    'bridge': {'degree': 0.25, 'bridge': 2.0, 'novelty': 1.0, 'recency': 0.0, 'hops': 0.0}
+}
+
+# Number of additions after which a note's recency feature has halved
+RECENCY_HALF_LIFE = 25
+
+# Hop distance assigned to notes that are not connected to the seed
+UNREACHABLE_HOPS = 10
+
+
+class ExplorationFrontier:
+    """Priority queue of notes to expand next, scored from local graph structure
+
+    Adding a note rescores only the note and its direct neighbours, and
+    choosing the next note is a heap pop, so each step costs O(deg log n)
+    instead of a scan over the garden. Features that drift for untouched
+    notes (recency and tag rarity) only ever lower a score, so stale entries
+    are re-evaluated lazily when they reach the top of the heap.
+    """
+
+    def __init__(self, strategy='breadth'):
+        self.weights = STRATEGY_WEIGHTS.get(strategy, STRATEGY_WEIGHTS['breadth'])
+        self.neighbors = {}
+        self.tags = {}
+        self.sequence = {}
+        self.hops = {}
+        self.redundancy = Counter()
+        self.tag_counts = Counter()
+        self.expanded = set()
+        self.clock = 0
+        self.heap = []
+        self.queued = {}  # title -> score of its live heap entry
+
+    @classmethod
+    def from_index(cls, index, strategy='breadth', seed=None):
+        """Build a frontier from a garden index, measuring hop distances from the seed note"""
+        frontier = cls(strategy)
+        notes = index.get("notes", {})
+
+        # Insert in creation order so recency reflects the garden's history
+        for title, data in sorted(notes.items(), key=lambda item: item[1].get("created", "")):
+            frontier.clock += 1
+            frontier.sequence[title] = frontier.clock
+            frontier.tags[title] = list(data.get("tags", []))
+            frontier.tag_counts.update(frontier.tags[title])
+            frontier.neighbors.setdefault(title, set())
+            for related in data.get("related_notes", []):
+                if related in notes:
+                    frontier.neighbors[title].add(related)
+                    frontier.neighbors.setdefault(related, set()).add(title)
+
+        frontier._compute_hops(seed)
+        frontier.heap = [(-frontier.score(title), title) for title in frontier.neighbors]
+        heapq.heapify(frontier.heap)
+        frontier.queued = {title: -negated for negated, title in frontier.heap}
+        return frontier
+
+    def _compute_hops(self, seed):
+        """Breadth-first hop distances from the seed note"""
+        if seed not in self.neighbors:
+            self.hops = {title: 0 for title in self.neighbors}
+            return
+        self.hops = {seed: 0}
+        queue = deque([seed])
+        while queue:
+            current = queue.popleft()
+            for neighbor in self.neighbors[current]:
+                if neighbor not in self.hops:
+                    self.hops[neighbor] = self.hops[current] + 1
+                    queue.append(neighbor)
+
+    def __len__(self):
+        return len(self.queued)
+
+    def _cluster(self, title):
+        tags = self.tags.get(title)
+        return tags[0].lower() if tags else ""
+
+    def features(self, title):
+        """Compute the scoring features of a note"""
+        neighbors = self.neighbors.get(title, ())
+        degree = len(neighbors)
+
+        bridge = 0.0
+        if degree > 1:
+            clusters = {self._cluster(neighbor) for neighbor in neighbors}
+            bridge = (len(clusters) - 1) / (degree - 1)
+
+        tags = self.tags.get(title) or []
+        if tags:
+            rarity = sum(1.0 / (1 + math.log(self.tag_counts[tag] or 1)) for tag in tags) / len(tags)
+        else:
+            rarity = 1.0
+        novelty = rarity / (1 + self.redundancy[title])
+
+        age = self.clock - self.sequence.get(title, self.clock)
+        recency = 1.0 / (1 + age / RECENCY_HALF_LIFE)
+
+        hops = min(self.hops.get(title, UNREACHABLE_HOPS), UNREACHABLE_HOPS) / UNREACHABLE_HOPS
+
+        return {
+            'degree': math.log1p(degree),
+            'bridge': bridge,
+            'novelty': novelty,
+            'recency': recency,
+            'hops': hops
+        }
+
+    def score(self, title):
+        features = self.features(title)
+        return sum(self.weights[name] * value for name, value in features.items())
+
+    def _push(self, title):
+        if title in self.expanded:
+            return
+        score = self.score(title)
+        self.queued[title] = score
+        heapq.heappush(self.heap, (-score, title))
+
+    def add_note(self, title, tags=None, related_notes=None):
+        """Register a new note and rescore its neighbourhood"""
+        self.clock += 1
+        self.sequence[title] = self.clock
+        self.tags[title] = list(tags or [])
+        self.tag_counts.update(self.tags[title])
+        self.neighbors.setdefault(title, set())
+
+        known = [related for related in related_notes or [] if related in self.neighbors]
+        for related in known:
+            self.neighbors[title].add(related)
+            self.neighbors[related].add(title)
+        if known:
+            self.hops[title] = min(self.hops.get(r, UNREACHABLE_HOPS) for r in known) + 1
+
+        self._push(title)
+        for related in known:
+            self._push(related)
+
+    def mark_expanded(self, title):
+        """Close a note so it is never expanded again"""
+        self.expanded.add(title)
+        self.queued.pop(title, None)
+
+    def mark_redundant(self, title):
+        """Record that expanding a note produced only duplicates, discounting its region"""
+        self.redundancy[title] += 1
+        for neighbor in self.neighbors.get(title, ()):
+            self.redundancy[neighbor] += 1
+            if neighbor in self.queued:
+                self._push(neighbor)
+
+    def pop(self):
+        """Remove and return the best note to expand next, or None if the frontier is empty"""
+        while self.heap:
+            negated, title = heapq.heappop(self.heap)
+            if self.queued.get(title) != -negated:
+                continue  # Superseded by a newer entry or already expanded
+
+            # Scores only drift downwards, so re-check the top entry before trusting it
+            fresh = self.score(title)
+            if self.heap and fresh < -self.heap[0][0]:
+                self.queued[title] = fresh
+                heapq.heappush(self.heap, (-fresh, title))
+                continue
+
+            del self.queued[title]
+            return title
+        return None
@@ -0,0 +1,247 @@
+import os
+import time
+import uuid
+import socket
+import sqlite3
+import datetime
+import threading
+import traceback
+from contextlib import closing
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+# Seconds between heartbeats of the jobs a process is running, and without one after which a job counts as abandoned
+HEARTBEAT_INTERVAL = 15
+HEARTBEAT_TIMEOUT = 120
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    topic TEXT NOT NULL,
+    exploration_type TEXT NOT NULL,
+    iterations INTEGER NOT NULL,
+    depth INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    completed_iterations INTEGER NOT NULL DEFAULT 0,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created TEXT NOT NULL,
+    started TEXT,
+    finished TEXT,
+    worker TEXT,
+    heartbeat REAL
+)
+"""
+
+# Columns added since the first schema, with their definitions
+ADDED_COLUMNS = {"worker": "TEXT", "heartbeat": "REAL"}
+
+
+class JobQueue:
+    """SQLite-backed queue of exploration jobs
+
+    Progress is stored after every completed iteration, so a job interrupted
+    by a restart resumes from its last completed iteration. Several processes
+    can share a queue: each running job records the process that claimed it
+    and a heartbeat, and only jobs whose heartbeat has gone stale are requeued.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        # Identifies this process's claims; the random part tells apart processes that reuse a PID
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # Serializes claims so two workers never take the same job
+        self.claim_lock = threading.Lock()
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, definition in ADDED_COLUMNS.items():
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {definition}")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _execute(self, sql, params=()):
+        with closing(self._connect()) as conn, conn:
+            return conn.execute(sql, params).rowcount
+
+    def submit(self, topic, iterations=3, exploration_type="breadth", depth=2):
+        """Queue an exploration and return its job ID"""
+        with closing(self._connect()) as conn, conn:
+            cursor = conn.execute(
+                "INSERT INTO jobs (topic, exploration_type, iterations, depth, status, created) VALUES (?, ?, ?, ?, ?, ?)",
+                (topic, exploration_type, iterations, depth, QUEUED, datetime.datetime.now().isoformat())
+            )
+            return cursor.lastrowid
+
+    def claim(self):
+        """Atomically take the oldest queued job and mark it running, or return None"""
+        with self.claim_lock, closing(self._connect()) as conn, conn:
+            # Take the write lock up front, so another process cannot claim the same row in between
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT * FROM jobs WHERE status = ? ORDER BY id LIMIT 1", (QUEUED,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE jobs SET status = ?, started = ?, worker = ?, heartbeat = ? WHERE id = ?",
+                         (RUNNING, datetime.datetime.now().isoformat(), self.worker_id, time.time(), row["id"]))
+            job = dict(row)
+            job.update(status=RUNNING, worker=self.worker_id)
+            return job
+
+    def heartbeat(self):
+        """Mark the jobs this process is running as alive"""
+        self._execute("UPDATE jobs SET heartbeat = ? WHERE worker = ? AND status = ?",
+                      (time.time(), self.worker_id, RUNNING))
+
+    def update_progress(self, job_id, completed_iterations):
+        self._execute("UPDATE jobs SET completed_iterations = ? WHERE id = ?", (completed_iterations, job_id))
+
+    def finish(self, job_id, status, error=None):
+        self._execute("UPDATE jobs SET status = ?, error = ?, finished = ? WHERE id = ?",
+                      (status, error, datetime.datetime.now().isoformat(), job_id))
+
+    def cancel(self, job_id):
+        """Cancel a job: queued jobs stop immediately, running jobs after their current iteration
+
+        Returns:
+            True if the job existed and was still queued or running
+        """
+        with closing(self._connect()) as conn, conn:
+            now = datetime.datetime.now().isoformat()
+            if conn.execute("UPDATE jobs SET status = ?, cancel_requested = 1, finished = ? WHERE id = ? AND status = ?",
+                            (CANCELLED, now, job_id, QUEUED)).rowcount:
+                return True
+            return conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = ?",
+                                (job_id, RUNNING)).rowcount > 0
+
+    def is_cancel_requested(self, job_id):
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            return bool(row and row["cancel_requested"])
+
+    def get(self, job_id):
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            return dict(row) if row else None
+
+    def list_jobs(self, limit=50):
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+            return [dict(row) for row in rows]
+
+    def requeue_interrupted(self, timeout=HEARTBEAT_TIMEOUT):
+        """Put running jobs whose process stopped sending heartbeats back on the queue
+
+        Jobs that a live process (this one or another sharing the database) is
+        running keep a fresh heartbeat and are left alone.
+        """
+        return self._execute(
+            "UPDATE jobs SET status = ?, worker = NULL WHERE status = ? AND (heartbeat IS NULL OR heartbeat < ?)",
+            (QUEUED, RUNNING, time.time() - timeout))
+
+    def release(self, job_id):
+        """Put a job this process stops running (e.g. at shutdown) back on the queue right away"""
+        self._execute("UPDATE jobs SET status = ?, worker = NULL WHERE id = ? AND status = ? AND worker = ?",
+                      (QUEUED, job_id, RUNNING, self.worker_id))
+
+
+class ExplorationWorkerPool:
+    """Fixed pool of worker threads that run queued explorations
+
+    The pool size caps how many explorations run at once, so queued work
+    cannot oversubscribe the LLM budget or the garden writer. A separate
+    thread sends the heartbeats of the running jobs and requeues jobs
+    abandoned by processes that died.
+    """
+
+    def __init__(self, queue, agent, workers=2, poll_interval=1.0):
+        self.queue = queue
+        self.agent = agent
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.threads = []
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"exploration-worker-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        thread = threading.Thread(target=self._heartbeat_loop, name="exploration-heartbeat", daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    def _heartbeat_loop(self):
+        while not self.stopping.wait(HEARTBEAT_INTERVAL):
+            self.queue.heartbeat()
+            if self.queue.requeue_interrupted():
+                self.wakeup.set()
+
+    def stop(self, timeout=None):
+        self.stopping.set()
+        self.wakeup.set()
+        for thread in self.threads:
+            thread.join(timeout)
+
+    def notify(self):
+        """Wake idle workers after a job has been submitted"""
+        self.wakeup.set()
+
+    def _worker_loop(self):
+        while not self.stopping.is_set():
+            job = self.queue.claim()
+            if job is None:
+                self.wakeup.wait(self.poll_interval)
+                self.wakeup.clear()
+                continue
+            self.run_job(job)
+
+    def run_job(self, job):
+        """Run the remaining iterations of a claimed job"""
+        job_id = job["id"]
+        done = job["completed_iterations"]
+        remaining = job["iterations"] - done
+
+        def progress_callback(completed, total):
+            self.queue.update_progress(job_id, done + completed)
+
+        def should_stop():
+            return self.stopping.is_set() or self.queue.is_cancel_requested(job_id)
+
+        try:
+            if remaining > 0:
+                print(f"Job {job_id}: exploring '{job['topic']}' ({job['exploration_type']}), "
+                      f"iterations {done + 1}-{job['iterations']}")
+                self.agent.autonomous_exploration(
+                    job["topic"],
+                    iterations=remaining,
+                    depth=job["depth"],
+                    exploration_type=job["exploration_type"],
+                    progress_callback=progress_callback,
+                    should_stop=should_stop
+                )
+        except Exception as e:
+            traceback.print_exc()
+            self.queue.finish(job_id, FAILED, error=str(e))
+            return
+
+        if self.queue.is_cancel_requested(job_id):
+            self.queue.finish(job_id, CANCELLED)
+            print(f"Job {job_id}: cancelled")
+        elif self.stopping.is_set():
+            # Requeued so it resumes from its last completed iteration, here or in another process
+            self.queue.release(job_id)
+            print(f"Job {job_id}: interrupted by shutdown")
+        else:
+            self.queue.finish(job_id, COMPLETED)
+            print(f"Job {job_id}: completed")
@@ -0,0 +1,352 @@
+import re
+import datetime
+import math
+import heapq
+from collections import Counter, deque
+
+# Words that carry no retrieval signal
+STOP_WORDS = {
+    'the', 'a', 'an', 'in', 'on', 'at', 'to', 'for', 'with', 'by', 'about', 'as', 'of', 'and', 'or',
+    'is', 'are', 'what', 'how', 'why', 'when', 'where', 'who', 'which', 'this', 'that', 'it', 'be',
+    'from', 'can', 'do', 'does', 'me', 'my', 'i', 'you', 'your', 'we', 'our', 'its', 'was', 'were'
+}
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Field weights: a title hit counts for more than a tag hit, which counts for more than a body hit
+TITLE_WEIGHT = 3
+TAG_WEIGHT = 2
+
+# Terms in more notes than this are searched through their champion list of the best-weighted notes
+CHAMPION_MIN_POSTINGS = 1024
+CHAMPION_LIST_SIZE = 512
+
+
+def tokenize(text):
+    """Split text into lowercase word tokens, dropping stop words"""
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOP_WORDS and len(t) > 1]
+
+
+def note_body(markdown, title=None):
+    """Strip the title heading and trailing metadata block from a note file"""
+    if markdown is None:
+        return ""
+    body = markdown
+    if "\n---\n" in body:
+        body = body.rsplit("\n---\n", 1)[0]
+    if title and body.startswith(f"# {title}"):
+        body = body[len(f"# {title}"):]
+    return body.strip()
+
+
+class LexicalIndex:
+    """In-memory BM25 inverted index over note titles, tags and bodies
+
+    The index is updated incrementally as notes are added, so a search only
+    touches the postings of the query terms rather than every note.
+    """
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}   # term -> {title: weighted term frequency}
+        self.doc_terms = {}  # title -> Counter of terms (needed to remove/replace a document)
+        self.doc_lengths = {}
+        self.total_length = 0
+        self.champion_lists = {}  # term -> min-heap of (impact, title), built on first use
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def __contains__(self, title):
+        return title in self.doc_lengths
+
+    def add_document(self, title, body="", tags=None):
+        """Index (or re-index) a note"""
+        if title in self.doc_terms:
+            self.remove_document(title)
+
+        terms = Counter(tokenize(body))
+        for term in tokenize(title):
+            terms[term] += TITLE_WEIGHT
+        for tag in tags or []:
+            for term in tokenize(tag):
+                terms[term] += TAG_WEIGHT
+
+        for term, freq in terms.items():
+            self.postings.setdefault(term, {})[title] = freq
+
+        length = sum(terms.values())
+        self.doc_terms[title] = terms
+        self.doc_lengths[title] = length
+        self.total_length += length
+
+        for term, freq in terms.items():
+            heap = self.champion_lists.get(term)
+            if heap is not None:
+                item = (self._impact(title, freq), title)
+                if len(heap) < CHAMPION_LIST_SIZE:
+                    heapq.heappush(heap, item)
+                else:
+                    heapq.heappushpop(heap, item)
+
+    def remove_document(self, title):
+        """Remove a note from the index"""
+        terms = self.doc_terms.pop(title, None)
+        if terms is None:
+            return
+        for term in terms:
+            docs = self.postings.get(term)
+            if docs is not None:
+                docs.pop(title, None)
+                if not docs:
+                    del self.postings[term]
+            # Rebuilt on next use, since a heap cannot drop an arbitrary entry
+            self.champion_lists.pop(term, None)
+        self.total_length -= self.doc_lengths.pop(title, 0)
+
+    def score_terms(self, terms):
+        """Accumulate BM25 scores for the documents matching any of the terms"""
+        num_docs = len(self.doc_lengths)
+        if not num_docs:
+            return {}
+
+        avg_length = self.total_length / num_docs
+        scores = {}
+        for term in set(terms):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (num_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for title, freq in docs.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[title] / avg_length)
+                scores[title] = scores.get(title, 0.0) + idf * freq * (self.k1 + 1) / (freq + norm)
+        return scores
+
+    def _impact(self, title, freq):
+        """Length-normalized weight of a term in a note, used to order champion lists"""
+        avg_length = self.total_length / max(1, len(self.doc_lengths))
+        return freq / (freq + self.k1 * (1 - self.b + self.b * self.doc_lengths[title] / max(avg_length, 1e-9)))
+
+    def champions(self, term):
+        """Titles of the notes where a common term weighs most (its champion list)"""
+        heap = self.champion_lists.get(term)
+        if heap is None:
+            docs = self.postings[term]
+            heap = heapq.nlargest(CHAMPION_LIST_SIZE, ((self._impact(t, f), t) for t, f in docs.items()))
+            heapq.heapify(heap)
+            self.champion_lists[term] = heap
+        return [title for _, title in heap]
+
+    def search(self, query, limit=5):
+        """Return the top `limit` (title, score) pairs for a query, best first
+
+        Terms with more than CHAMPION_MIN_POSTINGS notes only contribute
+        candidates from their champion lists; every candidate still gets its
+        exact BM25 score. A note matching nothing but very common terms can be
+        missed, but a search no longer walks postings covering most of the garden.
+        """
+        terms = set(tokenize(query))
+        candidates = set()
+        for term in terms:
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            if len(docs) > CHAMPION_MIN_POSTINGS:
+                candidates.update(self.champions(term))
+            else:
+                candidates.update(docs)
+        if not candidates:
+            return []
+
+        num_docs = len(self.doc_lengths)
+        avg_length = self.total_length / num_docs
+        scores = dict.fromkeys(candidates, 0.0)
+        for term in terms:
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (num_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for title in candidates:
+                freq = docs.get(title)
+                if freq:
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[title] / avg_length)
+                    scores[title] += idf * freq * (self.k1 + 1) / (freq + norm)
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+
+# Weights of the find_relevant_nodes score components
+KEYWORD_WEIGHT = 1.0
+RECENCY_WEIGHT = 0.3
+CONNECTION_WEIGHT = 0.5
+
+
+def creation_day(created):
+    """Day number of an ISO creation timestamp, or None if it cannot be parsed"""
+    try:
+        return datetime.datetime.fromisoformat(created).toordinal()
+    except (TypeError, ValueError):
+        return None
+
+
+class RelevanceIndex:
+    """Precomputed scoring index behind find_relevant_nodes
+
+    A note's score is a keyword part plus a static part from its recency bucket
+    (creation day) and its number of connections. Keyword scores come from the
+    postings of the garden's LexicalIndex, and the notes with the best static
+    scores are kept in a small cache, so a query only scores the notes matching
+    its keywords plus that cache instead of the whole garden. The index is
+    updated note by note as the garden changes.
+    """
+
+    def __init__(self, baseline_size=64):
+        self.days = {}       # title -> creation day number
+        self.degrees = {}    # title -> number of related notes
+        self.baseline_size = baseline_size
+        self.static = None  # title -> static score on static_day
+        self.static_day = None
+        self.baseline = None  # Best (static score, title) pairs, best first
+
+    def __len__(self):
+        return len(self.degrees)
+
+    def update_note(self, title, data):
+        """Index (or re-index) a note from its garden index entry"""
+        self.days[title] = creation_day(data.get("created"))
+        self.degrees[title] = len(data.get("related_notes", []))
+
+        if self.static is not None:
+            score = self.static_score(title, self.static_day)
+            if score < self.static.get(title, score):
+                # A note dropping out of the cache could leave a better note outside it, so rebuild on next use
+                self.static = None
+                return
+            # A new or higher score can only push the note into the cache, so patching it keeps it exact
+            self.static[title] = score
+            self.baseline = [item for item in self.baseline if item[1] != title]
+            if len(self.baseline) < self.baseline_size or score > self.baseline[-1][0]:
+                self.baseline.append((score, title))
+                self.baseline.sort(key=lambda item: item[0], reverse=True)
+                del self.baseline[self.baseline_size:]
+
+    def static_score(self, title, today):
+        """Score from recency and connections, independent of the query"""
+        recency = 0.0
+        day = self.days.get(title)
+        if day is not None:
+            recency = max(0.0, 10 - (today - day) / 30)
+        connections = self.degrees.get(title, 0) * 0.5
+        return recency * RECENCY_WEIGHT + connections * CONNECTION_WEIGHT
+
+    def _refresh(self, limit, today):
+        """Recompute the static scores when the day changes, or the cache is too small for limit"""
+        if self.static is None or self.static_day != today or len(self.baseline) < min(limit, len(self.degrees)):
+            self.baseline_size = max(self.baseline_size, limit)
+            self.static_day = today
+            self.static = {title: self.static_score(title, today) for title in self.degrees}
+            self.baseline = heapq.nlargest(self.baseline_size, ((score, title) for title, score in self.static.items()),
+                                           key=lambda item: item[0])
+
+    def search(self, keyword_scores, limit=5, today=None):
+        """Return the top `limit` (title, score) pairs, best first
+
+        Args:
+            keyword_scores: Dict mapping the notes that match the query to their keyword score
+                (LexicalIndex.score_terms of the query terms)
+        """
+        today = today or datetime.date.today().toordinal()
+        self._refresh(limit, today)
+        static = self.static
+        scored = [(title, score * KEYWORD_WEIGHT + static[title]) for title, score in keyword_scores.items()]
+        scored.extend((title, score) for score, title in self.baseline[:limit] if title not in keyword_scores)
+        return heapq.nlargest(limit, scored, key=lambda item: item[1])
+
+
+# Rank offset of reciprocal rank fusion: larger values flatten the advantage of the top ranks
+RRF_K = 60
+
+# Teleport probability and residual threshold of the personalized PageRank push
+PPR_ALPHA = 0.15
+PPR_EPSILON = 1e-4
+
+
+def reciprocal_rank_fusion(rankings, limit=5, k=RRF_K):
+    """Fuse ranked lists of (title, score) pairs, scoring each title by the sum of 1 / (k + rank)
+
+    Only ranks are used, so signals with incomparable score scales fuse cleanly.
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, (title, _) in enumerate(ranking, start=1):
+            fused[title] = fused.get(title, 0.0) + 1.0 / (k + rank)
+    return heapq.nlargest(limit, fused.items(), key=lambda item: item[1])
+
+
+class GraphIndex:
+    """Undirected adjacency lists over the garden's related_notes links
+
+    Updated note by note as the garden changes, and used for personalized
+    PageRank from a set of seed notes. The push algorithm only visits the
+    neighbourhood of the seeds, so its cost does not grow with the garden.
+    """
+
+    def __init__(self):
+        self.links = {}      # title -> titles it lists as related
+        self.neighbors = {}  # title -> titles linked in either direction
+
+    def __len__(self):
+        return len(self.links)
+
+    def update_note(self, title, data):
+        """Index (or re-index) a note's links from its garden index entry"""
+        new_links = set(data.get("related_notes", [])) - {title}
+        old_links = self.links.get(title, set())
+        self.links[title] = new_links
+        self.neighbors.setdefault(title, set())
+        for other in old_links - new_links:
+            if title not in self.links.get(other, ()):
+                self.neighbors[title].discard(other)
+                self.neighbors.get(other, set()).discard(title)
+        for other in new_links - old_links:
+            self.neighbors[title].add(other)
+            self.neighbors.setdefault(other, set()).add(title)
+
+    def personalized_pagerank(self, seeds, limit=20, alpha=PPR_ALPHA, epsilon=PPR_EPSILON, include_seeds=False):
+        """Approximate personalized PageRank around weighted seed notes (Andersen-Chung-Lang push)
+
+        Args:
+            seeds: Dict mapping seed titles to non-negative weights
+            include_seeds: Whether the seeds themselves may appear in the ranking
+
+        Returns:
+            The top `limit` (title, score) pairs, best first
+        """
+        total = sum(weight for title, weight in seeds.items() if title in self.neighbors)
+        if total <= 0:
+            return []
+        residual = {title: weight / total for title, weight in seeds.items() if title in self.neighbors and weight > 0}
+        rank = {}
+        queue = deque(residual)
+        queued = set(residual)
+        while queue:
+            node = queue.popleft()
+            queued.discard(node)
+            mass = residual.pop(node, 0.0)
+            neighbors = self.neighbors.get(node, ())
+            if not neighbors:
+                rank[node] = rank.get(node, 0.0) + mass
+                continue
+            rank[node] = rank.get(node, 0.0) + alpha * mass
+            share = (1 - alpha) * mass / len(neighbors)
+            for other in neighbors:
+                value = residual.get(other, 0.0) + share
+                residual[other] = value
+                if other not in queued and value >= epsilon * max(1, len(self.neighbors.get(other, ()))):
+                    queue.append(other)
+                    queued.add(other)
+
+        if not include_seeds:
+            for title in seeds:
+                rank.pop(title, None)
+        return heapq.nlargest(limit, rank.items(), key=lambda item: item[1])
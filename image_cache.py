@@ -0,0 +1,73 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Default footprint limit for prepared image payloads
+DEFAULT_MEMORY_BYTES = 64 * 1024 * 1024
+
+
+def file_digest(file_path, chunk_size=1024 * 1024):
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ImagePayloadCache:
+    """In-memory LRU cache of prepared image payloads (base64 data URLs)
+
+    Entries are keyed by (file path, modification time, size, detail level,
+    format), so a lookup only stats the file and a replaced file gets a new
+    key. Payloads are not written to disk: they are base64 copies of rendition
+    files the image pyramid already keeps, so a miss just re-reads the
+    rendition. Least recently used entries are evicted once the cache exceeds
+    its byte budget.
+    """
+
+    def __init__(self, max_memory_bytes=DEFAULT_MEMORY_BYTES):
+        self.max_memory_bytes = max_memory_bytes
+        self.lock = threading.Lock()
+        self.memory = OrderedDict()  # key -> data URL
+        self.memory_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(file_path, detail, img_format):
+        stat = os.stat(file_path)
+        return (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size, detail, img_format.lower())
+
+    def get(self, key):
+        """Return a cached data URL, or None"""
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                return self.memory[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, data_url):
+        """Store a data URL"""
+        with self.lock:
+            if key in self.memory:
+                self.memory_bytes -= len(self.memory.pop(key))
+            if len(data_url) > self.max_memory_bytes:
+                return
+            self.memory[key] = data_url
+            self.memory_bytes += len(data_url)
+            while self.memory_bytes > self.max_memory_bytes:
+                _, evicted = self.memory.popitem(last=False)
+                self.memory_bytes -= len(evicted)
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "memory_entries": len(self.memory),
+                "memory_bytes": self.memory_bytes
+            }
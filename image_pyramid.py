@@ -0,0 +1,191 @@
+import os
+import json
+import threading
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+from image_cache import file_digest
+
+# Renditions derived from every uploaded image
+RENDITIONS = ("auto", "high", "low", "thumbnail")
+
+THUMBNAIL_SIZE = 256
+LOW_DETAIL_SIZE = 512
+HIGH_DETAIL_SHORT_SIDE = 768
+MAX_SIDE = 2048
+
+# Quality of JPEG renditions: visually close to the source at a fraction of the size
+JPEG_QUALITY = 85
+
+
+def _fit(width, height, box):
+    """Scale (width, height) down to fit inside a square box, never upscaling"""
+    scale = min(box / width, box / height, 1.0)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def rendition_size(name, width, height):
+    """Target dimensions of a rendition, following OpenAI's image detail guidelines"""
+    if name == "thumbnail":
+        return _fit(width, height, THUMBNAIL_SIZE)
+    if name == "low":
+        return _fit(width, height, LOW_DETAIL_SIZE)
+
+    # First, ensure the image fits within a 2048x2048 square
+    if max(width, height) > MAX_SIDE:
+        scale = MAX_SIDE / max(width, height)
+        width, height = int(width * scale), int(height * scale)
+    if name == "high":
+        # Then, ensure the shortest side is 768px
+        scale = HIGH_DETAIL_SHORT_SIDE / min(width, height)
+        width, height = round(width * scale), round(height * scale)
+    return width, height
+
+
+def build_pyramid(source_path, output_dir, img_format):
+    """Decode an image once and write all of its renditions (runs in a worker process)
+
+    JPEGs are decoded at the smallest DCT scale that still covers the largest
+    rendition, and each rendition is resized from the smallest already-built
+    rendition that covers it, with Pillow's reducing_gap doing cheap integer
+    reduction before the final LANCZOS pass.
+
+    Returns:
+        The manifest: source dimensions and the file name and size of each rendition
+    """
+    from PIL import Image
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    with Image.open(source_path) as img:
+        width, height = img.size
+        targets = {name: rendition_size(name, width, height) for name in RENDITIONS}
+
+        if img.format == "JPEG":
+            largest = max(targets.values(), key=lambda size: size[0] * size[1])
+            img.draft("RGB", largest)
+        img.load()
+
+        if img_format == "JPEG" and img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+
+        manifest = {"width": width, "height": height, "format": img_format, "renditions": {}}
+        built = []  # Renditions built so far, largest first
+        for name, size in sorted(targets.items(), key=lambda item: item[1][0] * item[1][1], reverse=True):
+            base = img
+            for candidate in built:
+                if candidate.width >= size[0] and candidate.height >= size[1]:
+                    base = candidate
+            rendition = base if base.size == size else base.resize(size, Image.LANCZOS, reducing_gap=2.0)
+            built.append(rendition)
+
+            filename = f"{name}.{img_format.lower()}"
+            tmp_path = output_dir / f".{filename}.tmp"
+            options = {"quality": JPEG_QUALITY} if img_format == "JPEG" else {}
+            rendition.save(tmp_path, format=img_format, **options)
+            os.replace(tmp_path, output_dir / filename)
+            manifest["renditions"][name] = {"file": filename, "width": size[0], "height": size[1]}
+
+    # The manifest is written last, so its presence means the pyramid is complete
+    tmp_path = output_dir / ".manifest.json.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, output_dir / "manifest.json")
+    return manifest
+
+
+class ImagePyramid:
+    """Builds image renditions in a process pool and looks them up by content hash
+
+    Uploads submit a build without waiting for it; query preparation looks up
+    the finished rendition file and only waits if the build is still running.
+    Concurrent submissions of the same image share one build. The content
+    hash of each source file is computed once per version of the file and
+    remembered in sources.json.
+    """
+
+    def __init__(self, root_dir, workers=2):
+        self.root_dir = Path(root_dir)
+        self.root_dir.mkdir(parents=True, exist_ok=True)
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+        self.pending = {}  # pyramid ID -> Future
+        self.lock = threading.Lock()
+        self.sources_path = self.root_dir / "sources.json"
+        try:
+            with open(self.sources_path) as f:
+                self.digests = json.load(f)  # "path:mtime:size" of a source file -> content hash
+        except (OSError, ValueError):
+            self.digests = {}
+
+    @staticmethod
+    def pyramid_id(digest, img_format):
+        return f"{digest}_{img_format.lower()}"
+
+    def source_digest(self, file_path):
+        """Content hash of a source image, hashing the file only if it changed since it was last hashed"""
+        stat = os.stat(file_path)
+        key = f"{os.path.abspath(file_path)}:{stat.st_mtime_ns}:{stat.st_size}"
+        with self.lock:
+            digest = self.digests.get(key)
+        if digest is None:
+            digest = file_digest(file_path)
+            with self.lock:
+                self.digests[key] = digest
+                tmp_path = self.sources_path.with_suffix(".tmp")
+                with open(tmp_path, "w") as f:
+                    json.dump(self.digests, f)
+                os.replace(tmp_path, self.sources_path)
+        return digest
+
+    def rendition_dir(self, pyramid_id):
+        return self.root_dir / pyramid_id
+
+    def manifest(self, pyramid_id):
+        """Return the manifest of a finished pyramid, or None"""
+        try:
+            with open(self.rendition_dir(pyramid_id) / "manifest.json") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def submit(self, file_path, digest, img_format):
+        """Start building a pyramid unless it is built or already building
+
+        Returns:
+            The pyramid ID and a Future, or None for the Future if the pyramid already exists
+        """
+        pyramid_id = self.pyramid_id(digest, img_format)
+        with self.lock:
+            future = self.pending.get(pyramid_id)
+            if future is not None:
+                return pyramid_id, future
+            if (self.rendition_dir(pyramid_id) / "manifest.json").exists():
+                return pyramid_id, None
+            future = self.executor.submit(build_pyramid, str(file_path), str(self.rendition_dir(pyramid_id)), img_format)
+            self.pending[pyramid_id] = future
+
+        def forget(done):
+            with self.lock:
+                if self.pending.get(pyramid_id) is done:
+                    del self.pending[pyramid_id]
+
+        future.add_done_callback(forget)
+        return pyramid_id, future
+
+    def lookup(self, pyramid_id, name):
+        """Path of a finished rendition, or None"""
+        manifest = self.manifest(pyramid_id)
+        if manifest is None or name not in manifest["renditions"]:
+            return None
+        return self.rendition_dir(pyramid_id) / manifest["renditions"][name]["file"]
+
+    def fetch(self, file_path, digest, img_format, name, timeout=None):
+        """Path of a rendition, building the pyramid and waiting for it if needed"""
+        pyramid_id, future = self.submit(file_path, digest, img_format)
+        if future is not None:
+            future.result(timeout)
+        return self.lookup(pyramid_id, name)
+
+    def shutdown(self):
+        self.executor.shutdown(cancel_futures=True)
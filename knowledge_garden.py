@@ -7,23 +7,96 @@ import re
 import sys
 from pathlib import Path
 from typing import Dict, List, Optional, Set, Tuple, Any
-import openai
 import random
+import functools
+import threading
 import subprocess
 import tiktoken
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from garden_retrieval import GraphIndex, LexicalIndex, RelevanceIndex, note_body, reciprocal_rank_fusion, tokenize
+from llm_gateway import get_gateway
+from exploration_frontier import ExplorationFrontier
+from llm_backends import BACKENDS, DEFAULT_BACKEND, create_client, requires_api_key
+from near_duplicates import DUPLICATE_POLICIES, MinHashLSH
+from stream_parser import parse_stream
+from change_feed import ChangeFeed, NOTE_ADDED, PATH_ADDED, RELATION_ADDED, TAG_ADDED
+from vector_index import VectorIndex
 
 # Initialize the OpenAI client with better error handling
-def initialize_openai_client(api_key=None):
-    """Initialize the OpenAI client with the provided API key or from environment variable"""
+def initialize_openai_client(api_key=None, backend=None):
+    """Initialize the LLM client for the given backend ('openai' by default, or 'fake' for offline use)
+    
+    The OpenAI backend uses the provided API key or the OPENAI_API_KEY environment variable.
+    """
+    backend = backend or DEFAULT_BACKEND
     key = api_key or os.environ.get("OPENAI_API_KEY")
-    if not key:
+    if requires_api_key(backend) and not key:
         print("Error: OpenAI API key not found. Please provide it using --api-key or set the OPENAI_API_KEY environment variable.")
         sys.exit(1)
-    return openai.OpenAI(api_key=key)
+    return create_client(backend, api_key=key)
 
 # Client will be initialized in main()
 client = None
 
+# Shared tokenizer, loaded on first use
+_encoding = None
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None:
+        try:
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _encoding = False
+    return _encoding
+
+def count_tokens(text):
+    """Count the tokens in a text, falling back to a rough estimate if tiktoken is unavailable"""
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(text) // 4  # 1 token ≈ 4 characters for English text
+
+def _split_tokens(text, max_tokens):
+    """Hard-split a text into pieces of at most max_tokens"""
+    encoding = _get_encoding()
+    if encoding:
+        tokens = encoding.encode(text, disallowed_special=())
+        return [encoding.decode(tokens[i:i + max_tokens]) for i in range(0, len(tokens), max_tokens)]
+    size = max_tokens * 4
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+def chunk_text(text, max_tokens=3000):
+    """Split a text into chunks of at most max_tokens, breaking between paragraphs where possible"""
+    chunks = []
+    current = []
+    current_tokens = 0
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        tokens = count_tokens(paragraph)
+        pieces = [(paragraph, tokens)] if tokens <= max_tokens else [
+            (piece, count_tokens(piece)) for piece in _split_tokens(paragraph, max_tokens)]
+        for piece, piece_tokens in pieces:
+            if current and current_tokens + piece_tokens > max_tokens:
+                chunks.append("\n\n".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+# Prompts for each type of knowledge expansion
+EXPANSION_PROMPTS = {
+    "elaborate": "Elaborate on the concepts in this note, providing more detail and examples:\n\n{content}",
+    "contrast": "Contrast the ideas in this note with alternative perspectives:\n\n{content}",
+    "question": "Generate thought-provoking questions related to this note:\n\n{content}",
+    "application": "Explore practical applications of the concepts in this note:\n\n{content}",
+    "connection": "Identify connections between this note and other domains or concepts:\n\n{content}"
+}
+
 # Define tool schemas
 knowledge_garden_tools = [
     {
@@ -113,6 +186,41 @@ knowledge_garden_tools = [
             }
         }
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "expand_many",
+            "description": "Expand several notes in several ways at once, e.g. elaborate and contrast a dozen notes",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "expansions": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "note_title": {"type": "string"},
+                                "expansion_type": {
+                                    "type": "string",
+                                    "enum": ["elaborate", "contrast", "question", "application", "connection"]
+                                }
+                            },
+                            "required": ["note_title", "expansion_type"]
+                        },
+                        "description": "The notes to expand and how to expand each"
+                    },
+                    "depth": {
+                        "type": "integer",
+                        "description": "Depth of expansion (1-3)",
+                        "minimum": 1,
+                        "maximum": 3,
+                        "default": 1
+                    }
+                },
+                "required": ["expansions"]
+            }
+        }
+    },
     {
         "type": "function",
         "function": {
@@ -175,19 +283,61 @@ except ImportError:
     def record_tool_usage(tool_name, args, result):
         pass
 
+def synchronized(method):
+    """Run a KnowledgeGarden method while holding the garden's write lock"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.write_lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
 class KnowledgeGarden:
     """A garden of knowledge notes with semantic search capabilities"""
     
-    def __init__(self, garden_dir="knowledge_garden"):
-        """Initialize the knowledge garden"""
+    def __init__(self, garden_dir="knowledge_garden", duplicate_policy="link", duplicate_threshold=0.8,
+                 generated_duplicate_policy="merge"):
+        """Initialize the knowledge garden
+        
+        Args:
+            duplicate_policy: How add_note treats near-duplicate notes: "allow", "link", "merge" or "reject"
+            duplicate_threshold: Estimated Jaccard similarity at which two notes count as near-duplicates
+            generated_duplicate_policy: The policy for notes the garden generates itself
+                (exploration concepts, expansions and extracted insights)
+        """
+        for policy in (duplicate_policy, generated_duplicate_policy):
+            if policy not in DUPLICATE_POLICIES:
+                raise ValueError(f"Unknown duplicate policy '{policy}', expected one of {DUPLICATE_POLICIES}")
         self.garden_dir = Path(garden_dir)
         self.notes_dir = self.garden_dir / "notes"
         self.index_file = self.garden_dir / "index.json"
         self.index = {}
         self.exploration_paths = {}
+        # Lexical retrieval index, built on first use and kept current by add_note
+        self.lexical_index = None
+        # Relevance scoring index for query context, built on first use and kept current by add_note
+        self.relevance_index = None
+        # Semantic vector index, built on first use and kept current by add_note
+        self.vector_index = None
+        # Link graph for graph-proximity retrieval, built on first use and kept current by add_note
+        self.graph_index = None
+        # Called with the title of every note added or modified, e.g. to invalidate caches
+        self.change_listeners = []
+        # Log of added notes, tags, relations and paths, for consumers that maintain derived state
+        self.change_feed = ChangeFeed(self.garden_dir / "changes")
+        # Bumped whenever the whole index is replaced, e.g. reloaded from disk
+        self.version = 0
+        # Near-duplicate index, built on first use and kept current by add_note
+        self.duplicate_policy = duplicate_policy
+        self.generated_duplicate_policy = generated_duplicate_policy
+        self.duplicate_threshold = duplicate_threshold
+        self.duplicate_index = None
+        # Serializes writes from concurrent requests and exploration workers
+        self.write_lock = threading.RLock()
         # Store a reference to the global client
         global client
         self.client = client
+        # All completions go through the shared rate-limited gateway
+        self.gateway = get_gateway(client)
         
         # Set up the garden directory structure
         self.setup_garden()
@@ -226,6 +376,7 @@ class KnowledgeGarden:
                 self.index["tags"] = {}
             if "paths" not in self.index:
                 self.index["paths"] = {}
+            self.version += 1
             
             # Save the updated index
             self.save_index()
@@ -237,16 +388,65 @@ class KnowledgeGarden:
                 "paths": {},
                 "last_updated": datetime.datetime.now().isoformat()
             }
+            self.version += 1
             self.save_index()
     
+    @synchronized
     def save_index(self):
         """Save the knowledge garden index"""
         self.index["last_updated"] = datetime.datetime.now().isoformat()
         with open(self.index_file, "w") as f:
             json.dump(self.index, f, indent=2)
     
-    def add_note(self, title, content, tags=None, related_notes=None):
-        """Add a new note to the knowledge garden"""
+    @synchronized
+    def add_note(self, title, content, tags=None, related_notes=None, check_duplicates=True, generated=False):
+        """Add a new note to the knowledge garden
+        
+        Unless check_duplicates is False, a note that nearly duplicates an existing
+        note is handled according to the garden's duplicate_policy, or its
+        generated_duplicate_policy if the note was generated by the garden.
+        """
+        result = self._add_note(title, content, tags, related_notes, check_duplicates, generated)
+        self.save_index()
+        return result
+    
+    @synchronized
+    def add_notes(self, notes, check_duplicates=True, generated=False):
+        """Add several notes under one lock and a single index save
+        
+        Args:
+            notes: Iterable of dicts with "title", "content" and optional "tags" and "related_notes"
+            
+        Returns:
+            The add_note result message for each note
+        """
+        results = [
+            self._add_note(note["title"], note["content"], note.get("tags"), note.get("related_notes"),
+                           check_duplicates, generated)
+            for note in notes
+        ]
+        self.save_index()
+        return results
+    
+    def _add_note(self, title, content, tags=None, related_notes=None, check_duplicates=True, generated=False):
+        """Write a note and update the in-memory indexes, without saving the index file"""
+        # Add metadata
+        tags = tags or []
+        related_notes = related_notes or []
+        
+        policy = self.generated_duplicate_policy if generated else self.duplicate_policy
+        if check_duplicates and policy != "allow":
+            existing = self.find_near_duplicate(title, content)
+            if existing:
+                if policy == "reject":
+                    return f"Note '{title}' rejected as a near-duplicate of '{existing}'"
+                if policy == "merge":
+                    self._merge_into(existing, tags, related_notes)
+                    return f"Note '{title}' merged into near-duplicate '{existing}'"
+                # "link": keep the note but connect it to its near-duplicate
+                if existing not in related_notes:
+                    related_notes = related_notes + [existing]
+        
         # Normalize title to use as filename
         filename = title.lower().replace(" ", "_").replace("/", "_")
         note_path = self.notes_dir / f"{filename}.md"
@@ -254,10 +454,6 @@ class KnowledgeGarden:
         # Format the markdown content
         md_content = f"# {title}\n\n{content}\n"
         
-        # Add metadata
-        tags = tags or []
-        related_notes = related_notes or []
-        
         metadata = {
             "title": title,
             "created": datetime.datetime.now().isoformat(),
@@ -282,63 +478,170 @@ class KnowledgeGarden:
             "tags": tags,
             "related_notes": related_notes
         }
+        self.change_feed.append(NOTE_ADDED, title=title, **self.index["notes"][title])
+        for related in related_notes:
+            self.change_feed.append(RELATION_ADDED, title=title, related=related)
+        
+        # Keep the retrieval and duplicate indexes current
+        if self.lexical_index is not None:
+            self.lexical_index.add_document(title, content, tags)
+        if self.vector_index is not None:
+            # Same text as build_vector_index reads back from the file, so the content hashes agree
+            self.vector_index.enqueue(title, f"{title}\n\n{content.strip()}")
+        self._note_changed(title)
+        if self.duplicate_index is not None:
+            self.duplicate_index.add(title, content, title=title)
         
         # Update tag index
+        self._add_tags(title, tags)
+        
+        # Update related notes (bidirectional linking)
+        for related in related_notes:
+            self._add_backlink(related, title)
+        
+        return f"Note '{title}' added to the knowledge garden"
+    
+    def _add_tags(self, title, tags):
+        """Record a note's tags in the tag index"""
         for tag in tags:
             if tag not in self.index["tags"]:
                 self.index["tags"][tag] = []
             if title not in self.index["tags"][tag]:
                 self.index["tags"][tag].append(title)
+                self.change_feed.append(TAG_ADDED, tag=tag, title=title)
+    
+    def _add_backlink(self, related, title):
+        """Add title to the related notes of an existing note, in the index and its file"""
+        if related not in self.index["notes"] or related == title:
+            return
+        if title in self.index["notes"][related]["related_notes"]:
+            return
+        self.index["notes"][related]["related_notes"].append(title)
+        self._note_changed(related)
+        self.change_feed.append(RELATION_ADDED, title=related, related=title)
+        
+        # Update the related note file with the new relationship
+        related_path = self.garden_dir / self.index["notes"][related]["path"]
+        if related_path.exists():
+            with open(related_path, "r") as f:
+                related_content = f.read()
+            
+            # Add the new relation if it doesn't exist
+            if f"Related: " in related_content:
+                # Update existing Related section
+                lines = related_content.split("\n")
+                for i, line in enumerate(lines):
+                    if line.startswith("Related: "):
+                        if title not in line:
+                            if line.endswith("Related: "):
+                                lines[i] += f"{title}"
+                            else:
+                                lines[i] += f", {title}"
+                        break
+                
+                related_content = "\n".join(lines)
+            else:
+                # Add new Related section
+                related_content += f"Related: {title}\n"
+            
+            with open(related_path, "w") as f:
+                f.write(related_content)
+    
+    def _merge_into(self, existing, tags, related_notes):
+        """Fold the tags and relations of a rejected near-duplicate into an existing note"""
+        data = self.index["notes"][existing]
+        new_tags = [tag for tag in tags if tag not in data["tags"]]
+        if new_tags:
+            data["tags"].extend(new_tags)
+            self._add_tags(existing, new_tags)
+            self._note_changed(existing)
+            
+            note_path = self.garden_dir / data["path"]
+            if note_path.exists():
+                with open(note_path, "r") as f:
+                    lines = f.read().split("\n")
+                for i, line in enumerate(lines):
+                    if line.startswith("Tags:"):
+                        lines[i] = f"Tags: {', '.join(data['tags'])}"
+                        break
+                with open(note_path, "w") as f:
+                    f.write("\n".join(lines))
         
-        # Update related notes (bidirectional linking)
         for related in related_notes:
-            if related in self.index["notes"]:
-                if title not in self.index["notes"][related]["related_notes"]:
-                    self.index["notes"][related]["related_notes"].append(title)
-                    
-                    # Update the related note file with the new relationship
-                    related_path = self.garden_dir / self.index["notes"][related]["path"]
-                    if related_path.exists():
-                        with open(related_path, "r") as f:
-                            related_content = f.read()
-                        
-                        # Add the new relation if it doesn't exist
-                        if f"Related: " in related_content:
-                            # Update existing Related section
-                            lines = related_content.split("\n")
-                            for i, line in enumerate(lines):
-                                if line.startswith("Related: "):
-                                    if title not in line:
-                                        if line.endswith("Related: "):
-                                            lines[i] += f"{title}"
-                                        else:
-                                            lines[i] += f", {title}"
-                                    break
-                            
-                            related_content = "\n".join(lines)
-                        else:
-                            # Add new Related section
-                            related_content += f"Related: {title}\n"
-                        
-                        with open(related_path, "w") as f:
-                            f.write(related_content)
-        
-        self.save_index()
+            if related in self.index["notes"] and related != existing:
+                self._add_backlink(existing, related)
+                self._add_backlink(related, existing)
+    
+    def _note_changed(self, title):
+        """Refresh the index-entry-derived indexes after a note's metadata changed"""
+        if self.relevance_index is not None:
+            self.relevance_index.update_note(title, self.index["notes"][title])
+        if self.graph_index is not None:
+            self.graph_index.update_note(title, self.index["notes"][title])
+        for listener in self.change_listeners:
+            listener(title)
+    
+    def build_relevance_index(self):
+        """Build the relevance scoring index from the garden index"""
+        with self.write_lock:
+            index = RelevanceIndex()
+            for title, data in self.index.get("notes", {}).items():
+                index.update_note(title, data)
+            self.relevance_index = index
+        return index
+    
+    def build_graph_index(self):
+        """Build the link graph from the garden index"""
+        with self.write_lock:
+            index = GraphIndex()
+            for title, data in self.index.get("notes", {}).items():
+                index.update_note(title, data)
+            self.graph_index = index
+        return index
+    
+    def build_duplicate_index(self):
+        """Build the near-duplicate index from the note files on disk"""
+        index = MinHashLSH(threshold=self.duplicate_threshold)
+        for title in self.index.get("notes", {}):
+            index.add(title, note_body(self.get_note_content(title), title), title=title)
+        self.duplicate_index = index
+        return index
+    
+    def find_near_duplicate(self, title, content):
+        """Return the title of an existing note that nearly duplicates this one, or None
         
-        return f"Note '{title}' added to the knowledge garden"
+        A note with exactly the same title is not a duplicate; add_note overwrites it.
+        """
+        if self.duplicate_index is None:
+            self.build_duplicate_index()
+        matches = self.duplicate_index.query(content, title=title, exclude=title)
+        for existing, _ in matches:
+            if existing in self.index["notes"]:
+                return existing
+        return None
     
     def search_notes(self, query, tags=None, limit=5):
-        """Search for notes in the knowledge garden"""
-        results = []
+        """Search for notes in the knowledge garden
         
+        Notes are ranked by semantic similarity when an embedding model is
+        available, otherwise by a substring match on title and content.
+        """
         # Filter by tags if provided
-        candidate_notes = self.index["notes"].items()
+        tag_filtered_notes = None
         if tags:
             tag_filtered_notes = set()
             for tag in tags:
                 if tag in self.index["tags"]:
                     tag_filtered_notes.update(self.index["tags"][tag])
-            
+        
+        if self.vector_index is None:
+            self.build_vector_index()
+        if self.vector_index.available:
+            return self._semantic_search_notes(query, tag_filtered_notes, limit)
+        
+        results = []
+        candidate_notes = self.index["notes"].items()
+        if tag_filtered_notes is not None:
             candidate_notes = [(title, data) for title, data in candidate_notes 
                                if title in tag_filtered_notes]
         
@@ -351,19 +654,140 @@ class KnowledgeGarden:
                 
                 # Simple search - check if query is in title or content
                 if query.lower() in title.lower() or query.lower() in content.lower():
-                    results.append({
-                        "title": title,
-                        "preview": content[:200] + "..." if len(content) > 200 else content,
-                        "tags": data["tags"],
-                        "created": data["created"],
-                        "related_notes": data["related_notes"]
-                    })
+                    results.append(self._search_result(title, content))
         
         # Sort by relevance (very basic - title matches first)
         results.sort(key=lambda x: query.lower() in x["title"].lower(), reverse=True)
         
         return results[:limit]
     
+    def _semantic_search_notes(self, query, allowed_titles, limit):
+        """Nearest notes to the query, restricted to allowed_titles if given"""
+        if allowed_titles is not None and not allowed_titles:
+            return []
+        results = []
+        fetch = limit
+        while True:
+            matches = self.semantic_search(query, fetch)
+            results = [(title, score) for title, score in matches
+                       if allowed_titles is None or title in allowed_titles][:limit]
+            # Tag filtering can drop matches; widen the search until enough remain
+            if len(results) == limit or len(matches) < fetch:
+                break
+            fetch *= 4
+        
+        return [dict(self._search_result(title, self.get_note_content(title) or ""), score=round(score, 4))
+                for title, score in results]
+    
+    def _search_result(self, title, content):
+        data = self.index["notes"][title]
+        return {
+            "title": title,
+            "preview": content[:200] + "..." if len(content) > 200 else content,
+            "tags": data["tags"],
+            "created": data["created"],
+            "related_notes": data["related_notes"]
+        }
+    
+    def build_vector_index(self, embed=None):
+        """Open the persistent semantic index and queue any notes it is missing
+        
+        Queued notes are encoded in a background thread, so searches can start at once.
+        
+        Args:
+            embed: Function encoding a list of texts into vectors; defaults to the shared sentence-transformers model
+        """
+        with self.write_lock:
+            index = VectorIndex(self.garden_dir / "cache" / "vectors", embed=embed, background=True)
+            if index.available:
+                for title in self.index.get("notes", {}):
+                    if title not in index:
+                        index.enqueue(title, f"{title}\n\n{note_body(self.get_note_content(title), title)}")
+            self.vector_index = index
+        return index
+    
+    def semantic_search(self, query, limit=5):
+        """Return the `limit` notes most similar in meaning to the query as (title, similarity) pairs
+        
+        Returns an empty list when no embedding model is available.
+        """
+        if self.vector_index is None:
+            self.build_vector_index()
+        return [(title, score) for title, score in self.vector_index.search(query, limit)
+                if title in self.index["notes"]]
+    
+    def build_lexical_index(self):
+        """Build the retrieval index from the note files on disk"""
+        index = LexicalIndex()
+        for title, data in self.index.get("notes", {}).items():
+            body = note_body(self.get_note_content(title), title)
+            index.add_document(title, body, data.get("tags", []))
+        self.lexical_index = index
+        return index
+    
+    def retrieve_notes(self, query, limit=5):
+        """Retrieve the notes most relevant to a query, with their bodies loaded
+        
+        Returns:
+            A dict mapping note titles to {"content", "tags", "score"}, best match first
+        """
+        if self.lexical_index is None:
+            self.build_lexical_index()
+        
+        results = {}
+        for title, score in self.lexical_index.search(query, limit):
+            data = self.index["notes"].get(title, {})
+            results[title] = {
+                "content": note_body(self.get_note_content(title), title),
+                "tags": data.get("tags", []),
+                "score": score
+            }
+        return results
+    
+    def hybrid_search(self, query, limit=5, depth=50, graph_seeds=10):
+        """Rank notes for a query by fusing lexical, semantic and graph-proximity rankings
+        
+        BM25 hits, the query's embedding neighbours and the notes closest in the
+        link graph to the best BM25 hits (by personalized PageRank) are combined
+        with reciprocal rank fusion. Every signal comes from an incrementally
+        maintained index, so a search reads no note file.
+        
+        Args:
+            depth: Number of candidates taken from each ranking
+            graph_seeds: Number of top BM25 hits the graph walk starts from
+        
+        Returns:
+            The top `limit` (title, fused score) pairs, best first
+        """
+        if self.lexical_index is None:
+            self.build_lexical_index()
+        if self.graph_index is None:
+            self.build_graph_index()
+        
+        notes = self.index["notes"]
+        lexical = [(title, score) for title, score in self.lexical_index.search(query, depth) if title in notes]
+        semantic = self.semantic_search(query, depth)
+        graph = self.graph_index.personalized_pagerank(dict(lexical[:graph_seeds]), limit=depth)
+        # Stale titles are dropped before fusion truncates, so up to `limit` live notes come back
+        graph = [(title, score) for title, score in graph if title in notes]
+        return reciprocal_rank_fusion([lexical, semantic, graph], limit)
+    
+    def relevance_search(self, query, limit=5):
+        """Rank notes by how well their title, tags and body match the query, plus recency and connections
+        
+        Only the postings of the query terms are read, so the cost follows the
+        matching notes; notes matching nothing are ranked by recency and
+        connections alone.
+        
+        Returns:
+            The top `limit` (title, score) pairs, best first
+        """
+        if self.lexical_index is None:
+            self.build_lexical_index()
+        if self.relevance_index is None:
+            self.build_relevance_index()
+        return self.relevance_index.search(self.lexical_index.score_terms(tokenize(query)), limit)
+    
     def get_note_content(self, title):
         """Get the content of a note by title"""
         if title in self.index["notes"]:
@@ -380,36 +804,83 @@ class KnowledgeGarden:
         note_content = self.get_note_content(note_title)
         if not note_content:
             return f"Note '{note_title}' not found in the knowledge garden"
-        
-        # Prepare the expansion prompt based on the expansion type
-        if expansion_type == "elaborate":
-            prompt = f"Elaborate on the concepts in this note, providing more detail and examples:\n\n{note_content}"
-        elif expansion_type == "contrast":
-            prompt = f"Contrast the ideas in this note with alternative perspectives:\n\n{note_content}"
-        elif expansion_type == "question":
-            prompt = f"Generate thought-provoking questions related to this note:\n\n{note_content}"
-        elif expansion_type == "application":
-            prompt = f"Explore practical applications of the concepts in this note:\n\n{note_content}"
-        elif expansion_type == "connection":
-            prompt = f"Identify connections between this note and other domains or concepts:\n\n{note_content}"
-        else:
+        if expansion_type not in EXPANSION_PROMPTS:
             return f"Unknown expansion type: {expansion_type}"
         
-        # Get related notes for context if depth > 1
-        if depth > 1:
-            related_titles = self.index["notes"].get(note_title, {}).get("related_notes", [])
-            related_contents = []
-            
-            for related_title in related_titles[:depth]:
-                related_content = self.get_note_content(related_title)
-                if related_content:
-                    related_contents.append(f"Related note '{related_title}':\n{related_content}")
-            
-            if related_contents:
-                prompt += "\n\nAdditional context from related notes:\n\n" + "\n\n".join(related_contents)
+        context = self._expansion_context(note_title, depth)
+        expansion = self._generate_expansion(note_title, expansion_type, note_content, context)
+        return self.add_note(**expansion, generated=True)
+    
+    def expand_many(self, expansions, depth=1, max_workers=8):
+        """Expand many (note title, expansion type) pairs concurrently
+        
+        Each note's content and related-note context is loaded once and shared by
+        all of its expansions, at most max_workers LLM calls run at a time, and
+        the resulting notes are added to the garden in one batch. A failed call
+        is reported in its own result without discarding the others.
+        
+        Returns:
+            One result message per pair, in the order given
+        """
+        results = [None] * len(expansions)
+        contexts = {}
+        jobs = []
+        for i, (note_title, expansion_type) in enumerate(expansions):
+            if expansion_type not in EXPANSION_PROMPTS:
+                results[i] = f"Unknown expansion type: {expansion_type}"
+                continue
+            if note_title not in contexts:
+                note_content = self.get_note_content(note_title)
+                contexts[note_title] = (note_content, self._expansion_context(note_title, depth) if note_content else "")
+            note_content, context = contexts[note_title]
+            if not note_content:
+                results[i] = f"Note '{note_title}' not found in the knowledge garden"
+                continue
+            jobs.append((i, note_title, expansion_type, note_content, context))
+        
+        if jobs:
+            generated = {}
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(jobs))) as pool:
+                futures = {pool.submit(self._generate_expansion, *job[1:]): job for job in jobs}
+                for future in as_completed(futures):
+                    i, note_title, expansion_type = futures[future][:3]
+                    try:
+                        generated[i] = future.result()
+                    except Exception as e:
+                        # One failed call does not cost the expansions that succeeded
+                        results[i] = f"Expansion of '{note_title}' ({expansion_type}) failed: {e}"
+            order = sorted(generated)
+            for i, result in zip(order, self.add_notes([generated[i] for i in order], generated=True)):
+                results[i] = result
+        
+        return results
+    
+    def _expansion_context(self, note_title, depth):
+        """Load up to depth related notes as extra context when depth > 1"""
+        if depth <= 1:
+            return ""
+        related_titles = self.index["notes"].get(note_title, {}).get("related_notes", [])
+        related_contents = []
+        
+        for related_title in related_titles[:depth]:
+            related_content = self.get_note_content(related_title)
+            if related_content:
+                related_contents.append(f"Related note '{related_title}':\n{related_content}")
+        
+        if not related_contents:
+            return ""
+        return "\n\nAdditional context from related notes:\n\n" + "\n\n".join(related_contents)
+    
+    def _generate_expansion(self, note_title, expansion_type, note_content, context=""):
+        """Ask the model for one expansion of a note
+        
+        Returns:
+            The new note as add_note keyword arguments
+        """
+        prompt = EXPANSION_PROMPTS[expansion_type].format(content=note_content) + context
         
         # Call the AI to generate new knowledge
-        response = self.client.chat.completions.create(
+        response = self.gateway.chat_completion(
             model="gpt-4o",
             messages=[
                 {"role": "system", "content": "You are a knowledge gardener. Generate new insights based on existing notes."},
@@ -417,21 +888,72 @@ class KnowledgeGarden:
             ]
         )
         
-        expansion_content = response.choices[0].message.content
-        
         # Create a new note with the expanded knowledge
-        expansion_title = f"{note_title} - {expansion_type.capitalize()}"
-        expansion_tags = self.index["notes"].get(note_title, {}).get("tags", []) + [expansion_type]
-        
-        return self.add_note(
-            title=expansion_title,
-            content=expansion_content,
-            tags=expansion_tags,
-            related_notes=[note_title]
-        )
+        return {
+            "title": f"{note_title} - {expansion_type.capitalize()}",
+            "content": response.choices[0].message.content,
+            "tags": self.index["notes"].get(note_title, {}).get("tags", []) + [expansion_type],
+            "related_notes": [note_title]
+        }
+    
+    def extract_insights(self, text, parent_note=None, tags=None, chunk_tokens=3000, max_workers=8):
+        """Extract key insights from text and add them as separate notes
+        
+        Long texts are split into chunks of at most chunk_tokens and insights are
+        extracted from the chunks concurrently. Responses are streamed, and each
+        insight is added to the garden as soon as the model finishes it, through
+        the garden's generated_duplicate_policy. Under the "allow" policy, an
+        insight repeating one already added by this extraction is still merged into it.
+        """
+        chunks = chunk_text(text, chunk_tokens) or [text]
+        
+        # Set up related notes
+        related = []
+        if parent_note:
+            related.append(parent_note)
+        
+        # The garden's own gate catches repeats across chunks unless its policy lets them through
+        seen = MinHashLSH(threshold=self.duplicate_threshold) if self.generated_duplicate_policy == "allow" else None
+        distinct = []
+        
+        def commit(insight):
+            title, content, insight_tags = insight
+            
+            # Add user-provided tags
+            if tags:
+                insight_tags = insight_tags + [tag for tag in tags if tag not in insight_tags]
+            
+            with self.write_lock:
+                for earlier, _ in seen.query(content, title=title) if seen is not None else ():
+                    if earlier in self.index["notes"]:
+                        # Repeated by another chunk: fold it into the note already added
+                        self._merge_into(earlier, insight_tags, related)
+                        self.save_index()
+                        return
+                self.add_note(title, content, insight_tags, related, generated=True)
+                if title in self.index["notes"]:
+                    distinct.append(title)
+                    if seen is not None:
+                        seen.add(title, content, title=title)
+        
+        if len(chunks) == 1:
+            self._extract_chunk_insights(chunks[0], commit)
+        else:
+            print(f"Extracting insights from {len(chunks)} chunks")
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as pool:
+                list(pool.map(lambda chunk: self._extract_chunk_insights(chunk, commit), chunks))
+        
+        return f"Extracted {len(distinct)} insights from the text"
     
-    def extract_insights(self, text, parent_note=None, tags=None):
-        """Extract key insights from text and add them as separate notes"""
+    def _extract_chunk_insights(self, text, on_insight=None):
+        """Ask the model for the key insights of one chunk of text
+        
+        Args:
+            on_insight: Called with each (title, content, tags) tuple as soon as the model finishes it
+        
+        Returns:
+            A list of (title, content, tags) tuples
+        """
         prompt = f"""
         Extract 3-5 key insights from the following text. For each insight:
         1. Create a clear, concise title (5-10 words)
@@ -453,47 +975,16 @@ class KnowledgeGarden:
         ---
         """
         
-        response = self.client.chat.completions.create(
+        deltas = self.gateway.stream_chat_completion(
             model="gpt-4o",
             messages=[
                 {"role": "system", "content": "You are a knowledge gardener. Extract key insights from text."},
                 {"role": "user", "content": prompt}
             ]
         )
-        
-        insights_text = response.choices[0].message.content
-        
-        # Parse the insights
-        insight_pattern = r"INSIGHT TITLE: (.*?)\s*\n+CONTENT:\s*(.*?)\s*\n+TAGS: (.*?)(?:\s*\n+---|$)"
-        insights = re.findall(insight_pattern, insights_text, re.DOTALL)
-        
-        results = []
-        for title, content, tags_str in insights:
-            # Clean up the extracted data
-            title = title.strip()
-            content = content.strip()
-            insight_tags = [tag.strip() for tag in tags_str.split(",")]
-            
-            # Add user-provided tags
-            if tags:
-                insight_tags.extend(tags)
-            
-            # Set up related notes
-            related = []
-            if parent_note:
-                related.append(parent_note)
-            
-            # Add the note
-            result = self.add_note(
-                title=title,
-                content=content,
-                tags=insight_tags,
-                related_notes=related
-            )
-            results.append(result)
-        
-        return f"Extracted {len(insights)} insights from the text"
+        return parse_stream(deltas, "INSIGHT TITLE", on_insight)
     
+    @synchronized
     def create_exploration_path(self, topic, subtopics, description=None):
         """Create a structured exploration path for a topic"""
         path_id = topic.lower().replace(" ", "_")
@@ -517,11 +1008,13 @@ class KnowledgeGarden:
             "created": path_data["created"],
             "subtopics": subtopics
         }
+        self.change_feed.append(PATH_ADDED, topic=topic, **self.index["paths"][topic])
         
         self.save_index()
         
         return f"Created exploration path for '{topic}' with {len(subtopics)} subtopics"
     
+    @synchronized
     def add_note_to_path(self, path_topic, note_title):
         """Add a note to an exploration path"""
         if path_topic not in self.index["paths"]:
@@ -554,6 +1047,8 @@ class KnowledgeGardenAgent:
         # Store a reference to the global client
         global client
         self.client = client
+        # All completions go through the shared rate-limited gateway
+        self.gateway = get_gateway(client)
         
     def handle_tool_calls(self, tool_calls):
         """Process tool calls from the assistant"""
@@ -610,6 +1105,19 @@ class KnowledgeGardenAgent:
                     "depth": depth
                 }, result)
                 
+            elif function_name == "expand_many":
+                expansions = [(e.get("note_title"), e.get("expansion_type")) for e in function_args.get("expansions", [])]
+                depth = function_args.get("depth", 1)
+                
+                result = "\n".join(self.garden.expand_many(expansions, depth))
+                results.append(result)
+                
+                # Record tool usage for visualization
+                record_tool_usage("expand_many", {
+                    "expansions": len(expansions),
+                    "depth": depth
+                }, result)
+                
             elif function_name == "extract_insights":
                 text = function_args.get("text")
                 parent_note = function_args.get("parent_note")
@@ -640,7 +1148,35 @@ class KnowledgeGardenAgent:
         
         return results
     
-    def process_query(self, query, model="gpt-4o", context_notes=None, system_message=None):
+    def _pack_context(self, notes, token_budget):
+        """Format notes as context entries, stopping once the token budget is spent"""
+        context = []
+        remaining = token_budget
+        for title, note in notes.items():
+            content = note.get('content')
+            if content is None:
+                content = note_body(self.garden.get_note_content(title), title)
+            tags = note.get('tags', [])
+            entry = f"Note: {title}\nContent: {content}\nTags: {', '.join(tags)}\n---"
+            
+            entry_tokens = count_tokens(entry)
+            if entry_tokens > remaining:
+                # Truncate the last note to fit rather than dropping it entirely
+                keep_chars = max(0, len(content) * remaining // entry_tokens - len(title) - 40)
+                if keep_chars < 200:
+                    break
+                entry = f"Note: {title}\nContent: {content[:keep_chars]}...\nTags: {', '.join(tags)}\n---"
+                entry_tokens = count_tokens(entry)
+            
+            context.append(entry)
+            remaining -= entry_tokens
+            if remaining <= 0:
+                break
+        
+        return context
+    
+    def process_query(self, query, model="gpt-4o", context_notes=None, system_message=None,
+                      max_context_notes=8, context_token_budget=8000):
         """Process a user query with the AI assistant
         
         Args:
@@ -648,35 +1184,21 @@ class KnowledgeGardenAgent:
             model: The OpenAI model to use
             context_notes: Optional dict of notes to use as context (for limiting context size)
             system_message: Optional custom system message to use
+            max_context_notes: Number of notes to retrieve when context_notes is not provided
+            context_token_budget: Maximum number of tokens of note context to include
         """
         # Create system message with context from the knowledge garden
         if system_message is None:
             system_message = "You are a knowledge gardener. Your goal is to build a rich, interconnected knowledge garden by creating notes, extracting insights, and establishing connections between concepts."
             
-            # Add context from the knowledge garden if available
-            if context_notes is not None:
-                # Use the provided limited context
-                context = []
-                for title, note in context_notes.items():
-                    content = note.get('content', '')
-                    tags = note.get('tags', [])
-                    context.append(f"Note: {title}\nContent: {content}\nTags: {', '.join(tags)}\n---")
-                
-                if context:
-                    system_message += "\n\nHere are some notes from the knowledge garden that might be relevant:\n\n"
-                    system_message += "\n".join(context)
-            else:
-                # Use all notes (original behavior)
-                notes = self.garden.index.get("notes", {})
-                if notes:
-                    context = []
-                    for title, note in notes.items():
-                        content = note.get('content', '')
-                        tags = note.get('tags', [])
-                        context.append(f"Note: {title}\nContent: {content}\nTags: {', '.join(tags)}\n---")
-                    
-                    system_message += "\n\nHere are some notes from the knowledge garden that might be relevant:\n\n"
-                    system_message += "\n".join(context)
+            # Retrieve the most relevant notes rather than sending the whole garden
+            if context_notes is None:
+                context_notes = self.garden.retrieve_notes(query, limit=max_context_notes)
+            
+            context = self._pack_context(context_notes, context_token_budget)
+            if context:
+                system_message += "\n\nHere are some notes from the knowledge garden that might be relevant:\n\n"
+                system_message += "\n".join(context)
         
         messages = [
             {"role": "system", "content": system_message},
@@ -700,7 +1222,7 @@ class KnowledgeGardenAgent:
                 messages[0]["content"] = system_message
                 print(f"System message truncated. New estimated token count: {(len(system_message) + len(query)) // 4}")
         
-        response = self.client.chat.completions.create(
+        response = self.gateway.chat_completion(
             model=model,
             messages=messages,
             tools=knowledge_garden_tools,
@@ -729,7 +1251,7 @@ class KnowledgeGardenAgent:
                 })
             
             # Get a final response from the model
-            final_response = self.client.chat.completions.create(
+            final_response = self.gateway.chat_completion(
                 model=model,
                 messages=messages
             )
@@ -755,7 +1277,7 @@ class KnowledgeGardenAgent:
                 model = "gpt-4o"  # Default to gpt-4o if the specified model doesn't have vision capabilities
             
             # Create the initial response with tools
-            response = self.client.chat.completions.create(
+            response = self.gateway.chat_completion(
                 model=model,
                 messages=messages,
                 tools=knowledge_garden_tools,
@@ -786,7 +1308,7 @@ class KnowledgeGardenAgent:
                     })
                 
                 # Get a final response from the model
-                final_response = self.client.chat.completions.create(
+                final_response = self.gateway.chat_completion(
                     model=model,
                     messages=messages,
                     max_tokens=4000  # Ensure we have enough tokens for a comprehensive response
@@ -799,7 +1321,8 @@ class KnowledgeGardenAgent:
             print(f"Error in process_query_with_messages: {str(e)}")
             return f"I encountered an error while processing your query: {str(e)}"
     
-    def autonomous_exploration(self, seed_topic, iterations=5, depth=2, exploration_type='breadth'):
+    def autonomous_exploration(self, seed_topic, iterations=5, depth=2, exploration_type='breadth',
+                               progress_callback=None, should_stop=None):
         """
         Autonomously explore a topic and expand the knowledge garden
         
@@ -808,7 +1331,10 @@ class KnowledgeGardenAgent:
             iterations: Number of exploration iterations
             depth: Depth of reasoning in each iteration
             exploration_type: Type of exploration strategy ('breadth', 'depth', 'hub', 'bridge')
+            progress_callback: Optional callable(completed_iterations, total_iterations) run after each iteration
+            should_stop: Optional callable checked before each iteration; returning True ends the exploration
         """
+        hooks = {"progress_callback": progress_callback, "should_stop": should_stop}
         print(f"Starting autonomous exploration on '{seed_topic}' with {iterations} iterations")
         print(f"Exploration type: {exploration_type}, Depth: {depth}")
         
@@ -840,7 +1366,7 @@ class KnowledgeGardenAgent:
             TAGS: [tag1], [tag2], [tag3]
             """
             
-            response = self.client.chat.completions.create(
+            response = self.gateway.chat_completion(
                 model="gpt-4o",
                 messages=[
                     {"role": "system", "content": "You are a knowledge gardener. Create an initial note about a topic."},
@@ -865,7 +1391,7 @@ class KnowledgeGardenAgent:
                 content = content_match.group(1).strip()
             
             # Add the seed topic note
-            self.garden.add_note(seed_topic, content, tags)
+            self.garden.add_note(seed_topic, content, tags, generated=True)
             print(f"Created initial note for '{seed_topic}'")
             
             # Record the creation of the seed note
@@ -877,41 +1403,35 @@ class KnowledgeGardenAgent:
         # Perform exploration based on the specified type
         if exploration_type == 'breadth':
             # Breadth-first exploration - explore many related concepts
-            self._breadth_first_exploration(seed_topic, iterations, depth)
+            self._breadth_first_exploration(seed_topic, iterations, depth, **hooks)
         elif exploration_type == 'depth':
             # Depth-first exploration - explore fewer concepts in detail
-            self._depth_first_exploration(seed_topic, iterations, depth)
+            self._depth_first_exploration(seed_topic, iterations, depth, **hooks)
         elif exploration_type == 'hub':
             # Hub-focused exploration - build around central concepts
-            self._hub_focused_exploration(seed_topic, iterations, depth)
+            self._hub_focused_exploration(seed_topic, iterations, depth, **hooks)
         elif exploration_type == 'bridge':
             # Bridge-focused exploration - connect disparate knowledge areas
-            self._bridge_focused_exploration(seed_topic, iterations, depth)
+            self._bridge_focused_exploration(seed_topic, iterations, depth, **hooks)
         else:
             # Default to original exploration method
-            self._original_exploration(seed_topic, iterations, depth)
+            self._original_exploration(seed_topic, iterations, depth, **hooks)
             
-    def _original_exploration(self, seed_topic, iterations, depth):
-        """Original exploration method (for backward compatibility)"""
-        # This is the original implementation
-        for i in range(iterations):
-            print(f"Iteration {i+1}/{iterations}")
-            
-            # Get all notes from the garden
-            notes = self.garden.index.get("notes", {})
-            
-            # Choose a random note to expand on
-            if notes:
-                note_title = random.choice(list(notes.keys()))
-                note_content = self.garden.get_note_content(note_title)
-                
-                # Generate a prompt for expansion
-                prompt = f"""
+    def _generate_concepts(self, note_title, note_content, context="", on_concept=None):
+        """Ask the model for new concepts that expand on a note
+        
+        Args:
+            on_concept: Called with each (title, content, tags) tuple as soon as the model finishes it
+        
+        Returns:
+            A list of (title, content, tags) tuples
+        """
+        prompt = f"""
                 Based on the following note:
                 
                 Title: {note_title}
                 Content: {note_content}
-                
+                {context}
                 Generate new insights or related concepts that would expand our knowledge garden.
                 
                 For each new concept:
@@ -931,59 +1451,122 @@ class KnowledgeGardenAgent:
                 
                 ---
                 """
+        
+        # Stream the response so each concept can be used as soon as it is complete
+        deltas = self.gateway.stream_chat_completion(
+            model="gpt-4o",
+            messages=[
+                {"role": "system", "content": "You are a knowledge gardener. Generate new concepts to expand a knowledge garden."},
+                {"role": "user", "content": prompt}
+            ]
+        )
+        return parse_stream(deltas, "CONCEPT TITLE", on_concept)
+    
+    def _original_exploration(self, seed_topic, iterations, depth, progress_callback=None, should_stop=None):
+        """Original exploration method (for backward compatibility)"""
+        # This is the original implementation
+        for i in range(iterations):
+            if should_stop and should_stop():
+                print(f"Exploration stopped after {i} iterations")
+                break
+            print(f"Iteration {i+1}/{iterations}")
+            
+            # Get all notes from the garden
+            notes = self.garden.index.get("notes", {})
+            
+            # Choose a random note to expand on
+            if notes:
+                note_title = random.choice(list(notes.keys()))
+                note_content = self.garden.get_note_content(note_title)
                 
-                response = self.client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=[
-                        {"role": "system", "content": "You are a knowledge gardener. Generate new concepts to expand a knowledge garden."},
-                        {"role": "user", "content": prompt}
-                    ]
-                )
-                
-                concepts_text = response.choices[0].message.content
-                
-                # Parse the concepts
-                concept_pattern = r"CONCEPT TITLE: (.*?)\s*\n+CONTENT:\s*(.*?)\s*\n+TAGS: (.*?)(?:\s*\n+---|$)"
-                concepts = re.findall(concept_pattern, concepts_text, re.DOTALL)
-                
-                # Process each concept
-                for title, content, tags_str in concepts:
-                    # Clean up the extracted data
-                    title = title.strip()
-                    content = content.strip()
-                    tags = [tag.strip() for tag in tags_str.split(",")]
-                    
-                    # Add the concept as a new note
-                    self.garden.add_note(title, content, tags, related_notes=[note_title])
+                # Add each concept as a new note as soon as the model finishes it
+                def add_concept(concept, note_title=note_title):
+                    title, content, tags = concept
+                    self.garden.add_note(title, content, tags, related_notes=[note_title], generated=True)
                     print(f"Added concept '{title}' related to '{note_title}'")
+                
+                self._generate_concepts(note_title, note_content, on_concept=add_concept)
             else:
                 # If no notes exist yet, create one for the seed topic
                 self.garden.extract_insights(f"The topic of {seed_topic} is interesting and worth exploring.", parent_note=seed_topic)
                 print(f"Created initial insights for '{seed_topic}'")
-                
-    def _breadth_first_exploration(self, seed_topic, iterations, depth):
+            
+            if progress_callback:
+                progress_callback(i + 1, iterations)
+    
+    def _frontier_exploration(self, seed_topic, iterations, depth, strategy, progress_callback=None, should_stop=None):
+        """Expand the highest-scoring note on the strategy's frontier each iteration
+        
+        Concepts whose titles already exist are skipped rather than rewritten, and a
+        note whose expansion yields nothing new discounts its neighbourhood so later
+        iterations move to less explored regions.
+        """
+        frontier = ExplorationFrontier.from_index(self.garden.index, strategy=strategy, seed=seed_topic)
+        notes = self.garden.index.get("notes", {})
+        
+        for i in range(iterations):
+            if should_stop and should_stop():
+                print(f"Exploration stopped after {i} iterations")
+                break
+            
+            note_title = frontier.pop()
+            if note_title is None:
+                print(f"Exploration frontier exhausted after {i} iterations")
+                break
+            
+            print(f"Iteration {i+1}/{iterations}: expanding '{note_title}'")
+            note_content = self.garden.get_note_content(note_title)
+            
+            # Name up to depth-1 neighbouring notes so the model steers away from them
+            context = ""
+            neighbors = sorted(frontier.neighbors.get(note_title, ()))[:max(0, depth - 1)]
+            if neighbors:
+                context = "\n                Neighbouring notes already in the garden (avoid repeating them):\n"
+                context += "".join(f"                - {title}\n" for title in neighbors)
+            
+            added = []
+            
+            # Concepts are added as they stream in, overlapping generation with writes
+            def add_concept(concept, note_title=note_title):
+                title, content, tags = concept
+                if title in notes or title == note_title:
+                    return  # Already covered, don't overwrite an existing note
+                result = self.garden.add_note(title, content, tags, related_notes=[note_title], generated=True)
+                if title not in notes:
+                    print(result)  # Merged into or rejected as a near-duplicate
+                    return
+                frontier.add_note(title, tags, self.garden.index["notes"][title]["related_notes"])
+                added.append(title)
+                print(f"Added concept '{title}' related to '{note_title}'")
+            
+            self._generate_concepts(note_title, note_content, context, on_concept=add_concept)
+            
+            frontier.mark_expanded(note_title)
+            if not added:
+                frontier.mark_redundant(note_title)
+            
+            if progress_callback:
+                progress_callback(i + 1, iterations)
+    
+    def _breadth_first_exploration(self, seed_topic, iterations, depth, progress_callback=None, should_stop=None):
         """Breadth-first exploration strategy - explore many related concepts"""
-        # Implementation will be added in the next update
         print(f"Using breadth-first exploration for '{seed_topic}'")
-        self._original_exploration(seed_topic, iterations, depth)
+        self._frontier_exploration(seed_topic, iterations, depth, 'breadth', progress_callback, should_stop)
         
-    def _depth_first_exploration(self, seed_topic, iterations, depth):
+    def _depth_first_exploration(self, seed_topic, iterations, depth, progress_callback=None, should_stop=None):
         """Depth-first exploration strategy - explore fewer concepts in detail"""
-        # Implementation will be added in the next update
         print(f"Using depth-first exploration for '{seed_topic}'")
-        self._original_exploration(seed_topic, iterations, depth)
+        self._frontier_exploration(seed_topic, iterations, depth, 'depth', progress_callback, should_stop)
         
-    def _hub_focused_exploration(self, seed_topic, iterations, depth):
+    def _hub_focused_exploration(self, seed_topic, iterations, depth, progress_callback=None, should_stop=None):
         """Hub-focused exploration strategy - build around central concepts"""
-        # Implementation will be added in the next update
         print(f"Using hub-focused exploration for '{seed_topic}'")
-        self._original_exploration(seed_topic, iterations, depth)
+        self._frontier_exploration(seed_topic, iterations, depth, 'hub', progress_callback, should_stop)
         
-    def _bridge_focused_exploration(self, seed_topic, iterations, depth):
+    def _bridge_focused_exploration(self, seed_topic, iterations, depth, progress_callback=None, should_stop=None):
         """Bridge-focused exploration strategy - connect disparate knowledge areas"""
-        # Implementation will be added in the next update
         print(f"Using bridge-focused exploration for '{seed_topic}'")
-        self._original_exploration(seed_topic, iterations, depth)
+        self._frontier_exploration(seed_topic, iterations, depth, 'bridge', progress_callback, should_stop)
 
 def main():
     parser = argparse.ArgumentParser(description="Knowledge Garden Manager")
@@ -992,6 +1575,9 @@ def main():
     parser.add_argument("--iterations", type=int, default=5, help="Number of iterations for autonomous exploration")
     parser.add_argument("--interactive", action="store_true", help="Start interactive mode")
     parser.add_argument("--api-key", type=str, help="OpenAI API key (alternatively, set OPENAI_API_KEY environment variable)")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=DEFAULT_BACKEND, help="LLM backend ('fake' runs offline with deterministic responses)")
+    parser.add_argument("--duplicate-policy", choices=DUPLICATE_POLICIES, default="link", help="How notes you add that nearly duplicate an existing note are handled")
+    parser.add_argument("--generated-duplicate-policy", choices=DUPLICATE_POLICIES, default="merge", help="How generated notes (explorations, expansions, insights) that nearly duplicate an existing note are handled")
     parser.add_argument("--visualize", action="store_true", help="Launch visualization after exploration")
     parser.add_argument("--view", action="store_true", help="Launch visualization of the existing knowledge garden")
     
@@ -1026,9 +1612,10 @@ def main():
     
     # Initialize OpenAI client
     global client
-    client = initialize_openai_client(args.api_key)
+    client = initialize_openai_client(args.api_key, args.backend)
     
-    garden = KnowledgeGarden(args.garden)
+    garden = KnowledgeGarden(args.garden, duplicate_policy=args.duplicate_policy,
+                             generated_duplicate_policy=args.generated_duplicate_policy)
     agent = KnowledgeGardenAgent(garden)
     
     if args.explore:
@@ -4,6 +4,7 @@ import json
 import sys
 import http.server
 import socketserver
+import threading
 from urllib.parse import urlparse, parse_qs
 from pathlib import Path
 
@@ -16,6 +17,20 @@ PORT = 8001
 API_DIR = Path(__file__).parent
 GARDEN_DIR = API_DIR.parent.parent  # knowledge_garden directory
 
+# Analyzer shared by all requests, kept current from the garden's change feed
+_analyzer = None
+_analyzer_lock = threading.Lock()
+
+def get_analyzer():
+    """Return the shared analyzer, applying the garden changes made since the last request"""
+    global _analyzer
+    with _analyzer_lock:
+        if _analyzer is None:
+            _analyzer = knowledge_graph_analysis.KnowledgeGraphAnalyzer(str(GARDEN_DIR))
+        else:
+            _analyzer.sync()
+        return _analyzer
+
 class APIHandler(http.server.SimpleHTTPRequestHandler):
     """Handler for API requests"""
     
@@ -27,7 +42,7 @@ class APIHandler(http.server.SimpleHTTPRequestHandler):
         """Initialize the knowledge graph analyzer if needed"""
         if self.analyzer is None:
             try:
-                self.analyzer = knowledge_graph_analysis.KnowledgeGraphAnalyzer(str(GARDEN_DIR))
+                self.analyzer = get_analyzer()
             except Exception as e:
                 self.send_error(500, f"Error initializing analyzer: {str(e)}")
                 return False
@@ -48,7 +63,7 @@ class APIHandler(http.server.SimpleHTTPRequestHandler):
         elif path == '/api/communities.json':
             self.handle_communities()
         elif path == '/api/centrality.json':
-            self.handle_centrality()
+            self.handle_centrality(query)
         elif path == '/api/paths.json':
             self.handle_paths(query)
         elif path == '/api/subgraph.json':
@@ -136,8 +151,30 @@ class APIHandler(http.server.SimpleHTTPRequestHandler):
         except Exception as e:
             self.send_error(500, f"Error detecting communities: {str(e)}")
     
-    def handle_centrality(self):
-        """Handle centrality API endpoint"""
+    def handle_centrality(self, query):
+        """Handle centrality API endpoint
+        
+        `?mode=approximate` (optionally with `samples` or `epsilon`) computes
+        sampled centrality with error estimates instead of the cached exact file.
+        """
+        mode = query.get('mode', ['exact'])[0]
+        if mode != 'exact':
+            if not self.initialize_analyzer():
+                return
+            try:
+                samples = int(query['samples'][0]) if 'samples' in query else None
+                epsilon = float(query['epsilon'][0]) if 'epsilon' in query else None
+            except ValueError:
+                self.send_error(400, "Invalid samples or epsilon parameter")
+                return
+            try:
+                self.send_json_response(self.analyzer.compute_centrality_measures(mode, samples=samples, epsilon=epsilon))
+            except ValueError as e:
+                self.send_error(400, str(e))
+            except Exception as e:
+                self.send_error(500, f"Error computing centrality measures: {str(e)}")
+            return
+        
         # Check if the centrality file exists
         centrality_file = API_DIR / 'centrality.json'
         if centrality_file.exists():
@@ -140,6 +140,9 @@ function handleToolUsage(data) {
         case 'expand_knowledge':
             message += ` - Expanded "${args.note_title}" (${args.expansion_type})`;
             break;
+        case 'expand_many':
+            message += ` - Ran ${args.expansions} expansions`;
+            break;
         case 'extract_insights':
             message += ` - Extracted insights`;
             if (args.parent_note) {
@@ -188,6 +191,8 @@ function formatToolName(toolName) {
             return '<span class="tool-icon search-notes">SN</span>Search Notes';
         case 'expand_knowledge':
             return '<span class="tool-icon expand-knowledge">EK</span>Expand Knowledge';
+        case 'expand_many':
+            return '<span class="tool-icon expand-knowledge">EM</span>Expand Many';
         case 'extract_insights':
             return '<span class="tool-icon extract-insights">EI</span>Extract Insights';
         case 'create_exploration_path':
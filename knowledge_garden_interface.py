@@ -12,7 +12,7 @@ import tempfile
 import matplotlib.pyplot as plt
 import io
 import numpy as np
-from collections import Counter
+from collections import Counter, deque
 
 # Flask for web interface
 from flask import Flask, request, render_template, redirect, url_for, flash, jsonify, send_from_directory
@@ -21,11 +21,26 @@ from werkzeug.utils import secure_filename
 # Import the knowledge garden
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from knowledge_garden import KnowledgeGarden, KnowledgeGardenAgent, initialize_openai_client
+from llm_backends import BACKENDS, DEFAULT_BACKEND
+from near_duplicates import DUPLICATE_POLICIES
+from exploration_jobs import JobQueue, ExplorationWorkerPool
+from image_cache import ImagePayloadCache
+from image_pyramid import ImagePyramid
+from conversation_compaction import ConversationCompactor
+from query_cache import QueryCache
 
 # Global variables
 client = None
 garden = None
 agent = None
+job_queue = None
+worker_pool = None
+image_cache = None
+image_pyramid = None
+query_cache = None
+
+# Token savings of the most recent multi-round queries
+compaction_reports = deque(maxlen=100)
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -39,6 +54,10 @@ MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50MB limit
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
 
+# History size (in tokens, excluding the system context and question) above which
+# older reasoning rounds are summarized
+COMPACTION_TOKEN_THRESHOLD = int(os.environ.get("KNOWLEDGE_GARDEN_COMPACTION_TOKENS", 4000))
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
@@ -92,33 +111,22 @@ def process_image_file(file_path):
     # Use absolute URL to ensure it's accessible in the web interface
     content = f"![{title}]({image_url})\n\n"
     
-    # Add base64 encoding of the image for GPT-4o to see the image
+    # Build the renditions in the background; only the header is read here
     try:
         from PIL import Image
         
-        # Open the image and convert to base64
-        img = Image.open(file_path)
-        
-        # Resize large images to reduce size
-        max_size = (1200, 1200)
-        if img.width > max_size[0] or img.height > max_size[1]:
-            img.thumbnail(max_size, Image.LANCZOS)
-        
-        # Convert to base64
-        buffer = io.BytesIO()
-        img_format = Path(file_path).suffix[1:].upper()
-        if img_format not in ['JPEG', 'PNG', 'GIF']:
-            img_format = 'PNG'  # Default to PNG for unsupported formats
-        
-        img.save(buffer, format=img_format)
-        img_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
+        img_format = image_format(file_path)
+        pyramid = get_image_pyramid()
+        pyramid_id, _ = pyramid.submit(file_path, pyramid.source_digest(file_path), img_format)
+        with Image.open(file_path) as img:
+            width, height = img.size
         
-        # Add base64 data to the content (commented out so it doesn't show in the UI)
-        content += f"<!-- Base64 image data for AI models: data:image/{img_format.lower()};base64,{img_base64} -->\n\n"
+        # Record the renditions so the image can be served and queried without reprocessing
+        content += f"<!-- Image renditions: {pyramid_id} -->\n\n"
         
         # Add image metadata
         content += f"Image uploaded on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
-        content += f"Dimensions: {img.width}x{img.height} pixels\n"
+        content += f"Dimensions: {width}x{height} pixels\n"
         
     except Exception as e:
         # If there's an error with the image processing, just add basic info
@@ -645,25 +653,26 @@ def process_query():
                 print(f"Error processing image for query: {str(e)}")
     
     try:
-        # Step 1: Find relevant nodes in the knowledge graph
-        relevant_nodes = find_relevant_nodes(query, max_nodes=max_context_nodes)
+        # Step 1: Find relevant nodes in the knowledge graph (reusing a cached preview of the same query)
+        prompt_type = query_type if query_type in ('expand', 'connect', 'synthesize') else 'direct'
+        relevant_nodes, system_message = prepare_query_context(query, prompt_type, max_context_nodes)
         
         # Step 2: Process the query using the graph-based approach
         if query_type == 'direct':
             # Direct query - answer from existing knowledge
-            response = process_direct_query(query, relevant_nodes, image_url, image_data)
+            response = process_direct_query(query, relevant_nodes, image_url, image_data, system_message)
         elif query_type == 'expand':
             # Expand knowledge - generate new insights
-            response = process_expand_query(query, relevant_nodes, reasoning_depth, image_url, image_data)
+            response = process_expand_query(query, relevant_nodes, reasoning_depth, image_url, image_data, system_message)
         elif query_type == 'connect':
             # Connect concepts - find relationships
-            response = process_connect_query(query, relevant_nodes, reasoning_depth, image_url, image_data)
+            response = process_connect_query(query, relevant_nodes, reasoning_depth, image_url, image_data, system_message)
         elif query_type == 'synthesize':
             # Synthesize knowledge - create new understanding
-            response = process_synthesize_query(query, relevant_nodes, reasoning_depth, image_url, image_data)
+            response = process_synthesize_query(query, relevant_nodes, reasoning_depth, image_url, image_data, system_message)
         else:
             # Default to direct query
-            response = process_direct_query(query, relevant_nodes, image_url, image_data)
+            response = process_direct_query(query, relevant_nodes, image_url, image_data, system_message)
         
         # Step 3: Add insights to the knowledge garden if requested
         if add_to_garden:
@@ -711,98 +720,47 @@ def find_relevant_nodes(query, max_nodes=5):
     if not notes:
         return {}
     
-    # Extract keywords from the query
-    keywords = set(query.lower().split())
-    # Remove common words
-    stop_words = {'the', 'a', 'an', 'in', 'on', 'at', 'to', 'for', 'with', 'by', 'about', 'as', 'of', 'and', 'or', 'is', 'are', 'what', 'how', 'why', 'when', 'where', 'who', 'which'}
-    keywords = keywords - stop_words
-    
-    # Score each note based on multiple factors (agentic knowledge graph principles)
-    scored_notes = []
-    for title, note in notes.items():
-        # Initialize with different scoring components
-        keyword_score = 0
-        recency_score = 0
-        connection_score = 0
-        importance_score = 0
-        
-        # 1. Keyword matching (content relevance)
-        title_lower = title.lower()
-        for keyword in keywords:
-            if keyword in title_lower:
-                keyword_score += 3  # Higher weight for title matches
-        
-        # Check content
-        if 'content' in note:
-            content_lower = note['content'].lower()
-            for keyword in keywords:
-                keyword_score += content_lower.count(keyword)
-        
-        # Check tags
-        if 'tags' in note:
-            for tag in note['tags']:
-                tag_lower = tag.lower()
-                for keyword in keywords:
-                    if keyword in tag_lower:
-                        keyword_score += 2  # Higher weight for tag matches
-        
-        # 2. Recency (temporal relevance)
-        if 'created' in note:
-            # Calculate days since creation (newer notes get higher scores)
-            try:
-                created_date = datetime.fromisoformat(note['created'])
-                days_old = (datetime.now() - created_date).days
-                recency_score = max(0, 10 - (days_old / 30))  # Higher score for newer notes
-            except (ValueError, TypeError):
-                pass
-        
-        # 3. Connection density (graph centrality)
-        if 'related_notes' in note:
-            connection_score = len(note.get('related_notes', [])) * 0.5  # More connections = higher score
-        
-        # 4. Importance (based on note length and structure)
-        if 'content' in note:
-            content_length = len(note['content'])
-            importance_score = min(5, content_length / 500)  # Longer notes up to a point
-        
-        # Calculate final score with weighted components
-        final_score = (
-            keyword_score * 1.0 +  # Primary factor
-            recency_score * 0.3 +  # Recency matters but less than relevance
-            connection_score * 0.5 +  # Connections are important
-            importance_score * 0.2   # Note importance is a minor factor
-        )
-        
-        scored_notes.append((title, note, final_score))
-    
-    # Sort by score and take the top N
-    scored_notes.sort(key=lambda x: x[2], reverse=True)
-    
-    # Get the top nodes
-    top_nodes = {title: note for title, note, _ in scored_notes[:max_nodes]}
-    
-    # If we have less than max_nodes, try to add related notes to provide more context
-    if len(top_nodes) < max_nodes and len(top_nodes) > 0:
-        # Collect all related notes from our top nodes
-        related_titles = set()
-        for note in top_nodes.values():
-            if 'related_notes' in note:
-                related_titles.update(note['related_notes'])
-        
-        # Remove notes we already have
-        related_titles = related_titles - set(top_nodes.keys())
-        
-        # Add related notes until we reach max_nodes
-        for title in related_titles:
+    # Fuse the BM25, semantic and link-graph rankings from the garden's retrieval indexes
+    scored_notes = garden.hybrid_search(query, limit=max_nodes)
+    top_nodes = {title: notes[title] for title, _ in scored_notes if title in notes}
+
+    # If nothing matched well enough, fill up with keyword matches and recent, well-connected notes
+    if len(top_nodes) < max_nodes:
+        for title, _ in garden.relevance_search(query, limit=max_nodes + len(top_nodes)):
             if title in notes and len(top_nodes) < max_nodes:
-                top_nodes[title] = notes[title]
-    
+                top_nodes.setdefault(title, notes[title])
+
     return top_nodes
 
-def process_direct_query(query, relevant_nodes, image_url=None, image_data=None):
+def get_query_cache():
+    """Return the query cache of the current garden, creating it on first use"""
+    global query_cache
+    if query_cache is None or query_cache.garden is not garden:
+        query_cache = QueryCache(garden)
+    return query_cache
+
+def prepare_query_context(query, query_type, max_context_nodes):
+    """Find the relevant nodes for a query and build its system message, or reuse a cached result
+    
+    Returns:
+        A (relevant_nodes, system_message) tuple
+    """
+    cache = get_query_cache()
+    key = cache.make_key(query, query_type, max_context_nodes)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    
+    mark = cache.mark()
+    relevant_nodes = find_relevant_nodes(query, max_nodes=max_context_nodes)
+    system_message = generate_system_message(query_type, relevant_nodes)
+    cache.put(key, list(relevant_nodes), (relevant_nodes, system_message), mark)
+    return relevant_nodes, system_message
+
+def process_direct_query(query, relevant_nodes, image_url=None, image_data=None, system_message=None):
     """Process a direct query using the relevant nodes"""
-    # Generate the system message
-    system_message = generate_system_message('direct', relevant_nodes)
+    # Generate the system message, unless it was prepared with the relevant nodes
+    system_message = system_message or generate_system_message('direct', relevant_nodes)
     
     # Generate the user message
     user_message = generate_user_message(query, 'direct', image_data)
@@ -814,10 +772,10 @@ def process_direct_query(query, relevant_nodes, image_url=None, image_data=None)
     
     return response
 
-def process_expand_query(query, relevant_nodes, reasoning_depth=2, image_url=None, image_data=None):
+def process_expand_query(query, relevant_nodes, reasoning_depth=2, image_url=None, image_data=None, system_message=None):
     """Process a query to expand knowledge using iterative reasoning"""
-    # Generate the system message
-    system_message = generate_system_message('expand', relevant_nodes)
+    # Generate the system message, unless it was prepared with the relevant nodes
+    system_message = system_message or generate_system_message('expand', relevant_nodes)
     
     # Generate the user message
     user_message = generate_user_message(query, 'expand', image_data)
@@ -829,62 +787,61 @@ def process_expand_query(query, relevant_nodes, reasoning_depth=2, image_url=Non
     
     return response
 
-def process_connect_query(query, relevant_nodes, reasoning_depth=2, image_url=None, image_data=None):
+def process_connect_query(query, relevant_nodes, reasoning_depth=2, image_url=None, image_data=None, system_message=None):
     """Process a query to connect concepts using graph-based reasoning"""
-    # Generate the system message
-    system_message = generate_system_message('connect', relevant_nodes)
+    # Generate the system message, unless it was prepared with the relevant nodes
+    system_message = system_message or generate_system_message('connect', relevant_nodes)
     
     # Generate the user message
     user_message = generate_user_message(query, 'connect', image_data)
     
-    # Initial response
-    global agent
-    messages = [system_message, user_message]
-    response = agent.process_query_with_messages(messages)
-    
     # Iterative reasoning to identify deeper connections
-    for i in range(reasoning_depth - 1):
-        # Add the previous response to the messages
-        messages.append({"role": "assistant", "content": response})
-        
-        # Add a follow-up prompt
-        messages.append({
-            "role": "user", 
-            "content": [{"type": "text", "text": "Please identify additional connections and patterns between these concepts."}]
-        })
-        
-        # Get the next response
-        response = agent.process_query_with_messages(messages)
-    
-    return response
+    return run_reasoning_rounds(query, system_message, user_message, reasoning_depth,
+                                "Please identify additional connections and patterns between these concepts.")
 
-def process_synthesize_query(query, relevant_nodes, reasoning_depth=2, image_url=None, image_data=None):
+def process_synthesize_query(query, relevant_nodes, reasoning_depth=2, image_url=None, image_data=None, system_message=None):
     """Process a query to synthesize new knowledge using iterative reasoning"""
-    # Generate the system message
-    system_message = generate_system_message('synthesize', relevant_nodes)
+    # Generate the system message, unless it was prepared with the relevant nodes
+    system_message = system_message or generate_system_message('synthesize', relevant_nodes)
     
     # Generate the user message
     user_message = generate_user_message(query, 'synthesize', image_data)
     
-    # Initial response
+    # Iterative reasoning to synthesize new knowledge
+    return run_reasoning_rounds(query, system_message, user_message, reasoning_depth,
+                                "Please continue synthesizing new knowledge based on these concepts.")
+
+def run_reasoning_rounds(query, system_message, user_message, reasoning_depth, follow_up):
+    """Ask for an initial response, then reasoning_depth - 1 follow-ups
+    
+    Older rounds are compacted into a rolling summary once the history grows
+    past the compaction threshold, and the token savings are recorded per query.
+    """
     global agent
+    compactor = ConversationCompactor(agent.gateway, token_threshold=COMPACTION_TOKEN_THRESHOLD)
+    
+    # Initial response
     messages = [system_message, user_message]
+    compactor.record_round(messages)
     response = agent.process_query_with_messages(messages)
     
-    # Iterative reasoning to synthesize new knowledge
     for i in range(reasoning_depth - 1):
-        # Add the previous response to the messages
+        # Add the previous response and a follow-up prompt
         messages.append({"role": "assistant", "content": response})
+        messages.append({"role": "user", "content": [{"type": "text", "text": follow_up}]})
         
-        # Add a follow-up prompt
-        messages.append({
-            "role": "user", 
-            "content": [{"type": "text", "text": "Please continue synthesizing new knowledge based on these concepts."}]
-        })
-        
-        # Get the next response
+        # Get the next response, summarizing older rounds if the history is too long
+        messages = compactor.compact(messages)
+        compactor.record_round(messages)
         response = agent.process_query_with_messages(messages)
     
+    report = compactor.report()
+    report["query"] = query[:100]
+    compaction_reports.append(report)
+    if report["compactions"]:
+        print(f"Compacted reasoning for '{query[:50]}': {report['prompt_tokens']} prompt tokens instead of "
+              f"{report['uncompacted_prompt_tokens']} ({report['saved_tokens']} saved after summaries)")
+    
     return response
 
 @app.route('/note/<title>')
@@ -910,47 +867,40 @@ def explore_topic():
         flash('Please enter a topic to explore')
         return redirect(url_for('index'))
     
-    print(f"Starting autonomous exploration on '{topic}' with {iterations} iterations")
-    print(f"Exploration type: {exploration_type}, Depth: {1 if exploration_type == 'breadth' else 2 if exploration_type in ['hub', 'bridge'] else 3}")
-    
-    # Start exploration in a background thread without using Flask's flash
-    import threading
-    
-    def run_exploration():
-        try:
-            if exploration_type == 'breadth':
-                # Breadth-first exploration - explore many related concepts
-                agent.autonomous_exploration(topic, iterations=iterations, depth=1, exploration_type='breadth')
-                print(f'Breadth-first exploration of "{topic}" completed with {iterations} iterations')
-            elif exploration_type == 'depth':
-                # Depth-first exploration - explore fewer concepts in detail
-                agent.autonomous_exploration(topic, iterations=iterations, depth=3, exploration_type='depth')
-                print(f'Depth-first exploration of "{topic}" completed with {iterations} iterations')
-            elif exploration_type == 'hub':
-                # Hub-focused exploration - build around central concepts
-                agent.autonomous_exploration(topic, iterations=iterations, depth=2, exploration_type='hub')
-                print(f'Hub-focused exploration of "{topic}" completed with {iterations} iterations')
-            elif exploration_type == 'bridge':
-                # Bridge-focused exploration - connect disparate knowledge areas
-                agent.autonomous_exploration(topic, iterations=iterations, depth=2, exploration_type='bridge')
-                print(f'Bridge-focused exploration of "{topic}" completed with {iterations} iterations')
-            else:
-                # Default to breadth-first
-                agent.autonomous_exploration(topic, iterations=iterations)
-                print(f'Exploration of "{topic}" completed with {iterations} iterations')
-        except Exception as e:
-            print(f'Error during exploration: {str(e)}')
-            import traceback
-            traceback.print_exc()
-    
-    # Start the exploration in a background thread
-    thread = threading.Thread(target=run_exploration)
-    thread.daemon = True
-    thread.start()
-    
-    flash(f'Started exploration of "{topic}" with {iterations} iterations. This will run in the background.')
+    # Unknown strategies default to breadth-first, with a depth of reasoning per strategy
+    if exploration_type not in ['breadth', 'depth', 'hub', 'bridge']:
+        exploration_type = 'breadth'
+    depth = 1 if exploration_type == 'breadth' else 2 if exploration_type in ['hub', 'bridge'] else 3
+    
+    # Queue the exploration; the worker pool runs it in the background
+    job_id = job_queue.submit(topic, iterations=iterations, exploration_type=exploration_type, depth=depth)
+    worker_pool.notify()
+    print(f"Queued exploration job {job_id} on '{topic}' ({exploration_type}, {iterations} iterations, depth {depth})")
+    
+    flash(f'Queued exploration of "{topic}" with {iterations} iterations as job {job_id}. Track it at /jobs/{job_id}.')
     return redirect(url_for('index'))
 
+@app.route('/jobs')
+def list_jobs():
+    """List recent exploration jobs"""
+    return jsonify(job_queue.list_jobs(limit=request.args.get('limit', 50, type=int)))
+
+@app.route('/jobs/<int:job_id>')
+def job_status(job_id):
+    """Status and progress of an exploration job"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Job {job_id} not found"}), 404
+    job["progress"] = job["completed_iterations"] / job["iterations"] if job["iterations"] else 1.0
+    return jsonify(job)
+
+@app.route('/jobs/<int:job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a queued or running exploration job"""
+    if not job_queue.cancel(job_id):
+        return jsonify({"error": f"Job {job_id} is not queued or running"}), 409
+    return jsonify(job_queue.get(job_id))
+
 @app.route('/uploads/<filename>')
 def uploaded_file(filename):
     """Serve uploaded files"""
@@ -970,8 +920,28 @@ def view_image(title):
     base64_match = re.search(r'<!-- Base64 image data for AI models: (data:image/.*?) -->', content)
     base64_data = base64_match.group(1) if base64_match else None
     
+    # Newer notes reference their renditions instead of embedding the image
+    thumbnail_url = None
+    renditions_match = re.search(r'<!-- Image renditions: (\w+) -->', content)
+    if renditions_match:
+        pyramid_id = renditions_match.group(1)
+        thumbnail_url = url_for('image_rendition', pyramid_id=pyramid_id, name='thumbnail')
+        low_path = get_image_pyramid().lookup(pyramid_id, 'low')
+        if base64_data is None and low_path is not None:
+            with open(low_path, 'rb') as f:
+                low_base64 = base64.b64encode(f.read()).decode('utf-8')
+            base64_data = f"data:image/{low_path.suffix[1:]};base64,{low_base64}"
+    
     return render_template('image.html', title=title, content=content, 
-                          image_url=image_url, base64_data=base64_data)
+                          image_url=image_url, base64_data=base64_data, thumbnail_url=thumbnail_url)
+
+@app.route('/renditions/<pyramid_id>/<name>')
+def image_rendition(pyramid_id, name):
+    """Serve a derived rendition (thumbnail, low, high or auto) of an uploaded image"""
+    path = get_image_pyramid().lookup(secure_filename(pyramid_id), name)
+    if path is None:
+        return jsonify({"error": "Rendition not available"}), 404
+    return send_from_directory(path.parent, path.name)
 
 @app.route('/preview_query', methods=['POST'])
 def preview_query():
@@ -1003,11 +973,8 @@ def preview_query():
             except Exception as e:
                 print(f"Error processing image for preview: {str(e)}")
     
-    # Find relevant nodes in the knowledge graph
-    relevant_nodes = find_relevant_nodes(query, max_nodes=max_context_nodes)
-    
-    # Generate the system message
-    system_message = generate_system_message(query_type, relevant_nodes)
+    # Find relevant nodes in the knowledge graph and generate the system message
+    relevant_nodes, system_message = prepare_query_context(query, query_type, max_context_nodes)
     
     # Generate the user message
     user_message = generate_user_message(query, query_type, image_data)
@@ -1593,6 +1560,13 @@ def main():
     parser.add_argument("--port", type=int, default=5000, help="Port to run the web server on")
     parser.add_argument("--host", default="0.0.0.0", help="Host to run the web server on")
     parser.add_argument("--api-key", type=str, help="OpenAI API key (alternatively, set OPENAI_API_KEY environment variable)")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=DEFAULT_BACKEND, help="LLM backend ('fake' runs offline with deterministic responses)")
+    parser.add_argument("--duplicate-policy", choices=DUPLICATE_POLICIES, default="link", help="How notes you add that nearly duplicate an existing note are handled")
+    parser.add_argument("--generated-duplicate-policy", choices=DUPLICATE_POLICIES, default="merge", help="How generated notes (explorations, expansions, insights) that nearly duplicate an existing note are handled")
+    parser.add_argument("--workers", type=int, default=2, help="Number of explorations to run concurrently")
+    parser.add_argument("--jobs-db", type=str, help="SQLite file for the exploration job queue (default: <garden>/jobs.sqlite3)")
+    parser.add_argument("--image-workers", type=int, default=2, help="Processes that build image renditions")
+    parser.add_argument("--image-cache-mb", type=int, default=64, help="Memory budget for prepared image payloads, in MB")
     
     args = parser.parse_args()
     
@@ -1603,23 +1577,64 @@ def main():
     os.makedirs(UPLOAD_FOLDER, exist_ok=True)
     
     # Initialize OpenAI client
-    global client, garden, agent
-    client = initialize_openai_client(args.api_key)
+    global client, garden, agent, job_queue, worker_pool, image_cache, image_pyramid
+    client = initialize_openai_client(args.api_key, args.backend)
     
     # Make sure the client is also set in the knowledge_garden module
     import knowledge_garden
     knowledge_garden.client = client
     
     # Initialize knowledge garden and agent
-    garden = KnowledgeGarden(args.garden)
+    garden = KnowledgeGarden(args.garden, duplicate_policy=args.duplicate_policy,
+                             generated_duplicate_policy=args.generated_duplicate_policy)
     agent = KnowledgeGardenAgent(garden)
+    # Load the embedding model now rather than in the first query; missing notes are encoded in the background
+    garden.build_vector_index()
+    image_cache = ImagePayloadCache(max_memory_bytes=args.image_cache_mb * 1024 * 1024)
+    image_pyramid = ImagePyramid(Path(args.garden) / "cache" / "renditions", workers=args.image_workers)
+    
+    # Start the exploration workers, resuming jobs whose process crashed (jobs other live processes run keep their heartbeat)
+    job_queue = JobQueue(args.jobs_db or Path(args.garden) / "jobs.sqlite3")
+    resumed = job_queue.requeue_interrupted()
+    if resumed:
+        print(f"Resuming {resumed} interrupted exploration job(s)")
+    worker_pool = ExplorationWorkerPool(job_queue, agent, workers=args.workers)
+    worker_pool.start()
     
     print(f"Knowledge Garden Interface running at http://{args.host}:{args.port}")
-    app.run(host=args.host, port=args.port, debug=True)
+    # The reloader would start a second process with its own worker pool
+    app.run(host=args.host, port=args.port, debug=True, use_reloader=False)
+
+def get_image_cache():
+    """Return the shared image payload cache, creating it under the garden directory on first use"""
+    global image_cache
+    if image_cache is None:
+        image_cache = ImagePayloadCache()
+    return image_cache
+
+def get_image_pyramid():
+    """Return the shared rendition builder, creating it under the garden directory on first use"""
+    global image_pyramid
+    if image_pyramid is None:
+        image_pyramid = ImagePyramid(Path(garden.garden_dir) / "cache" / "renditions")
+    return image_pyramid
+
+def image_format(file_path):
+    """Image format used for an upload's renditions and payloads"""
+    img_format = Path(file_path).suffix[1:].upper()
+    if img_format == 'JPG':
+        img_format = 'JPEG'
+    if img_format not in ['JPEG', 'PNG', 'GIF', 'WEBP']:
+        img_format = 'PNG'  # Default to PNG for unsupported formats
+    return img_format
 
 def process_image_for_query(file_path, detail="auto"):
     """Process an image for a query according to OpenAI API standards
     
+    The image is resized once, in the rendition pool, and prepared payloads are
+    cached in memory by file, detail level and format, so repeat queries and
+    preview-then-submit flows only stat the file, and a miss reads a rendition.
+    
     Args:
         file_path: Path to the image file
         detail: Level of detail for image analysis ('auto', 'low', or 'high')
@@ -1628,58 +1643,25 @@ def process_image_for_query(file_path, detail="auto"):
         A dictionary formatted for the OpenAI API with the image data
     """
     try:
-        from PIL import Image
-        import io
+        img_format = image_format(file_path)
         
-        # Open the image
-        img = Image.open(file_path)
-        
-        # Resize images based on detail level according to OpenAI documentation
-        if detail == "low":
-            # For low detail, resize to 512x512
-            img.thumbnail((512, 512), Image.LANCZOS)
-        elif detail == "high":
-            # For high detail, ensure the shortest side is 768px and longest side is under 2000px
-            width, height = img.size
-            
-            # First, ensure the image fits within a 2048x2048 square
-            if max(width, height) > 2048:
-                scale_factor = 2048 / max(width, height)
-                new_width = int(width * scale_factor)
-                new_height = int(height * scale_factor)
-                img = img.resize((new_width, new_height), Image.LANCZOS)
-                width, height = new_width, new_height
-            
-            # Then, ensure the shortest side is 768px
-            shortest_side = min(width, height)
-            if shortest_side != 768:
-                scale_factor = 768 / shortest_side
-                new_width = int(width * scale_factor)
-                new_height = int(height * scale_factor)
-                img = img.resize((new_width, new_height), Image.LANCZOS)
-        else:  # auto
-            # For auto, let the API decide but still ensure reasonable dimensions
-            width, height = img.size
-            if max(width, height) > 2048:
-                scale_factor = 2048 / max(width, height)
-                new_width = int(width * scale_factor)
-                new_height = int(height * scale_factor)
-                img = img.resize((new_width, new_height), Image.LANCZOS)
-        
-        # Convert to base64
-        buffer = io.BytesIO()
-        img_format = Path(file_path).suffix[1:].upper()
-        if img_format not in ['JPEG', 'PNG', 'GIF', 'WEBP']:
-            img_format = 'PNG'  # Default to PNG for unsupported formats
-        
-        img.save(buffer, format=img_format)
-        img_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
+        cache = get_image_cache()
+        key = cache.make_key(file_path, detail, img_format)
+        data_url = cache.get(key)
+        if data_url is None:
+            rendition = detail if detail in ("low", "high") else "auto"
+            pyramid = get_image_pyramid()
+            rendition_path = pyramid.fetch(file_path, pyramid.source_digest(file_path), img_format, rendition)
+            with open(rendition_path, "rb") as f:
+                img_base64 = base64.b64encode(f.read()).decode('utf-8')
+            data_url = f"data:image/{img_format.lower()};base64,{img_base64}"
+            cache.put(key, data_url)
         
         # Return the image data in the format expected by the OpenAI API
         return {
             "type": "image_url",
             "image_url": {
-                "url": f"data:image/{img_format.lower()};base64,{img_base64}",
+                "url": data_url,
                 "detail": detail
             }
         }
@@ -1744,6 +1726,26 @@ def dashboard():
                           most_connected=most_connected,
                           graph_preview=graph_preview)
 
+@app.route('/api/llm-metrics')
+def llm_metrics():
+    """Per-model LLM latency, error and rate limiter metrics"""
+    return jsonify(agent.gateway.get_metrics())
+
+@app.route('/api/compaction')
+def compaction_stats():
+    """Prompt token savings from history compaction, per recent multi-round query"""
+    return jsonify(list(compaction_reports))
+
+@app.route('/api/query-cache')
+def query_cache_stats():
+    """Hit rate and invalidations of the query context cache"""
+    return jsonify(get_query_cache().get_stats())
+
+@app.route('/api/image-cache')
+def image_cache_stats():
+    """Hit rate and footprint of the prepared image payload cache"""
+    return jsonify(get_image_cache().get_stats())
+
 def calculate_growth_over_time(notes):
     """Calculate the growth of notes over time"""
     # Extract creation dates
@@ -1,5 +1,6 @@
 import os
 import json
+import pickle
 import networkx as nx
 import numpy as np
 import matplotlib.pyplot as plt
@@ -8,86 +9,352 @@ from typing import Dict, List, Tuple, Set, Any, Optional
 import community as community_louvain
 import random
 import powerlaw
-from sklearn.metrics.pairwise import cosine_similarity
-from sentence_transformers import SentenceTransformer
+from change_feed import ChangeFeed, NOTE_ADDED, PATH_ADDED, RELATION_ADDED, TAG_ADDED
+from path_matcher import PathMatcher
+import csr_graph
+from csr_graph import CSRGraph
+from parallel_analysis import AnalysisPool
+from garden_retrieval import note_body
+from vector_index import ANN_MIN_VECTORS, DEFAULT_MODEL, VectorIndex
+
+try:
+    import hnswlib
+except ImportError:  # Optional: semantic connections use exact blockwise search without it
+    hnswlib = None
+
+# Format of the pickled graph snapshot; bump when its contents change
+SNAPSHOT_VERSION = 2
+
+# Change feed events applied between automatic snapshots
+SNAPSHOT_EVERY_EVENTS = 1000
+
+# Source notes sampled for approximate betweenness and closeness, unless an error bound is given
+CENTRALITY_SAMPLES = 256
+
+# Failure probability of the error bound used to choose the sample size, and the z-score of reported errors
+CENTRALITY_DELTA = 0.05
+CENTRALITY_Z = 1.96
+
+# Components up to this size get exact path lengths and diameter even when estimating
+EXACT_DISTANCE_MAX_NODES = 2000
+
+# Sources sampled to estimate the average shortest path length
+PATH_LENGTH_SAMPLES = 128
+
+# Breadth-first searches iFUB may spend on the diameter before settling for bounds
+DIAMETER_MAX_SEARCHES = 256
+
+# Similarity scores held per block when finding semantic connections, bounding their memory
+SIMILARITY_BLOCK_CELLS = 1 << 24
+
+# Weight multiplier of an edge for each earlier path through it, steering later paths elsewhere
+PATH_REUSE_PENALTY = 2.0
+
+def louvain_communities(graph):
+    """Detect communities in a graph using the Louvain algorithm (runs in report worker processes too)"""
+    # Apply the Louvain algorithm
+    partition = community_louvain.best_partition(graph)
+    
+    # Group nodes by community
+    communities = {}
+    for node, community_id in partition.items():
+        if community_id not in communities:
+            communities[community_id] = []
+        communities[community_id].append(node)
+    
+    # Calculate modularity
+    modularity = community_louvain.modularity(partition, graph)
+    
+    return {
+        "partition": partition,
+        "communities": communities,
+        "modularity": modularity,
+        "num_communities": len(communities)
+    }
+
+def fit_degree_distribution(degrees):
+    """Fit a power law to a degree sequence (runs in report worker processes too)"""
+    # Filter out zeros for power law fitting
+    non_zero_degrees = [d for d in degrees if d > 0]
+    
+    if len(non_zero_degrees) < 10:
+        return {
+            "is_power_law": False,
+            "message": "Not enough data points for power-law fitting",
+            "degrees": degrees
+        }
+    
+    # Fit power law
+    try:
+        fit = powerlaw.Fit(non_zero_degrees)
+        
+        # Compare with alternative distributions
+        power_law_vs_exponential = fit.distribution_compare('power_law', 'exponential')
+        power_law_vs_lognormal = fit.distribution_compare('power_law', 'lognormal')
+        
+        return {
+            "is_power_law": power_law_vs_exponential[0] > 0 and power_law_vs_lognormal[0] > 0,
+            "alpha": fit.alpha,
+            "xmin": fit.xmin,
+            "power_law_vs_exponential": power_law_vs_exponential,
+            "power_law_vs_lognormal": power_law_vs_lognormal,
+            "degrees": degrees
+        }
+    except Exception as e:
+        return {
+            "is_power_law": False,
+            "error": str(e),
+            "degrees": degrees
+        }
 
 class KnowledgeGraphAnalyzer:
     """Analyzer for knowledge graphs using algorithms from the paper"""
     
-    def __init__(self, garden_dir="knowledge_garden"):
-        """Initialize the knowledge graph analyzer"""
+    def __init__(self, garden_dir="knowledge_garden", use_snapshot=True, engine="auto"):
+        """Initialize the knowledge graph analyzer
+        
+        The graph is loaded from the last snapshot when one exists, and brought
+        up to date by replaying the garden's change feed from the snapshot's
+        position. Without a snapshot it is built from the index once and saved.
+        
+        Args:
+            engine: "csr" to run analytics on the array-backed CSR graph, "networkx" to run them
+                on the NetworkX graph, or "auto" to use CSR whenever SciPy is installed
+        """
+        if engine not in ("auto", "csr", "networkx"):
+            raise ValueError(f"Unknown graph engine '{engine}'")
+        if engine == "csr" and not csr_graph.available():
+            raise ImportError("The CSR graph engine requires scipy")
+        self.engine = "csr" if engine == "auto" and csr_graph.available() else engine
         self.garden_dir = Path(garden_dir)
         self.index_path = self.garden_dir / "index.json"
+        self.snapshot_path = self.garden_dir / "cache" / "graph_snapshot.pickle"
+        self.change_feed = ChangeFeed(self.garden_dir / "changes")
+        self.feed_position = (1, 0)  # (generation, byte offset) of the next change feed event
+        self.events_since_snapshot = 0
         self.graph = None
         self.embeddings = {}
         self.embedding_model = None
+        self.pending_relations = {}  # missing note -> notes listing it as related
+        self.path_matcher = None  # Built on first use, reset when a path is added
+        self.csr = None  # CSR snapshot of the graph, built on first use, reset when the graph changes
+        self.pool = None  # AnalysisPool spreading breadth-first searches over processes, while a report runs
+        self.eigenvector_state = {}  # Last eigenvector centrality, to warm-start the next approximate run
         
-        # Load the knowledge garden index
-        if self.index_path.exists():
-            with open(self.index_path, "r") as f:
-                self.index = json.load(f)
-        else:
-            raise FileNotFoundError(f"Knowledge garden index not found at {self.index_path}")
-        
-        # Build the graph
+        if not (use_snapshot and self.load_snapshot()):
+            if not self.index_path.exists():
+                raise FileNotFoundError(f"Knowledge garden index not found at {self.index_path}")
+            self.rebuild()
+        self.sync()
+    
+    def rebuild(self):
+        """Build the graph from the index file and save a snapshot"""
+        # Events written while the index is read are replayed; applying them twice is harmless
+        self.feed_position = self.change_feed.position()
+        with open(self.index_path, "r") as f:
+            self.index = json.load(f)
+        self.index.setdefault("notes", {})
+        self.index.setdefault("tags", {})
+        self.index.setdefault("paths", {})
         self.build_graph()
+        self.save_snapshot()
+    
+    def load_snapshot(self):
+        """Load the graph snapshot; returns False if it is missing or does not match the change feed"""
+        try:
+            with open(self.snapshot_path, "rb") as f:
+                snapshot = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return False
+        if snapshot.get("version") != SNAPSHOT_VERSION or not self.change_feed.covers(*snapshot["feed_position"]):
+            return False
+        self.index = snapshot["index"]
+        self.graph = snapshot["graph"]
+        self.pending_relations = snapshot["pending_relations"]
+        self.feed_position = snapshot["feed_position"]
+        return True
+    
+    def save_snapshot(self):
+        """Persist the graph together with the change feed position it reflects
+        
+        The position is checkpointed with the feed, which may then delete the
+        segments before it.
+        """
+        self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.snapshot_path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump({
+                "version": SNAPSHOT_VERSION,
+                "feed_position": self.feed_position,
+                "index": self.index,
+                "graph": self.graph,
+                "pending_relations": self.pending_relations
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.snapshot_path)
+        self.events_since_snapshot = 0
+        self.change_feed.checkpoint("graph_snapshot", self.feed_position[0])
+    
+    def sync(self):
+        """Apply the change feed events written since the last sync
+        
+        Returns:
+            The number of events applied
+        """
+        if not self.change_feed.covers(*self.feed_position):
+            # The feed deleted events this analyzer has not seen yet (another analyzer checkpointed past them)
+            self.rebuild()
+        events, self.feed_position = self.change_feed.read(*self.feed_position)
+        for event in events:
+            self.apply_event(event)
+        self.events_since_snapshot += len(events)
+        if self.events_since_snapshot >= SNAPSHOT_EVERY_EVENTS:
+            self.save_snapshot()
+        return len(events)
+    
+    def apply_event(self, event):
+        """Apply one change feed event to the index copy and the graph"""
+        kind = event.get("event")
+        self.csr = None
+        if kind == NOTE_ADDED:
+            data = {key: event[key] for key in ("path", "created", "tags", "related_notes") if key in event}
+            self.index["notes"][event["title"]] = data
+            self._add_note_node(event["title"], data)
+        elif kind == TAG_ADDED:
+            self._add_tag(event["tag"], event["title"])
+        elif kind == RELATION_ADDED:
+            self._add_relation(event["title"], event["related"])
+        elif kind == PATH_ADDED:
+            data = {key: event[key] for key in ("path", "created", "subtopics") if key in event}
+            self.index["paths"][event["topic"]] = data
+            self._add_path_node(event["topic"], data)
     
     def build_graph(self):
         """Build a NetworkX graph from the knowledge garden"""
         self.graph = nx.Graph()
+        self.pending_relations = {}
+        self.csr = None
         
         # Add notes as nodes
         for title, data in self.index["notes"].items():
-            self.graph.add_node(
-                title, 
-                type="note", 
-                tags=data["tags"], 
-                created=data["created"],
-                path=data["path"]
-            )
+            self._add_note_node(title, data)
         
         # Add tags as nodes
         for tag, notes in self.index["tags"].items():
-            tag_id = f"tag:{tag}"
-            self.graph.add_node(tag_id, type="tag", title=tag)
+            self.graph.add_node(f"tag:{tag}", type="tag", title=tag)
             
             # Connect tags to notes
             for note in notes:
-                if note in self.graph:
-                    self.graph.add_edge(tag_id, note, type="tagged")
+                self._add_tag(tag, note, record=False)
         
-        # Add paths as nodes if they exist
+        # Add paths as nodes if they exist, and link them to their notes in one pass over the notes
         if "paths" in self.index:
             for topic, path_data in self.index["paths"].items():
-                path_id = f"path:{topic}"
-                self.graph.add_node(
-                    path_id, 
-                    type="path", 
-                    title=topic,
-                    subtopics=path_data.get("subtopics", [])
-                )
-                
-                # Try to connect paths to related notes
-                for note in self.graph.nodes():
-                    if self.graph.nodes[note].get("type") == "note":
-                        note_tags = self.graph.nodes[note].get("tags", [])
-                        if (topic.lower() in note_tags or 
-                            topic.lower() in note.lower() or
-                            any(subtopic.lower() in note.lower() for subtopic in path_data.get("subtopics", []))):
-                            self.graph.add_edge(path_id, note, type="path")
+                self._add_path_node(topic, path_data, link=False)
+            self._link_paths(self._get_path_matcher())
         
         # Add edges between related notes
         for title, data in self.index["notes"].items():
             for related in data.get("related_notes", []):
-                if related in self.graph:
-                    self.graph.add_edge(title, related, type="related")
+                self._add_relation(title, related, record=False)
         
         print(f"Built knowledge graph with {self.graph.number_of_nodes()} nodes and {self.graph.number_of_edges()} edges")
     
-    def compute_graph_properties(self):
-        """Compute basic graph properties using NetworkX"""
+    def _get_path_matcher(self):
+        """Matcher over all exploration paths"""
+        if self.path_matcher is None:
+            self.path_matcher = PathMatcher({topic: data.get("subtopics", [])
+                                             for topic, data in self.index.get("paths", {}).items()})
+        return self.path_matcher
+    
+    def _link_paths(self, matcher, notes=None):
+        """Connect notes (all notes by default) to the paths of the matcher that cover them"""
+        if notes is None:
+            notes = [node for node, attrs in self.graph.nodes(data=True) if attrs.get("type") == "note"]
+        for note in notes:
+            for topic in matcher.match(note, self.graph.nodes[note].get("tags", [])):
+                if f"path:{topic}" in self.graph:
+                    self.graph.add_edge(f"path:{topic}", note, type="path")
+    
+    def _add_note_node(self, title, data):
+        """Add (or update) a note node, connecting it to matching paths and pending relations"""
+        self.graph.add_node(
+            title,
+            type="note",
+            tags=list(data.get("tags", [])),
+            created=data.get("created"),
+            path=data.get("path")
+        )
+        if self.index.get("paths"):
+            self._link_paths(self._get_path_matcher(), [title])
+        for source in self.pending_relations.pop(title, ()):
+            self.graph.add_edge(source, title, type="related")
+    
+    def _add_tag(self, tag, title, record=True):
+        """Connect a note to a tag node, recording the tag on the note"""
+        if record:
+            notes = self.index["tags"].setdefault(tag, [])
+            if title not in notes:
+                notes.append(title)
+        tag_id = f"tag:{tag}"
+        if tag_id not in self.graph:
+            self.graph.add_node(tag_id, type="tag", title=tag)
+        if title not in self.graph:
+            return
+        self.graph.add_edge(tag_id, title, type="tagged")
+        
+        note_tags = self.graph.nodes[title].get("tags")
+        if note_tags is not None and tag not in note_tags:
+            note_tags.append(tag)
+            if record and title in self.index["notes"]:
+                self.index["notes"][title]["tags"].append(tag)
+            # A path whose topic is this tag now covers the note
+            for topic in self.index.get("paths", {}):
+                if topic.lower() == tag and f"path:{topic}" in self.graph:
+                    self.graph.add_edge(f"path:{topic}", title, type="path")
+    
+    def _add_relation(self, title, related, record=True):
+        """Connect two related notes, or remember the relation until the missing note is added"""
+        if record and title in self.index["notes"]:
+            related_notes = self.index["notes"][title].setdefault("related_notes", [])
+            if related not in related_notes:
+                related_notes.append(related)
+        if related in self.graph and title in self.graph:
+            self.graph.add_edge(title, related, type="related")
+        elif title in self.graph:
+            self.pending_relations.setdefault(related, set()).add(title)
+    
+    def _add_path_node(self, topic, path_data, link=True):
+        """Add (or replace) an exploration path node, connecting it to the notes it covers if link is set"""
+        path_id = f"path:{topic}"
+        if path_id in self.graph:
+            self.graph.remove_node(path_id)
+        subtopics = path_data.get("subtopics", [])
+        self.graph.add_node(path_id, type="path", title=topic, subtopics=subtopics)
+        self.path_matcher = None
+        if link:
+            self._link_paths(PathMatcher({topic: subtopics}))
+    
+    def csr_graph(self):
+        """Array-backed CSR snapshot of the current graph"""
+        if self.csr is None:
+            self.csr = CSRGraph.from_networkx(self.graph)
+        return self.csr
+    
+    def compute_graph_properties(self, estimate=False, samples=None, seed=None):
+        """Compute basic graph properties on the CSR graph, or with NetworkX
+        
+        Args:
+            estimate: For components over EXACT_DISTANCE_MAX_NODES nodes, estimate the
+                average shortest path length from sampled sources and bound the
+                diameter (double sweep and iFUB) instead of searching from every node;
+                the estimates' accuracy is reported under "distance_estimates"
+            samples: Sources to sample for the path length (default PATH_LENGTH_SAMPLES)
+            seed: Seed for choosing the sampled sources
+        """
         if not self.graph:
             self.build_graph()
+        if self.engine == "csr":
+            return self._csr_graph_properties(estimate, samples or PATH_LENGTH_SAMPLES, seed)
         
         properties = {
             "num_nodes": self.graph.number_of_nodes(),
@@ -99,7 +366,11 @@ class KnowledgeGraphAnalyzer:
         }
         
         # Compute average shortest path length for connected components
-        if properties["is_connected"]:
+        if estimate and properties["is_connected"] and len(self.graph) > EXACT_DISTANCE_MAX_NODES:
+            properties["average_shortest_path_length"], properties["distance_estimates"] = \
+                self._sampled_path_length(self.graph, samples or PATH_LENGTH_SAMPLES, seed)
+            properties["diameter"] = nx.diameter(self.graph, usebounds=True)
+        elif properties["is_connected"]:
             properties["average_shortest_path_length"] = nx.average_shortest_path_length(self.graph)
             properties["diameter"] = nx.diameter(self.graph)
         else:
@@ -107,26 +378,114 @@ class KnowledgeGraphAnalyzer:
             largest_cc = max(nx.connected_components(self.graph), key=len)
             largest_subgraph = self.graph.subgraph(largest_cc)
             properties["largest_component_size"] = len(largest_cc)
-            properties["largest_component_avg_path_length"] = nx.average_shortest_path_length(largest_subgraph)
-            properties["largest_component_diameter"] = nx.diameter(largest_subgraph)
+            if estimate and len(largest_cc) > EXACT_DISTANCE_MAX_NODES:
+                properties["largest_component_avg_path_length"], properties["distance_estimates"] = \
+                    self._sampled_path_length(largest_subgraph, samples or PATH_LENGTH_SAMPLES, seed)
+                properties["largest_component_diameter"] = nx.diameter(largest_subgraph, usebounds=True)
+            else:
+                properties["largest_component_avg_path_length"] = nx.average_shortest_path_length(largest_subgraph)
+                properties["largest_component_diameter"] = nx.diameter(largest_subgraph)
         
         return properties
     
-    def compute_centrality_measures(self):
-        """Compute various centrality measures for nodes in the graph"""
+    @staticmethod
+    def _sampled_path_length(graph, samples, seed):
+        """Average shortest path length of a connected NetworkX graph from sampled sources, and its accuracy"""
+        nodes = list(graph)
+        n = len(nodes)
+        sources = random.Random(seed).sample(nodes, min(samples, n))
+        means = np.array([sum(nx.single_source_shortest_path_length(graph, source).values()) / (n - 1)
+                          for source in sources])
+        k = len(sources)
+        error = CENTRALITY_Z * means.std(ddof=1) / np.sqrt(k) * np.sqrt(1 - k / n) if k > 1 else float("inf")
+        return float(means.mean()), {"samples": k, "path_length_error": float(error)}
+    
+    def _csr_graph_properties(self, estimate=False, samples=PATH_LENGTH_SAMPLES, seed=None):
+        """compute_graph_properties with vectorized kernels on the CSR graph"""
+        graph = self.csr_graph()
+        num_components, labels = graph.connected_components()
+        properties = {
+            "num_nodes": graph.number_of_nodes(),
+            "num_edges": graph.number_of_edges(),
+            "density": graph.density(),
+            "is_connected": num_components == 1,
+            "num_connected_components": int(num_components),
+            "average_clustering": graph.average_clustering(),
+        }
+        
+        if not num_components:
+            return properties
+        
+        # Compute average shortest path length for connected components, or the largest one
+        component = graph if properties["is_connected"] else graph.subgraph(labels == np.argmax(np.bincount(labels)))
+        if estimate and component.number_of_nodes() > EXACT_DISTANCE_MAX_NODES:
+            avg_path_length, path_length_error = component.sampled_path_length(samples, seed, self.pool)
+            diameter, diameter_upper_bound = component.diameter_bounds(DIAMETER_MAX_SEARCHES)
+            properties["distance_estimates"] = {
+                "samples": min(samples, component.number_of_nodes()),
+                "path_length_error": path_length_error,
+                "diameter_bounds": [diameter, diameter_upper_bound]
+            }
+        else:
+            avg_path_length, diameter = component.distance_stats(self.pool)
+        
+        if properties["is_connected"]:
+            properties["average_shortest_path_length"] = avg_path_length
+            properties["diameter"] = diameter
+        else:
+            properties["largest_component_size"] = component.number_of_nodes()
+            properties["largest_component_avg_path_length"] = avg_path_length
+            properties["largest_component_diameter"] = diameter
+        
+        return properties
+    
+    def compute_centrality_measures(self, mode="exact", samples=None, epsilon=None, seed=None):
+        """Compute various centrality measures for nodes in the graph
+        
+        In "approximate" mode, betweenness and closeness are estimated from
+        breadth-first searches out of a uniform sample of source notes, and
+        eigenvector centrality is power iteration warm-started from the previous
+        run, so repeated reports trade a bounded error for speed.
+        
+        Args:
+            mode: "exact" or "approximate"
+            samples: Number of source notes to sample (default CENTRALITY_SAMPLES)
+            epsilon: Instead of samples, the additive betweenness error to sample for
+                (Hoeffding bound, holding for all notes with probability 1 - CENTRALITY_DELTA)
+            seed: Seed for choosing the sampled notes
+        
+        Returns:
+            The individual measures, their combination, and the estimated largest
+            error of any note's score for each measure (a 95% confidence half-width
+            for sampled measures, 0 for exact ones)
+        """
+        if mode not in ("exact", "approximate"):
+            raise ValueError(f"Unknown centrality mode '{mode}'")
+        if samples is not None and samples < 1:
+            raise ValueError(f"samples must be at least 1, got {samples}")
+        if epsilon is not None and not epsilon > 0:
+            raise ValueError(f"epsilon must be positive, got {epsilon}")
         if not self.graph:
             self.build_graph()
         
         # Only compute for notes (not tags or paths)
         note_nodes = [n for n, attr in self.graph.nodes(data=True) if attr.get("type") == "note"]
-        note_subgraph = self.graph.subgraph(note_nodes)
+        n = len(note_nodes)
         
-        centrality_measures = {
-            "degree": nx.degree_centrality(note_subgraph),
-            "betweenness": nx.betweenness_centrality(note_subgraph),
-            "closeness": nx.closeness_centrality(note_subgraph),
-            "eigenvector": nx.eigenvector_centrality(note_subgraph, max_iter=1000)
-        }
+        sources = None
+        if mode == "approximate":
+            if samples is None:
+                samples = CENTRALITY_SAMPLES
+                if epsilon is not None:
+                    samples = max(1, int(np.ceil(np.log(2 * max(n, 1) / CENTRALITY_DELTA) / (2 * epsilon ** 2))))
+            samples = min(samples, n)
+            sources = np.random.default_rng(seed).choice(n, samples, replace=False) if samples < n else None
+        
+        if self.engine == "csr":
+            centrality_measures, errors = self._csr_centrality(note_nodes, sources, warm_start=mode == "approximate")
+        else:
+            centrality_measures, errors = self._networkx_centrality(note_nodes, sources, mode, seed)
+        self.eigenvector_state = centrality_measures["eigenvector"]
         
         # Normalize and combine centrality measures
         combined_centrality = {}
@@ -140,41 +499,145 @@ class KnowledgeGraphAnalyzer:
         
         return {
             "individual_measures": centrality_measures,
-            "combined_centrality": combined_centrality
+            "combined_centrality": combined_centrality,
+            "errors": errors,
+            "mode": mode,
+            "samples": n if sources is None else len(sources)
         }
     
-    def detect_communities(self):
-        """Detect communities in the knowledge graph using the Louvain algorithm"""
-        if not self.graph:
-            self.build_graph()
+    def _networkx_centrality(self, note_nodes, sources, mode, seed):
+        """Centrality measures of the note subgraph with NetworkX"""
+        note_subgraph = self.graph.subgraph(note_nodes)
+        n = len(note_nodes)
+        errors = {"degree": 0.0, "betweenness": 0.0, "closeness": 0.0, "eigenvector": 0.0}
+        if mode == "exact":
+            return {
+                "degree": nx.degree_centrality(note_subgraph),
+                "betweenness": nx.betweenness_centrality(note_subgraph),
+                "closeness": nx.closeness_centrality(note_subgraph),
+                "eigenvector": nx.eigenvector_centrality(note_subgraph, max_iter=1000)
+            }, errors
+        
+        if sources is None:
+            betweenness = nx.betweenness_centrality(note_subgraph)
+            closeness = nx.closeness_centrality(note_subgraph)
+        else:
+            betweenness = nx.betweenness_centrality(note_subgraph, k=len(sources), seed=seed)
+            errors["betweenness"] = float(np.sqrt(np.log(2 * n / CENTRALITY_DELTA) / (2 * len(sources))))
+            distances = np.full((len(sources), n), np.inf)
+            position = {node: i for i, node in enumerate(note_nodes)}
+            for row, source in enumerate(sources):
+                for node, distance in nx.single_source_shortest_path_length(note_subgraph, note_nodes[source]).items():
+                    distances[row, position[node]] = distance
+            reachable = np.isfinite(distances)
+            finite = np.where(reachable, distances, 0)
+            values, errors["closeness"] = self._estimate_closeness(finite.sum(axis=0), (finite ** 2).sum(axis=0),
+                                                                   reachable.sum(axis=0), n, len(sources))
+            closeness = dict(zip(note_nodes, values.tolist()))
+        
+        nstart = {node: self.eigenvector_state.get(node, 0) + 1e-9 for node in note_nodes} if self.eigenvector_state else None
+        eigenvector = nx.eigenvector_centrality(note_subgraph, max_iter=1000, nstart=nstart)
+        errors["eigenvector"] = n * 1e-6  # NetworkX's stopping bound on the last iteration's change
+        return {
+            "degree": nx.degree_centrality(note_subgraph),
+            "betweenness": betweenness,
+            "closeness": closeness,
+            "eigenvector": eigenvector
+        }, errors
+    
+    def _csr_centrality(self, note_nodes, sources, warm_start):
+        """Centrality measures of the note subgraph on the CSR graph, from all notes or sampled sources"""
+        graph = self.csr_graph()
+        notes = graph.subgraph(graph.node_type == csr_graph.NODE_TYPES.index("note"))
+        n = notes.number_of_nodes()
+        k = n if sources is None else len(sources)
+        sources = np.arange(n) if sources is None else np.asarray([notes.index[note_nodes[i]] for i in sources])
         
-        # Apply the Louvain algorithm
-        partition = community_louvain.best_partition(self.graph)
+        # Sums and sums of squares of the per-source contributions, for the estimates and their errors
+        sums = [np.zeros(n) for _ in range(5)]
+        for block in notes.map_blocks("centrality_block", sources, self.pool):
+            for total, block_total in zip(sums, block):
+                total += block_total
+        dependency_sums, dependency_squares, distance_sums, distance_squares, reach_counts = sums
         
-        # Group nodes by community
-        communities = {}
-        for node, community_id in partition.items():
-            if community_id not in communities:
-                communities[community_id] = []
-            communities[community_id].append(node)
+        scale = 1 / ((n - 1) * (n - 2)) if n > 2 else 0.0
+        betweenness, betweenness_errors = self._estimate_total(dependency_sums, dependency_squares, n, k)
+        closeness, closeness_error = self._estimate_closeness(distance_sums, distance_squares, reach_counts, n, k)
         
-        # Calculate modularity
-        modularity = community_louvain.modularity(partition, self.graph)
+        start = None
+        if warm_start and self.eigenvector_state:
+            start = np.array([self.eigenvector_state.get(node, 0) for node in notes.nodes]) + 1e-9
+        eigenvector, _, eigenvector_error = notes.eigenvector(start)
         
+        degree = notes.degrees / (n - 1) if n > 1 else np.ones(n)
         return {
-            "partition": partition,
-            "communities": communities,
-            "modularity": modularity,
-            "num_communities": len(communities)
+            "degree": dict(zip(notes.nodes, degree.tolist())),
+            "betweenness": dict(zip(notes.nodes, (betweenness * scale).tolist())),
+            "closeness": dict(zip(notes.nodes, closeness.tolist())),
+            "eigenvector": dict(zip(notes.nodes, eigenvector.tolist()))
+        }, {
+            "degree": 0.0,
+            "betweenness": float(betweenness_errors.max() * scale) if n else 0.0,
+            "closeness": closeness_error,
+            # Run to convergence in exact mode, like NetworkX's, and reported as exact
+            "eigenvector": eigenvector_error if warm_start else 0.0
         }
     
+    @staticmethod
+    def _estimate_total(sums, squares, n, k):
+        """Estimate per-node totals over all n sources from k sampled without replacement
+        
+        Returns:
+            The estimated totals and their 95% confidence half-widths
+        """
+        if k == n:
+            return sums, np.zeros_like(sums)
+        if not k:
+            # Nothing was sampled, so nothing is known about the totals
+            return np.zeros_like(sums), np.full_like(sums, np.inf)
+        if k < 2:
+            return sums * n, np.full_like(sums, np.inf)
+        variance = np.maximum(squares - sums ** 2 / k, 0) / (k - 1)
+        return sums * (n / k), CENTRALITY_Z * n * np.sqrt(variance / k * (1 - k / n))
+    
+    @staticmethod
+    def _estimate_closeness(distance_sums, distance_squares, reach_counts, n, k):
+        """Closeness of every node (Wasserman-Faust, as NetworkX) from hop distances out of k sampled sources
+        
+        Args:
+            distance_sums, distance_squares: Per-node sums of the finite distances from the sources, and of their squares
+            reach_counts: Number of sources reaching each node
+        
+        Returns:
+            The closeness values and the largest 95% confidence half-width among them
+        """
+        total, total_errors = KnowledgeGraphAnalyzer._estimate_total(distance_sums, distance_squares, n, k)
+        reach = reach_counts * (n / k) if k else np.zeros(n)
+        closeness = np.divide((reach - 1) ** 2, total * (n - 1), out=np.zeros(n), where=total > 0) if n > 1 else np.zeros(n)
+        # Relative error of the closeness follows the relative error of the total distance
+        errors = np.divide(closeness * total_errors, total, out=np.zeros(n), where=total > 0)
+        if n and not k:
+            return closeness, float("inf")
+        return closeness, float(errors.max()) if n else 0.0
+    
+    def detect_communities(self):
+        """Detect communities in the knowledge graph using the Louvain algorithm"""
+        if not self.graph:
+            self.build_graph()
+        
+        return louvain_communities(self.graph)
+    
     def k_core_decomposition(self):
         """Perform k-core decomposition to identify hierarchical structure"""
         if not self.graph:
             self.build_graph()
         
         # Compute the k-core decomposition
-        core_numbers = nx.core_number(self.graph)
+        if self.engine == "csr":
+            graph = self.csr_graph()
+            core_numbers = dict(zip(graph.nodes, graph.core_numbers().tolist()))
+        else:
+            core_numbers = nx.core_number(self.graph)
         
         # Group nodes by core number
         cores = {}
@@ -198,112 +661,174 @@ class KnowledgeGraphAnalyzer:
             self.build_graph()
         
         # Get degrees
-        degrees = [d for _, d in self.graph.degree()]
-        
-        # Filter out zeros for power law fitting
-        non_zero_degrees = [d for d in degrees if d > 0]
-        
-        if len(non_zero_degrees) < 10:
-            return {
-                "is_power_law": False,
-                "message": "Not enough data points for power-law fitting",
-                "degrees": degrees
-            }
+        if self.engine == "csr":
+            degrees = self.csr_graph().degrees.tolist()
+        else:
+            degrees = [d for _, d in self.graph.degree()]
         
-        # Fit power law
-        try:
-            fit = powerlaw.Fit(non_zero_degrees)
-            
-            # Compare with alternative distributions
-            power_law_vs_exponential = fit.distribution_compare('power_law', 'exponential')
-            power_law_vs_lognormal = fit.distribution_compare('power_law', 'lognormal')
-            
-            return {
-                "is_power_law": power_law_vs_exponential[0] > 0 and power_law_vs_lognormal[0] > 0,
-                "alpha": fit.alpha,
-                "xmin": fit.xmin,
-                "power_law_vs_exponential": power_law_vs_exponential,
-                "power_law_vs_lognormal": power_law_vs_lognormal,
-                "degrees": degrees
-            }
-        except Exception as e:
-            return {
-                "is_power_law": False,
-                "error": str(e),
-                "degrees": degrees
-            }
+        return fit_degree_distribution(degrees)
     
-    def initialize_embeddings(self, model_name="all-MiniLM-L6-v2"):
-        """Initialize the embedding model and compute embeddings for all notes"""
-        self.embedding_model = SentenceTransformer(model_name)
+    def initialize_embeddings(self, model_name=DEFAULT_MODEL):
+        """Load embeddings for all notes from the garden's vector index, encoding only new or changed notes"""
+        self.embedding_model = VectorIndex(self.garden_dir / "cache" / "vectors", model_name)
         
-        # Compute embeddings for all notes
+        titles = []
         for title, data in self.index["notes"].items():
             note_path = self.garden_dir / data["path"]
             if note_path.exists():
                 with open(note_path, "r") as f:
                     content = f.read()
-                    
-                # Extract the main content (remove title and metadata)
-                content = content.replace(f"# {title}", "").split("---")[0].strip()
                 
-                # Compute embedding
-                self.embeddings[title] = self.embedding_model.encode(content)
+                # Queued only if the note changed since the index encoded it
+                titles.append(title)
+                self.embedding_model.enqueue(title, f"{title}\n\n{note_body(content, title)}")
+        
+        # Compute embeddings
+        self.embedding_model.flush()
+        if self.embedding_model.pending:
+            print("sentence-transformers is not installed; cannot embed new notes")
+        found, vectors = self.embedding_model.vectors_of(
+            [title for title in titles if title not in self.embedding_model.pending])
+        self.embeddings = dict(zip(found, vectors))
+        
+        print(f"Loaded embeddings for {len(self.embeddings)} notes")
+    
+    def find_semantic_connections(self, threshold=0.7, top_k=None, approximate=None):
+        """Find semantic connections between notes based on embeddings
         
-        print(f"Computed embeddings for {len(self.embeddings)} notes")
+        Args:
+            threshold: Minimum cosine similarity of a connection
+            top_k: Only connect each note to its top_k most similar notes (None connects every pair above threshold)
+            approximate: Find the top_k neighbours with an HNSW index instead of exactly (by default,
+                when top_k is given, hnswlib is installed and there are ANN_MIN_VECTORS notes)
+        """
+        return list(self.iter_semantic_connections(threshold, top_k, approximate))
     
-    def find_semantic_connections(self, threshold=0.7):
-        """Find semantic connections between notes based on embeddings"""
-        if not self.embedding_model:
+    def iter_semantic_connections(self, threshold=0.7, top_k=None, approximate=None):
+        """Generate the connections of find_semantic_connections, one block of notes at a time
+        
+        Embeddings are normalized once, and similarities are computed for a block
+        of rows at a time with one matrix product, so memory is bounded by
+        SIMILARITY_BLOCK_CELLS rather than growing with the square of the garden.
+        """
+        if self.embedding_model is None:
             self.initialize_embeddings()
         
         if len(self.embeddings) < 2:
-            return []
+            return
         
-        # Compute pairwise similarities
         titles = list(self.embeddings.keys())
-        embeddings_array = np.array([self.embeddings[title] for title in titles])
-        similarity_matrix = cosine_similarity(embeddings_array)
-        
-        # Find pairs above threshold
-        connections = []
-        for i in range(len(titles)):
-            for j in range(i+1, len(titles)):
-                if similarity_matrix[i, j] >= threshold:
-                    connections.append({
-                        "source": titles[i],
-                        "target": titles[j],
-                        "similarity": similarity_matrix[i, j]
-                    })
-        
-        return connections
-    
-    def agentic_path_finding(self, start_node, end_node, num_paths=3, randomness=0.3):
-        """Find diverse paths between nodes using a modified Dijkstra's algorithm with randomness"""
+        vectors = np.array([self.embeddings[title] for title in titles], dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        n = len(titles)
+        
+        if top_k is None:
+            blocks = self._threshold_blocks(vectors, threshold)
+        else:
+            if approximate is None:
+                approximate = hnswlib is not None and n >= ANN_MIN_VECTORS
+            if approximate and hnswlib is None:
+                raise ImportError("Approximate semantic connections require hnswlib")
+            blocks = self._top_k_blocks(vectors, threshold, min(top_k, n - 1), approximate)
+        
+        emitted = set()  # With top_k, a pair can be found from both of its notes
+        for rows, cols, scores in blocks:
+            for i, j, similarity in zip(rows.tolist(), cols.tolist(), scores.tolist()):
+                if top_k is not None:
+                    pair = (i, j) if i < j else (j, i)
+                    if pair in emitted:
+                        continue
+                    emitted.add(pair)
+                yield {
+                    "source": titles[i],
+                    "target": titles[j],
+                    "similarity": similarity
+                }
+    
+    @staticmethod
+    def _threshold_blocks(vectors, threshold):
+        """Pairs (i < j) with similarity above threshold, as (rows, cols, scores) per block of rows"""
+        n = len(vectors)
+        block_rows = max(1, SIMILARITY_BLOCK_CELLS // n)
+        for start in range(0, n, block_rows):
+            end = min(start + block_rows, n)
+            # Only columns from the block's first row on can pair with a later note
+            scores = vectors[start:end] @ vectors[start:].T
+            rows, cols = np.nonzero(scores >= threshold)
+            later = cols > rows
+            rows, cols = rows[later], cols[later]
+            yield rows + start, cols + start, scores[rows, cols]
+    
+    @staticmethod
+    def _top_k_blocks(vectors, threshold, k, approximate):
+        """Each note's k most similar notes above threshold, as (rows, cols, scores) per block of rows"""
+        n = len(vectors)
+        if k <= 0:
+            return
+        block_rows = max(1, SIMILARITY_BLOCK_CELLS // n)
+        if approximate:
+            index = hnswlib.Index(space="ip", dim=vectors.shape[1])
+            index.init_index(max_elements=n, ef_construction=200, M=16)
+            index.add_items(vectors, np.arange(n))
+            index.set_ef(max(100, k + 1))
+        for start in range(0, n, block_rows):
+            end = min(start + block_rows, n)
+            own = np.arange(start, end)
+            if approximate:
+                labels, distances = index.knn_query(vectors[start:end], k=k + 1)
+                labels = labels.astype(np.int64)
+                scores = 1 - distances
+                scores[labels == own[:, None]] = -np.inf
+            else:
+                # Negated in place, so the k smallest entries are the k most similar notes
+                distances = np.negative(vectors[start:end] @ vectors.T)
+                distances[own - start, own] = np.inf
+                labels = np.argpartition(distances, k - 1, axis=1)[:, :k]
+                scores = -np.take_along_axis(distances, labels, axis=1)
+            rows, cols = np.nonzero(scores >= threshold)
+            yield rows + start, labels[rows, cols], scores[rows, cols]
+    
+    def agentic_path_finding(self, start_node, end_node, num_paths=3, randomness=0.3, seed=None):
+        """Find diverse paths between nodes using bidirectional Dijkstra with randomized weights
+        
+        Each search gives the edges it touches a random weight between 1 and
+        1 + randomness, multiplied by PATH_REUSE_PENALTY for every earlier path
+        through the edge. Weights come from a weight function, drawn lazily, so
+        the graph is never copied and a search only visits the neighbourhood it
+        explores from both ends.
+        """
         if not self.graph:
             self.build_graph()
         
         if start_node not in self.graph or end_node not in self.graph:
             return []
         
+        rng = random.Random(seed)
+        uses = {}  # edge -> paths found through it
         paths = []
-        for _ in range(num_paths):
-            # Create a copy of the graph with randomized weights
-            G = self.graph.copy()
+        for _ in range(2 * num_paths):
+            if len(paths) >= num_paths:
+                break
             
-            # Assign random weights to edges
-            for u, v in G.edges():
-                # Base weight is 1.0, add randomness
-                weight = 1.0 + random.random() * randomness
-                G[u][v]['weight'] = weight
+            # Random weights of this search, by edge
+            weights = {}
+            
+            def weight(u, v, data):
+                edge = (u, v) if u <= v else (v, u)
+                if edge not in weights:
+                    weights[edge] = (1.0 + rng.random() * randomness) * PATH_REUSE_PENALTY ** uses.get(edge, 0)
+                return weights[edge]
             
             # Try to find a path
             try:
-                path = nx.shortest_path(G, start_node, end_node, weight='weight')
-                if path not in paths:  # Avoid duplicates
-                    paths.append(path)
+                _, path = nx.bidirectional_dijkstra(self.graph, start_node, end_node, weight=weight)
             except nx.NetworkXNoPath:
-                continue
+                break
+            if path not in paths:  # Avoid duplicates
+                paths.append(path)
+            for u, v in zip(path, path[1:]):
+                edge = (u, v) if u <= v else (v, u)
+                uses[edge] = uses.get(edge, 0) + 1
         
         return paths
     
@@ -316,15 +841,20 @@ class KnowledgeGraphAnalyzer:
             return None
         
         # Use BFS to find nodes within max_distance
-        nodes = {central_node}
-        current_nodes = {central_node}
-        
-        for _ in range(max_distance):
-            next_nodes = set()
-            for node in current_nodes:
-                next_nodes.update(self.graph.neighbors(node))
-            nodes.update(next_nodes)
-            current_nodes = next_nodes
+        if self.engine == "csr":
+            graph = self.csr_graph()
+            reached = graph.within_distance(graph.index[central_node], max_distance)
+            nodes = {graph.nodes[i] for i in np.flatnonzero(reached)}
+        else:
+            nodes = {central_node}
+            current_nodes = {central_node}
+            
+            for _ in range(max_distance):
+                next_nodes = set()
+                for node in current_nodes:
+                    next_nodes.update(self.graph.neighbors(node))
+                nodes.update(next_nodes)
+                current_nodes = next_nodes
         
         # Extract the subgraph
         subgraph = self.graph.subgraph(nodes)
@@ -386,17 +916,41 @@ class KnowledgeGraphAnalyzer:
         else:
             plt.close()
     
-    def generate_graph_report(self):
-        """Generate a comprehensive report on the knowledge graph"""
+    def generate_graph_report(self, estimate=False, workers=1):
+        """Generate a comprehensive report on the knowledge graph
+        
+        Args:
+            estimate: Estimate path lengths and centrality from sampled sources instead of
+                computing them exactly, for large graphs
+            workers: Processes to use (None for one per CPU). Community detection and
+                power-law fitting run in workers alongside the other metrics, and the
+                breadth-first searches behind path lengths and centrality are split
+                between workers sharing the graph's CSR arrays
+        """
         if not self.graph:
             self.build_graph()
         
         # Compute various metrics
-        properties = self.compute_graph_properties()
-        centrality = self.compute_centrality_measures()
-        communities = self.detect_communities()
-        cores = self.k_core_decomposition()
-        degree_distribution = self.analyze_degree_distribution()
+        if workers == 1:
+            properties = self.compute_graph_properties(estimate=estimate)
+            centrality = self.compute_centrality_measures("approximate" if estimate else "exact")
+            communities = self.detect_communities()
+            cores = self.k_core_decomposition()
+            degree_distribution = self.analyze_degree_distribution()
+        else:
+            with AnalysisPool(workers) as pool:
+                degrees = self.csr_graph().degrees.tolist() if self.engine == "csr" else [d for _, d in self.graph.degree()]
+                communities_future = pool.submit(louvain_communities, self.graph)
+                degree_future = pool.submit(fit_degree_distribution, degrees)
+                self.pool = pool if self.engine == "csr" else None
+                try:
+                    properties = self.compute_graph_properties(estimate=estimate)
+                    centrality = self.compute_centrality_measures("approximate" if estimate else "exact")
+                    cores = self.k_core_decomposition()
+                finally:
+                    self.pool = None
+                communities = communities_future.result()
+                degree_distribution = degree_future.result()
         
         # Find top nodes by centrality
         top_nodes = sorted(
@@ -409,6 +963,7 @@ class KnowledgeGraphAnalyzer:
         report = {
             "graph_properties": properties,
             "top_central_nodes": top_nodes,
+            "centrality_errors": centrality["errors"],
             "community_structure": {
                 "num_communities": communities["num_communities"],
                 "modularity": communities["modularity"],
@@ -437,7 +992,10 @@ def main():
     parser.add_argument("--visualize", action="store_true", help="Visualize the knowledge graph")
     parser.add_argument("--report", action="store_true", help="Generate a report on the knowledge graph")
     parser.add_argument("--find-connections", action="store_true", help="Find semantic connections between notes")
+    parser.add_argument("--top-k", type=int, help="Only connect each note to its k most similar notes")
     parser.add_argument("--output", type=str, help="Output file for visualization or report")
+    parser.add_argument("--estimate", action="store_true", help="Estimate path lengths and centrality in the report from samples")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Processes to spread the report over (default: one per CPU)")
     
     args = parser.parse_args()
     
@@ -450,7 +1008,7 @@ def main():
             print(f"Graph visualization saved to {output_path}")
         
         if args.report:
-            report = analyzer.generate_graph_report()
+            report = analyzer.generate_graph_report(estimate=args.estimate, workers=args.workers)
             
             if args.output:
                 with open(args.output, "w") as f:
@@ -460,7 +1018,7 @@ def main():
                 print(json.dumps(report, indent=2))
         
         if args.find_connections:
-            connections = analyzer.find_semantic_connections()
+            connections = analyzer.find_semantic_connections(top_k=args.top_k)
             
             if args.output:
                 with open(args.output, "w") as f:
@@ -0,0 +1,313 @@
+import os
+import re
+import json
+import time
+import random
+import hashlib
+
+# Backend used when none is requested explicitly
+DEFAULT_BACKEND = os.environ.get("KNOWLEDGE_GARDEN_LLM_BACKEND", "openai")
+
+# Vocabulary the fake backend draws titles and prose from
+FAKE_ADJECTIVES = [
+    "Adaptive", "Emergent", "Distributed", "Recursive", "Latent", "Decentralized", "Self-Organizing",
+    "Hierarchical", "Resilient", "Dynamic", "Federated", "Probabilistic", "Modular", "Symbiotic"
+]
+FAKE_NOUNS = [
+    "Networks", "Feedback Loops", "Knowledge Graphs", "Protocols", "Agents", "Patterns", "Pipelines",
+    "Ecosystems", "Representations", "Topologies", "Heuristics", "Architectures", "Signals", "Models"
+]
+FAKE_SENTENCES = [
+    "{topic} can be understood as a system of interacting parts whose behaviour emerges from local rules.",
+    "Viewed through the lens of {topic}, small structural changes often have outsized downstream effects.",
+    "Practitioners working on {topic} tend to trade global optimality for robustness and adaptability.",
+    "A key open question is how {topic} scales when the number of participants grows by orders of magnitude.",
+    "Empirical studies of {topic} suggest that feedback between components drives most of the observed dynamics.",
+    "{topic} connects naturally to ideas from graph theory, information theory and control systems.",
+    "One practical application of {topic} is continuously reorganizing knowledge as new evidence arrives.",
+    "The tension between exploration and exploitation is central to {topic}."
+]
+PROMPT_STOP_WORDS = {
+    "the", "a", "an", "and", "or", "of", "to", "in", "on", "for", "with", "by", "about", "as", "is",
+    "are", "this", "that", "these", "your", "you", "from", "into", "note", "notes", "title", "content",
+    "tags", "tag", "insight", "insights", "concept", "concepts", "format", "following", "response",
+    "each", "based", "knowledge", "garden", "new", "provide", "write", "create", "clear", "detailed",
+    "explanation", "relevant", "suggest", "related", "please", "text", "key", "how", "what"
+}
+
+# Share of a streamed response's latency spent before the first token
+FIRST_TOKEN_SHARE = 0.2
+
+# Characters per streamed chunk
+STREAM_CHUNK_CHARS = 16
+
+
+class LatencyModel:
+    """Simulated response latency
+
+    Specs look like "fixed:0.2", "uniform:0.1,0.5", "normal:0.3,0.05" or
+    "lognormal:-1.5,0.5" (seconds, or mu/sigma of the log for lognormal).
+    """
+
+    def __init__(self, spec="fixed:0"):
+        kind, _, params = spec.partition(":")
+        self.kind = kind
+        self.params = [float(p) for p in params.split(",") if p]
+
+    def sample(self, rng):
+        if self.kind == "fixed":
+            return self.params[0] if self.params else 0.0
+        if self.kind == "uniform":
+            return rng.uniform(self.params[0], self.params[1])
+        if self.kind == "normal":
+            return max(0.0, rng.gauss(self.params[0], self.params[1]))
+        if self.kind == "lognormal":
+            return rng.lognormvariate(self.params[0], self.params[1])
+        raise ValueError(f"Unknown latency distribution: {self.kind}")
+
+
+class FakeAPIError(Exception):
+    """Simulated provider error carrying an HTTP status code like the OpenAI SDK errors"""
+
+    def __init__(self, message, status_code=429):
+        super().__init__(message)
+        self.status_code = status_code
+        self.response = None
+
+
+class _Obj:
+    """Attribute bag standing in for the OpenAI SDK response models"""
+
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.__dict__})"
+
+
+class FakeCompletions:
+    """Deterministic stand-in for `client.chat.completions`
+
+    The response is a pure function of the request (model, messages, tools),
+    so repeated runs produce identical gardens. It recognises the prompt
+    formats used by the garden (INSIGHT TITLE, CONCEPT TITLE and seed-note
+    CONTENT/TAGS blocks) and answers them in the same format, and it emits
+    tool calls when tools are offered. With stream=True the content arrives
+    in small chunks spread over the sampled latency.
+    """
+
+    def __init__(self, latency="fixed:0", error_rate=0.0, tool_call_rate=0.5, seed=0):
+        self.latency = latency if isinstance(latency, LatencyModel) else LatencyModel(latency)
+        self.error_rate = error_rate
+        self.tool_call_rate = tool_call_rate
+        self.seed = seed
+        self.calls = 0
+
+    def _request_rng(self, kwargs):
+        key = json.dumps({
+            "seed": self.seed,
+            "model": kwargs.get("model"),
+            "messages": kwargs.get("messages", []),
+            "tools": [t.get("function", {}).get("name") for t in kwargs.get("tools") or []]
+        }, sort_keys=True, default=str)
+        return random.Random(hashlib.sha256(key.encode()).hexdigest())
+
+    def create(self, **kwargs):
+        self.calls += 1
+        rng = self._request_rng(kwargs)
+        latency = self.latency.sample(rng)
+        stream = kwargs.get("stream", False)
+        time.sleep(latency * FIRST_TOKEN_SHARE if stream else latency)
+
+        # Drawn per call rather than from the request's rng, so a retry of the same request can succeed
+        if self.error_rate and random.Random(f"{self.seed}:{self.calls}").random() < self.error_rate:
+            raise FakeAPIError("Simulated rate limit", status_code=429)
+
+        messages = kwargs.get("messages", [])
+        prompt = _message_text(messages[-1]) if messages else ""
+        topic = _prompt_topic(messages, rng)
+
+        tool_calls = None
+        content = None
+        last_role = _message_role(messages[-1]) if messages else "user"
+        tools = kwargs.get("tools") or []
+        if tools and kwargs.get("tool_choice", "auto") != "none" and last_role == "user" \
+                and rng.random() < self.tool_call_rate:
+            tool_calls = [_fake_tool_call(rng, tools, topic)]
+        elif "INSIGHT TITLE:" in prompt:
+            content = _fake_blocks("INSIGHT TITLE", rng, topic, rng.randint(3, 5))
+        elif "CONCEPT TITLE:" in prompt:
+            content = _fake_blocks("CONCEPT TITLE", rng, topic, rng.randint(2, 4))
+        elif "CONTENT:" in prompt and "TAGS:" in prompt:
+            content = f"CONTENT:\n{_fake_paragraphs(rng, topic, 2)}\n\nTAGS: {', '.join(_fake_tags(rng, topic))}"
+        else:
+            content = _fake_paragraphs(rng, topic, rng.randint(1, 3))
+
+        prompt_tokens = sum(len(_message_text(m)) for m in messages) // 4
+        completion_tokens = len(content or "") // 4 + (20 if tool_calls else 0)
+        usage = _Obj(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens
+        )
+        completion_id = f"fakecmpl-{rng.getrandbits(48):012x}"
+        if stream:
+            include_usage = (kwargs.get("stream_options") or {}).get("include_usage", False)
+            return self._stream(completion_id, kwargs.get("model"), content, tool_calls,
+                                usage if include_usage else None, latency * (1 - FIRST_TOKEN_SHARE))
+        return _Obj(
+            id=completion_id,
+            model=kwargs.get("model"),
+            choices=[_Obj(
+                index=0,
+                finish_reason="tool_calls" if tool_calls else "stop",
+                message=_Obj(role="assistant", content=content, tool_calls=tool_calls)
+            )],
+            usage=usage
+        )
+
+    def _stream(self, completion_id, model, content, tool_calls, usage, duration):
+        """Yield a response as chat.completion.chunk objects spread over `duration` seconds"""
+        pieces = [content[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(content or ""), STREAM_CHUNK_CHARS)]
+        delay = duration / len(pieces) if pieces else 0.0
+
+        def chunk(delta, finish_reason=None):
+            return _Obj(id=completion_id, model=model, usage=None,
+                        choices=[_Obj(index=0, delta=delta, finish_reason=finish_reason)])
+
+        for piece in pieces:
+            time.sleep(delay)
+            yield chunk(_Obj(role="assistant", content=piece, tool_calls=None))
+        if tool_calls:
+            yield chunk(_Obj(role="assistant", content=None, tool_calls=tool_calls))
+        yield chunk(_Obj(role=None, content=None, tool_calls=None), "tool_calls" if tool_calls else "stop")
+        if usage is not None:
+            yield _Obj(id=completion_id, model=model, choices=[], usage=usage)
+
+
+class FakeLLMClient:
+    """In-process fake exposing the `client.chat.completions.create` surface"""
+
+    def __init__(self, **options):
+        self.chat = _Obj(completions=FakeCompletions(**options))
+
+
+def _message_role(message):
+    return message.get("role") if isinstance(message, dict) else getattr(message, "role", None)
+
+
+def _message_text(message):
+    content = message.get("content") if isinstance(message, dict) else getattr(message, "content", None)
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+def _prompt_topic(messages, rng):
+    """Pick a short topic phrase from the words of the latest user message"""
+    text = ""
+    for message in reversed(messages):
+        if _message_role(message) == "user":
+            text = _message_text(message)
+            break
+    words = [w for w in re.findall(r"[A-Za-z][A-Za-z\-]{3,}", text) if w.lower() not in PROMPT_STOP_WORDS]
+    if not words:
+        return "knowledge systems"
+    # Prefer distinct words from the start of the prompt, where the subject usually is
+    distinct = list(dict.fromkeys(w.lower() for w in words))[:12]
+    return " ".join(rng.sample(distinct, min(2, len(distinct))))
+
+
+def _fake_title(rng, topic):
+    return f"{rng.choice(FAKE_ADJECTIVES)} {topic.title()} {rng.choice(FAKE_NOUNS)}"
+
+
+def _fake_tags(rng, topic):
+    tags = [topic.lower()] + [n.lower() for n in rng.sample(FAKE_NOUNS, 2)]
+    return tags[:rng.randint(2, 3)]
+
+
+def _fake_paragraphs(rng, topic, count):
+    paragraphs = []
+    for _ in range(count):
+        sentences = rng.sample(FAKE_SENTENCES, rng.randint(2, 4))
+        paragraphs.append(" ".join(s.format(topic=topic) for s in sentences))
+    return "\n\n".join(paragraphs)
+
+
+def _fake_blocks(label, rng, topic, count):
+    """Produce `count` blocks in the garden's TITLE/CONTENT/TAGS/--- format"""
+    blocks = []
+    for _ in range(count):
+        blocks.append(
+            f"{label}: {_fake_title(rng, topic)}\n\n"
+            f"CONTENT:\n{_fake_paragraphs(rng, topic, rng.randint(1, 2))}\n\n"
+            f"TAGS: {', '.join(_fake_tags(rng, topic))}\n\n---"
+        )
+    return "\n\n".join(blocks)
+
+
+def _fake_tool_call(rng, tools, topic):
+    """Build a schema-correct call to one of the offered tools"""
+    names = [t["function"]["name"] for t in tools]
+    name = "search_notes" if "search_notes" in names and rng.random() < 0.5 else rng.choice(names)
+    if name == "add_note":
+        arguments = {"title": _fake_title(rng, topic), "content": _fake_paragraphs(rng, topic, 1),
+                     "tags": _fake_tags(rng, topic), "related_notes": []}
+    elif name == "search_notes":
+        arguments = {"query": topic, "limit": 5}
+    elif name == "expand_knowledge":
+        arguments = {"note_title": topic.title(),
+                     "expansion_type": rng.choice(["elaborate", "contrast", "question", "application", "connection"]),
+                     "depth": 1}
+    elif name == "expand_many":
+        arguments = {"expansions": [{"note_title": topic.title(), "expansion_type": t}
+                                    for t in rng.sample(["elaborate", "contrast", "question", "application", "connection"], 2)],
+                     "depth": 1}
+    elif name == "extract_insights":
+        arguments = {"text": _fake_paragraphs(rng, topic, 2), "tags": _fake_tags(rng, topic)}
+    elif name == "create_exploration_path":
+        arguments = {"topic": topic.title(),
+                     "subtopics": [_fake_title(rng, topic) for _ in range(3)],
+                     "description": f"Exploration path for {topic}"}
+    else:
+        # Unknown tool: fill in the required string parameters
+        required = tools[names.index(name)]["function"].get("parameters", {}).get("required", [])
+        arguments = {param: topic for param in required}
+
+    return _Obj(
+        id=f"call_{rng.getrandbits(48):012x}",
+        type="function",
+        function=_Obj(name=name, arguments=json.dumps(arguments))
+    )
+
+
+def _create_openai_client(api_key=None, **options):
+    import openai
+    return openai.OpenAI(api_key=api_key, **options)
+
+
+def _create_fake_client(api_key=None, **options):
+    options.setdefault("latency", os.environ.get("FAKE_LLM_LATENCY", "fixed:0"))
+    options.setdefault("error_rate", float(os.environ.get("FAKE_LLM_ERROR_RATE", 0)))
+    return FakeLLMClient(**options)
+
+
+# Registered backends: name -> factory(api_key, **options) returning a client
+BACKENDS = {
+    "openai": _create_openai_client,
+    "fake": _create_fake_client
+}
+
+
+def requires_api_key(backend):
+    """Whether a backend needs an OpenAI API key"""
+    return backend == "openai"
+
+
+def create_client(backend=None, api_key=None, **options):
+    """Create a chat completion client for the named backend"""
+    backend = backend or DEFAULT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend '{backend}'. Available backends: {', '.join(BACKENDS)}")
+    return BACKENDS[backend](api_key=api_key, **options)
@@ -0,0 +1,318 @@
+import os
+import time
+import random
+import threading
+from collections import deque
+
+# Provider limits can be tuned per deployment without code changes
+DEFAULT_REQUESTS_PER_MINUTE = int(os.environ.get("OPENAI_REQUESTS_PER_MINUTE", 500))
+DEFAULT_TOKENS_PER_MINUTE = int(os.environ.get("OPENAI_TOKENS_PER_MINUTE", 150000))
+
+# HTTP status codes worth retrying
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+# Completion budget assumed when a call does not set max_tokens
+DEFAULT_COMPLETION_TOKENS = 1000
+
+
+class TokenBucket:
+    """Token bucket that refills continuously at `rate_per_minute`"""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount=1):
+        """Block until `amount` tokens are available, then take them"""
+        amount = min(amount, self.capacity)
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def debit(self, amount):
+        """Take tokens without waiting (the balance may go negative)"""
+        with self.lock:
+            self._refill()
+            self.tokens -= amount
+
+
+class AdaptiveConcurrencyLimiter:
+    """Concurrency limit that adapts with additive-increase/multiplicative-decrease
+
+    Every successful call raises the limit by 1/limit (about +1 per window of
+    calls); a throttled call halves it, at most once per cooldown period so a
+    burst of simultaneous 429s only counts as one signal.
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=32, decrease_factor=0.5, cooldown=2.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.last_decrease = 0.0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+
+    def release(self):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def on_success(self):
+        with self.condition:
+            self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            self.condition.notify_all()
+
+    def on_throttle(self):
+        with self.condition:
+            now = time.monotonic()
+            if now - self.last_decrease >= self.cooldown:
+                self.limit = max(self.minimum, self.limit * self.decrease_factor)
+                self.last_decrease = now
+
+
+class ModelMetrics:
+    """Latency, error and token counters for one model"""
+
+    def __init__(self, window=1000):
+        self.requests = 0
+        self.successes = 0
+        self.retries = 0
+        self.errors = {}
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latencies = deque(maxlen=window)
+
+    def snapshot(self):
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 4)
+
+        return {
+            "requests": self.requests,
+            "successes": self.successes,
+            "retries": self.retries,
+            "errors": dict(self.errors),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "latency_avg": round(sum(latencies) / len(latencies), 4) if latencies else None,
+            "latency_p50": percentile(0.50),
+            "latency_p95": percentile(0.95),
+            "latency_max": round(latencies[-1], 4) if latencies else None
+        }
+
+
+def estimate_request_tokens(messages, max_tokens=None):
+    """Roughly estimate the tokens a chat completion request will consume"""
+    chars = 0
+    for message in messages:
+        content = message.get("content") if isinstance(message, dict) else getattr(message, "content", None)
+        if isinstance(content, str):
+            chars += len(content)
+        elif isinstance(content, list):
+            for part in content:
+                if isinstance(part, dict) and part.get("type") == "text":
+                    chars += len(part.get("text", ""))
+                else:
+                    chars += 340  # Images are billed as roughly 85 tokens at low detail
+    return chars // 4 + (max_tokens or DEFAULT_COMPLETION_TOKENS)
+
+
+def is_retryable(error):
+    """Check whether an API error is transient and worth retrying"""
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES
+    # Connection errors and timeouts carry no status code
+    return type(error).__name__ in {"APIConnectionError", "APITimeoutError", "Timeout", "ConnectionError"}
+
+
+def retry_after_seconds(error):
+    """Read a Retry-After hint from an API error, if the provider sent one"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class LLMGateway:
+    """Single entry point for chat completion calls
+
+    Applies request and token rate limits, retries transient failures with
+    jittered exponential backoff, adapts concurrency to provider throttling
+    and keeps per-model latency and error metrics.
+    """
+
+    def __init__(self, client, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE,
+                 tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE, max_retries=6,
+                 base_delay=1.0, max_delay=60.0, initial_concurrency=4, max_concurrency=32):
+        self.client = client
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.concurrency = AdaptiveConcurrencyLimiter(initial=initial_concurrency, maximum=max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.metrics = {}
+        self.metrics_lock = threading.Lock()
+
+    def _model_metrics(self, model):
+        with self.metrics_lock:
+            if model not in self.metrics:
+                self.metrics[model] = ModelMetrics()
+            return self.metrics[model]
+
+    def _backoff_delay(self, attempt, error):
+        """Full-jitter exponential backoff, never shorter than the provider's Retry-After"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        hint = retry_after_seconds(error)
+        if hint is not None:
+            delay = max(delay, min(hint, self.max_delay))
+        return delay
+
+    def _create(self, model, metrics, estimated_tokens, kwargs):
+        """Call the client within the rate limits, retrying transient errors
+        
+        Returns with a concurrency slot held; the caller must release it.
+        """
+        attempt = 0
+        while True:
+            self.request_bucket.acquire()
+            self.token_bucket.acquire(estimated_tokens)
+            self.concurrency.acquire()
+            start = time.monotonic()
+            try:
+                return self.client.chat.completions.create(**kwargs), start
+            except Exception as e:
+                self.concurrency.release()
+                self._record_error(metrics, e)
+
+                if getattr(e, "status_code", None) == 429:
+                    self.concurrency.on_throttle()
+
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    raise
+
+                delay = self._backoff_delay(attempt, e)
+                with self.metrics_lock:
+                    metrics.retries += 1
+                print(f"LLM call to {model} failed ({type(e).__name__}), retrying in {delay:.1f}s "
+                      f"(attempt {attempt + 1}/{self.max_retries})")
+                time.sleep(delay)
+                attempt += 1
+
+    def _record_error(self, metrics, error):
+        with self.metrics_lock:
+            metrics.requests += 1
+            metrics.errors[type(error).__name__] = metrics.errors.get(type(error).__name__, 0) + 1
+
+    def _record_success(self, metrics, latency, usage, estimated_tokens):
+        with self.metrics_lock:
+            metrics.requests += 1
+            metrics.successes += 1
+            metrics.latencies.append(latency)
+            if usage is not None:
+                metrics.prompt_tokens += getattr(usage, "prompt_tokens", 0) or 0
+                metrics.completion_tokens += getattr(usage, "completion_tokens", 0) or 0
+
+        # Charge the token bucket for any usage beyond the up-front estimate
+        if usage is not None and getattr(usage, "total_tokens", None):
+            overage = usage.total_tokens - estimated_tokens
+            if overage > 0:
+                self.token_bucket.debit(overage)
+
+    def chat_completion(self, **kwargs):
+        """Create a chat completion, accepting the same arguments as the OpenAI client"""
+        model = kwargs.get("model", "unknown")
+        metrics = self._model_metrics(model)
+        estimated_tokens = estimate_request_tokens(kwargs.get("messages", []), kwargs.get("max_tokens"))
+
+        response, start = self._create(model, metrics, estimated_tokens, kwargs)
+        latency = time.monotonic() - start
+        self.concurrency.release()
+        self.concurrency.on_success()
+
+        self._record_success(metrics, latency, getattr(response, "usage", None), estimated_tokens)
+        return response
+
+    def stream_chat_completion(self, **kwargs):
+        """Stream a chat completion, yielding text deltas as they arrive
+
+        Failures before the first chunk are retried like chat_completion; a
+        failure mid-stream is raised, since part of the output was consumed.
+        The concurrency slot is held until the stream is exhausted or closed.
+        """
+        model = kwargs.get("model", "unknown")
+        metrics = self._model_metrics(model)
+        estimated_tokens = estimate_request_tokens(kwargs.get("messages", []), kwargs.get("max_tokens"))
+        kwargs = dict(kwargs, stream=True, stream_options={"include_usage": True})
+
+        stream, start = self._create(model, metrics, estimated_tokens, kwargs)
+        usage = None
+        try:
+            for chunk in stream:
+                if getattr(chunk, "usage", None) is not None:
+                    usage = chunk.usage
+                for choice in chunk.choices:
+                    if choice.delta.content:
+                        yield choice.delta.content
+        except Exception as e:
+            self._record_error(metrics, e)
+            raise
+        finally:
+            self.concurrency.release()
+
+        self.concurrency.on_success()
+        self._record_success(metrics, time.monotonic() - start, usage, estimated_tokens)
+
+    def get_metrics(self):
+        """Return per-model metrics and the current limiter state"""
+        with self.metrics_lock:
+            models = {model: metrics.snapshot() for model, metrics in self.metrics.items()}
+        return {
+            "models": models,
+            "concurrency_limit": round(self.concurrency.limit, 2),
+            "in_flight": self.concurrency.in_flight
+        }
+
+
+# Gateways are shared per client so that every caller draws from the same limits
+_gateways = {}
+_gateways_lock = threading.Lock()
+
+
+def get_gateway(client, **settings):
+    """Return the shared gateway for a client, creating it on first use"""
+    with _gateways_lock:
+        gateway = _gateways.get(id(client))
+        if gateway is None or gateway.client is not client:
+            gateway = LLMGateway(client, **settings)
+            _gateways[id(client)] = gateway
+        return gateway
@@ -0,0 +1,121 @@
+import re
+import zlib
+import numpy as np
+
+# Policies for handling a near-duplicate note
+DUPLICATE_POLICIES = ("allow", "link", "merge", "reject")
+
+# Mersenne prime used by the universal hash family
+_PRIME = np.uint64((1 << 61) - 1)
+_MASK = np.uint64((1 << 32) - 1)
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def normalize_title(title):
+    """Reduce a title to its lowercase words so trivial variants compare equal"""
+    return " ".join(WORD_PATTERN.findall(title.lower()))
+
+
+def shingles(text, size=3):
+    """Word n-gram shingles of a text (the distinct words themselves for very short texts)"""
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < size:
+        return set(words)
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class MinHashLSH:
+    """MinHash signatures with LSH banding for near-duplicate lookup
+
+    Signatures have `num_perm` 32-bit minimums split into `bands` bands; two
+    documents become candidates when any band matches exactly, and candidates
+    are confirmed by the Jaccard similarity estimated from their signatures.
+    A lookup hashes one document and probes `bands` buckets, so it does not
+    depend on the size of the garden.
+    """
+
+    def __init__(self, num_perm=64, bands=16, threshold=0.8, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.buckets = [{} for _ in range(bands)]
+        self.signatures = {}
+        self.titles = {}  # normalized title -> key
+        self.key_titles = {}  # key -> normalized title
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def signature(self, text):
+        """Compute the MinHash signature of a text"""
+        hashes = np.fromiter((zlib.crc32(s.encode()) for s in shingles(text)), dtype=np.uint64)
+        if not len(hashes):
+            return np.full(self.num_perm, _MASK, dtype=np.uint64)
+        permuted = (np.outer(hashes, self.a) + self.b) % _PRIME & _MASK
+        return permuted.min(axis=0)
+
+    def _band_keys(self, signature):
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def add(self, key, text, title=None):
+        """Index a document under `key`, replacing any previous version"""
+        self.remove(key)
+        signature = self.signature(text)
+        self.signatures[key] = signature
+        for band, band_key in zip(self.buckets, self._band_keys(signature)):
+            band.setdefault(band_key, set()).add(key)
+        if title:
+            self.titles[normalize_title(title)] = key
+            self.key_titles[key] = normalize_title(title)
+
+    def remove(self, key):
+        signature = self.signatures.pop(key, None)
+        if signature is None:
+            return
+        for band, band_key in zip(self.buckets, self._band_keys(signature)):
+            members = band.get(band_key)
+            if members:
+                members.discard(key)
+                if not members:
+                    del band[band_key]
+        normalized = self.key_titles.pop(key, None)
+        if normalized is not None and self.titles.get(normalized) == key:
+            del self.titles[normalized]
+
+    def query(self, text, title=None, exclude=None):
+        """Find indexed documents similar to a text
+
+        Returns:
+            A list of (key, similarity) pairs at or above the threshold, most similar first.
+            A document whose normalized title matches exactly is reported with similarity 1.0.
+        """
+        matches = {}
+        if title:
+            key = self.titles.get(normalize_title(title))
+            if key is not None and key != exclude:
+                matches[key] = 1.0
+
+        if not shingles(text):
+            return list(matches.items())
+
+        signature = self.signature(text)
+        candidates = set()
+        for band, band_key in zip(self.buckets, self._band_keys(signature)):
+            candidates.update(band.get(band_key, ()))
+        candidates.discard(exclude)
+
+        for key in candidates:
+            if key in matches:
+                continue
+            similarity = float(np.mean(self.signatures[key] == signature))
+            if similarity >= self.threshold:
+                matches[key] = similarity
+
+        return sorted(matches.items(), key=lambda item: item[1], reverse=True)
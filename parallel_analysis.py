@@ -0,0 +1,107 @@
+import os
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from csr_graph import CSRGraph
+
+try:
+    from scipy import sparse
+except ImportError:  # Only CSR graphs are shared, and they need scipy anyway
+    sparse = None
+
+# Graphs attached by this worker process: shared memory name -> (graph, shared memory blocks)
+_attached = {}
+
+
+class SharedGraph:
+    """The adjacency arrays of a CSRGraph copied once into shared memory
+
+    Worker processes attach to the blocks by name and run breadth-first
+    kernels on them directly, so the graph is not pickled for every task.
+    """
+
+    def __init__(self, graph):
+        self.blocks = []
+        arrays = []
+        for array in (graph.indptr, graph.indices):
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+            self.blocks.append(block)
+            arrays.append((block.name, array.shape, array.dtype.str))
+        self.handle = (graph.number_of_nodes(), tuple(arrays))
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+
+def _open_block(name):
+    """Attach to a shared memory block without taking ownership of it (the creating process unlinks it)"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        block = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(block._name, "shared_memory")
+        return block
+
+
+def attach(handle):
+    """The CSRGraph behind a SharedGraph handle, in a worker process (node IDs stand in for names)"""
+    n, arrays = handle
+    key = arrays[0][0]
+    if key not in _attached:
+        blocks = [_open_block(name) for name, _, _ in arrays]
+        indptr, indices = (np.ndarray(shape, dtype=dtype, buffer=block.buf)
+                           for block, (_, shape, dtype) in zip(blocks, arrays))
+        # Edge types and node attributes are not shared; the kernels only need the structure
+        adjacency = sparse.csr_matrix((np.full(len(indices), 2, dtype=np.int8), indices, indptr), shape=(n, n))
+        graph = CSRGraph(range(n), adjacency, np.full(n, -1, dtype=np.int8), np.full(n, -1, dtype=np.int32))
+        _attached[key] = (graph, blocks)
+    return _attached[key][0]
+
+
+def _run_block(handle, method, sources):
+    return getattr(attach(handle), method)(sources)
+
+
+class AnalysisPool:
+    """Process pool for graph analytics
+
+    Independent metrics are submitted as whole tasks, and source-partitioned
+    breadth-first work (betweenness, closeness, path lengths) is split into
+    blocks of sources that run in the workers against shared copies of the
+    graph's CSR arrays.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        self.shared = {}  # id(graph) -> (graph, SharedGraph)
+
+    def submit(self, fn, *args, **kwargs):
+        return self.executor.submit(fn, *args, **kwargs)
+
+    def map_blocks(self, graph, method, blocks):
+        """Run a CSRGraph block method on each block of sources in the workers, in order"""
+        if id(graph) not in self.shared:
+            # The graph is kept referenced so its id is not reused while shared
+            self.shared[id(graph)] = (graph, SharedGraph(graph))
+        handle = self.shared[id(graph)][1].handle
+        return list(self.executor.map(_run_block, repeat(handle), repeat(method), blocks))
+
+    def close(self):
+        self.executor.shutdown()
+        for _, shared in self.shared.values():
+            shared.close()
+        self.shared = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,93 @@
+from collections import deque
+
+
+class AhoCorasick:
+    """Multi-pattern substring matcher
+
+    Finds which of many patterns occur in a text in a single pass over the
+    text, whatever the number of patterns. Each pattern carries a value, and
+    find() returns the values of all patterns found.
+    """
+
+    def __init__(self, patterns):
+        """
+        Args:
+            patterns: Iterable of (pattern, value) pairs; a pattern may carry several values
+        """
+        self.goto = [{}]
+        self.outputs = [set()]
+        self.always = set()  # Values of empty patterns, which occur in every text
+        for pattern, value in patterns:
+            if not pattern:
+                self.always.add(value)
+                continue
+            state = 0
+            for char in pattern:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto.append({})
+                    self.outputs.append(set())
+                    self.goto[state][char] = next_state
+                state = next_state
+            self.outputs[state].add(value)
+        self._link()
+
+    def _link(self):
+        """Compute failure links breadth-first and merge outputs along them"""
+        self.fail = [0] * len(self.goto)
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[next_state] = target if target != next_state else 0
+                self.outputs[next_state] |= self.outputs[self.fail[next_state]]
+
+    def find(self, text):
+        """Values of every pattern occurring in text"""
+        found = set(self.always)
+        goto, fail, outputs = self.goto, self.fail, self.outputs
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if outputs[state]:
+                found |= outputs[state]
+        return found
+
+
+class PathMatcher:
+    """Finds the exploration paths a note belongs to
+
+    A note belongs to a path if the path's topic or one of its subtopics
+    occurs in the note's title (case-insensitively), or if the lowercased
+    topic is one of the note's tags. Topics and subtopics are compiled into
+    one Aho-Corasick automaton and topics are also indexed by tag, so matching
+    a note costs one pass over its title plus a lookup per tag.
+    """
+
+    def __init__(self, paths):
+        """
+        Args:
+            paths: Dict mapping path topics to their lists of subtopics
+        """
+        patterns = []
+        self.topics_by_tag = {}
+        for topic, subtopics in paths.items():
+            patterns.append((topic.lower(), topic))
+            patterns.extend((subtopic.lower(), topic) for subtopic in subtopics)
+            self.topics_by_tag.setdefault(topic.lower(), set()).add(topic)
+        self.automaton = AhoCorasick(patterns)
+
+    def match(self, title, tags=()):
+        """Topics of the paths a note belongs to"""
+        topics = self.automaton.find(title.lower())
+        for tag in tags:
+            topics |= self.topics_by_tag.get(tag, set())
+        return topics
@@ -0,0 +1,105 @@
+import re
+import time
+import threading
+from collections import OrderedDict
+
+
+def normalize_query(query):
+    """Case- and whitespace-insensitive form of a query, used in cache keys"""
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+
+class QueryCache:
+    """LRU cache of query retrieval results and assembled prompts
+
+    Entries are keyed by (normalized query, query type, max context nodes,
+    garden version) and remember the notes they were built from. The cache
+    listens to the garden's note changes and drops exactly the entries whose
+    notes were touched; entries with fewer notes than requested are dropped on
+    any change, since a new note could fill them. Other notes added later that
+    would now rank for a cached query are picked up once the entry expires
+    after `max_age` seconds.
+    """
+
+    def __init__(self, garden, max_entries=256, max_age=600):
+        self.garden = garden
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (stored at, titles, value)
+        self.by_title = {}  # title -> keys of the entries built from it
+        self.changes = 0    # Note changes seen so far
+        self.touched = {}   # title -> value of self.changes when it last changed
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        garden.change_listeners.append(self.note_changed)
+
+    def make_key(self, query, query_type, max_context_nodes):
+        return normalize_query(query), query_type, max_context_nodes, self.garden.version
+
+    def mark(self):
+        """Token to pass to put(), so results computed across a note change are not stored"""
+        with self.lock:
+            return self.changes
+
+    def get(self, key):
+        """Return a cached value, or None"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.max_age:
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key, titles, value, mark):
+        """Store a value built from the given notes, unless one of them changed since mark"""
+        with self.lock:
+            if any(self.touched.get(title, -1) >= mark for title in titles):
+                return
+            if len(titles) < key[2]:
+                if self.changes > mark:
+                    return
+                titles = list(titles) + [None]  # Depends on every note
+            if key in self.entries:
+                self._drop(key)
+            self.entries[key] = (time.monotonic(), tuple(titles), value)
+            for title in titles:
+                self.by_title.setdefault(title, set()).add(key)
+            while len(self.entries) > self.max_entries:
+                self._drop(next(iter(self.entries)))
+
+    def note_changed(self, title):
+        """Drop the entries built from a note that was added or modified"""
+        with self.lock:
+            self.touched[title] = self.changes
+            self.changes += 1
+            keys = self.by_title.pop(title, set()) | self.by_title.pop(None, set())
+            for key in keys:
+                if key in self.entries:
+                    self._drop(key)
+                    self.invalidations += 1
+
+    def _drop(self, key):
+        _, titles, _ = self.entries.pop(key)
+        for title in titles:
+            keys = self.by_title.get(title)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.by_title[title]
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "garden_version": self.garden.version
+            }
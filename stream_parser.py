@@ -0,0 +1,70 @@
+import re
+
+
+def parse_block(label, block):
+    """Parse one "<LABEL>: title / CONTENT: / TAGS:" block
+
+    Returns:
+        A (title, content, tags) tuple, or None if the block is incomplete
+    """
+    match = re.search(rf"{label}: (.*?)\s*\n+CONTENT:\s*(.*?)\s*\n+TAGS: (.*?)\s*$", block, re.DOTALL)
+    if not match:
+        return None
+    title, content, tags_str = match.groups()
+    tags = [tag.strip() for tag in tags_str.split(",") if tag.strip()]
+    return title.strip(), content.strip(), tags
+
+
+class BlockStreamParser:
+    """Incremental parser for the garden's INSIGHT TITLE / CONCEPT TITLE response format
+
+    Text deltas are fed in as the model streams them. A block is complete
+    once its "---" delimiter line arrives, or once the next block's label
+    starts, and is returned from feed() right away instead of after the
+    whole response.
+    """
+
+    def __init__(self, label):
+        self.label = label
+        self.buffer = ""
+        self.boundary = re.compile(rf"\n[ \t]*---[ \t]*\n|\n(?=[ \t]*{re.escape(label)}:)")
+
+    def feed(self, delta):
+        """Add streamed text and return the blocks it completed"""
+        self.buffer += delta
+        blocks = []
+        while True:
+            match = self.boundary.search(self.buffer)
+            if not match:
+                break
+            block, self.buffer = self.buffer[:match.start()], self.buffer[match.end():]
+            parsed = parse_block(self.label, block)
+            if parsed:
+                blocks.append(parsed)
+        return blocks
+
+    def close(self):
+        """Return the final block, which may end without a delimiter"""
+        block, self.buffer = re.sub(r"\n[ \t]*---[ \t]*$", "", self.buffer.rstrip()), ""
+        parsed = parse_block(self.label, block)
+        return [parsed] if parsed else []
+
+
+def parse_stream(deltas, label, on_block=None):
+    """Parse a stream of text deltas, calling on_block for each block as soon as it completes
+
+    Returns:
+        All parsed blocks, in order
+    """
+    parser = BlockStreamParser(label)
+    blocks = []
+    for delta in deltas:
+        for block in parser.feed(delta):
+            blocks.append(block)
+            if on_block:
+                on_block(block)
+    for block in parser.close():
+        blocks.append(block)
+        if on_block:
+            on_block(block)
+    return blocks
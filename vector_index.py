@@ -0,0 +1,459 @@
+import os
+import re
+import json
+import hashlib
+import itertools
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import hnswlib
+except ImportError:  # Optional: exact search is used without it
+    hnswlib = None
+
+try:
+    import fcntl
+except ImportError:  # Not on Windows: only one process may then write an index
+    fcntl = None
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+
+# Vectors encoded per model call
+ENCODE_BATCH_SIZE = 64
+
+# Queued notes encoded and written per step of a flush, so searches see a backfill's progress
+FLUSH_BATCH_SIZE = 1024
+
+# Rows scored per block in exact search, bounding the float32 working set
+SEARCH_BLOCK_ROWS = 65536
+
+# Garden size from which searches use an approximate index (HNSW with hnswlib, IVF otherwise)
+ANN_MIN_VECTORS = 20000
+
+# IVF lists scanned per query, and k-means iterations when (re)training the lists
+IVF_PROBES = 8
+IVF_TRAIN_ITERATIONS = 10
+
+_embedders = {}
+_embedders_lock = threading.Lock()
+
+
+def get_embedder(model_name=DEFAULT_MODEL):
+    """Return a function encoding a list of texts into unit vectors, or None if sentence-transformers is missing
+
+    The model is loaded once per process and shared by every index using it.
+    A model that fails to load (for example offline, before it was downloaded)
+    is remembered as missing, so callers fall back to lexical retrieval.
+    """
+    with _embedders_lock:
+        if model_name not in _embedders:
+            try:
+                from sentence_transformers import SentenceTransformer
+            except ImportError:
+                print("sentence-transformers is not installed; semantic retrieval is disabled")
+                _embedders[model_name] = None
+            else:
+                try:
+                    model = SentenceTransformer(model_name)
+                except Exception as e:
+                    print(f"Could not load embedding model '{model_name}' ({e}); semantic retrieval is disabled")
+                    _embedders[model_name] = None
+                else:
+                    _embedders[model_name] = lambda texts: model.encode(
+                        texts, batch_size=ENCODE_BATCH_SIZE, normalize_embeddings=True, show_progress_bar=False)
+        return _embedders[model_name]
+
+
+def content_hash(text):
+    """Fingerprint of an encoded text, to tell whether a note changed since it was encoded"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class IVFIndex:
+    """Inverted-file index: vectors are bucketed by their nearest k-means centroid
+
+    A query scans only the buckets of its `probes` nearest centroids, so it
+    converts and scores a small fraction of the float16 matrix. The centroids
+    and the bucket of every row are saved next to the matrix.
+    """
+
+    def __init__(self, path, probes=IVF_PROBES):
+        self.path = Path(path)
+        self.probes = probes
+        self.centroids = None
+        self.assignments = np.empty(0, dtype=np.int32)
+        self.trained_count = 0
+        self.lists = None  # Rows per bucket, rebuilt lazily after updates
+        try:
+            with np.load(self.path) as data:
+                self.centroids = data["centroids"]
+                self.assignments = data["assignments"]
+                self.trained_count = int(data["trained_count"])
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def save(self):
+        tmp_path = self.path.with_suffix(".tmp.npz")
+        np.savez(tmp_path, centroids=self.centroids, assignments=self.assignments,
+                 trained_count=self.trained_count)
+        tmp_path.replace(self.path)
+
+    def _assign(self, vectors):
+        return np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)
+
+    def train(self, matrix, count, seed=1):
+        """Fit spherical k-means on a sample of the first `count` rows and bucket every row"""
+        rng = np.random.default_rng(seed)
+        nlist = max(1, int(np.sqrt(count)))
+        sample_rows = np.sort(rng.choice(count, size=min(count, 64 * nlist), replace=False))
+        sample = np.asarray(matrix[sample_rows], dtype=np.float32)
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)]
+        for _ in range(IVF_TRAIN_ITERATIONS):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            empty = ~sums.any(axis=1)
+            sums[empty] = centroids[empty]
+            centroids = _normalize(sums)
+        self.centroids = centroids
+
+        self.assignments = np.empty(count, dtype=np.int32)
+        for start in range(0, count, SEARCH_BLOCK_ROWS):
+            end = min(start + SEARCH_BLOCK_ROWS, count)
+            self.assignments[start:end] = self._assign(np.asarray(matrix[start:end], dtype=np.float32))
+        self.trained_count = count
+        self.lists = None
+        self.save()
+
+    def update(self, rows, vectors, count):
+        """Bucket new or re-encoded rows"""
+        if len(self.assignments) < count:
+            self.assignments = np.concatenate(
+                [self.assignments, np.zeros(count - len(self.assignments), dtype=np.int32)])
+        self.assignments[rows] = self._assign(vectors)
+        self.lists = None
+        self.save()
+
+    def candidates(self, query):
+        """Rows in the buckets nearest to the query, in ascending order"""
+        if self.lists is None:
+            order = np.argsort(self.assignments, kind="stable")
+            bounds = np.searchsorted(self.assignments[order], np.arange(len(self.centroids) + 1))
+            self.lists = [order[bounds[i]:bounds[i + 1]] for i in range(len(self.centroids))]
+        probes = min(self.probes, len(self.centroids))
+        nearest = np.argpartition(-(self.centroids @ query), probes - 1)[:probes]
+        return np.sort(np.concatenate([self.lists[i] for i in nearest]))
+
+
+class VectorIndex:
+    """Persistent nearest-neighbour index over note embeddings
+
+    Unit vectors are stored as rows of a float16 memory-mapped matrix, so an
+    index over a large garden opens instantly and costs little memory. Notes
+    are queued as they are created and encoded in batches by flush, or by a
+    background thread when the index is opened with background=True, so a
+    search never waits for queued notes; a note whose text is unchanged since it was encoded is not
+    queued again, and a changed note overwrites its own row. The model is only
+    loaded once there is something to encode. Search is an exact blockwise dot product; large gardens use an
+    HNSW graph when hnswlib is installed, or an IVF index otherwise.
+
+    Each model has its own directory under index_dir. Several processes can
+    share an index: writes hold a lock file and first reload the rows other
+    processes added, and searches pick up those rows when the metadata changes.
+    """
+
+    def __init__(self, index_dir, model_name=DEFAULT_MODEL, embed=None, background=False):
+        """
+        Args:
+            embed: Function encoding a list of texts (defaults to the shared embedder of model_name)
+            background: Encode queued notes in a background thread as soon as they are queued
+        """
+        self.index_dir = Path(index_dir) / re.sub(r"[^A-Za-z0-9._-]+", "_", model_name)
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self.vectors_path = self.index_dir / "vectors.f16"
+        self.meta_path = self.index_dir / "meta.json"
+        self.ann_path = self.index_dir / "hnsw.bin"
+        self.ivf_path = self.index_dir / "ivf.npz"
+        self.lock_path = self.index_dir / "lock"
+        self.model_name = model_name
+        self._embed = embed
+        self.lock = threading.RLock()
+        self.flush_lock = threading.Lock()  # Held by the one flush encoding at a time
+        self.background = background
+        self.backfill = None  # Thread flushing queued notes, while it runs
+        self.pending = {}  # title -> text awaiting encoding
+        self.ann = None
+        self.ivf = None
+
+        self.titles = []
+        self.hashes = {}  # title -> content hash of the text its row was encoded from
+        self.rows = {}
+        self.dim = None
+        self.vectors = None
+        self.meta_stamp = None  # (mtime, size) of the metadata file last loaded
+        self._reload()
+
+    @property
+    def embed(self):
+        if self._embed is None:
+            self._embed = get_embedder(self.model_name)
+        return self._embed
+
+    @property
+    def available(self):
+        return self.embed is not None
+
+    def __len__(self):
+        return len(self.titles)
+
+    def __contains__(self, title):
+        return title in self.rows or title in self.pending
+
+    def _meta_stamp(self):
+        try:
+            stat = os.stat(self.meta_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _reload(self):
+        """Load the rows from disk if another process (or this one) saved the metadata since it was last loaded"""
+        stamp = self._meta_stamp()
+        if stamp is None or stamp == self.meta_stamp:
+            return
+        try:
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return
+        if meta.get("model") != self.model_name or not self.vectors_path.exists():
+            return
+        self.meta_stamp = stamp
+        if meta["titles"] == self.titles:
+            self.hashes = {title: key for title, key in zip(self.titles, meta.get("hashes", [])) if key}
+            return
+        self.titles = meta["titles"]
+        self.hashes = {title: key for title, key in zip(self.titles, meta.get("hashes", [])) if key}
+        self.rows = {title: row for row, title in enumerate(self.titles)}
+        self.dim = meta["dim"]
+        capacity = self.vectors_path.stat().st_size // (2 * self.dim)
+        self.vectors = np.memmap(self.vectors_path, dtype=np.float16, mode="r+", shape=(capacity, self.dim))
+        # The approximate indexes are reopened from disk and catch up with the new rows on next use
+        self.ann = None
+        self.ivf = None
+
+    @contextmanager
+    def _file_lock(self):
+        """Hold the index's lock file, serializing writers across processes"""
+        with open(self.lock_path, "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _save_meta(self):
+        tmp_path = self.meta_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"model": self.model_name, "dim": self.dim, "titles": self.titles,
+                       "hashes": [self.hashes.get(title) for title in self.titles]}, f)
+        tmp_path.replace(self.meta_path)
+        self.meta_stamp = self._meta_stamp()
+
+    def _ensure_capacity(self, rows):
+        """Grow the memory-mapped matrix (doubling) to hold at least `rows` vectors"""
+        capacity = 0 if self.vectors is None else self.vectors.shape[0]
+        if rows <= capacity:
+            return
+        new_capacity = max(1024, capacity * 2, rows)
+        if self.vectors is not None:
+            self.vectors.flush()
+            del self.vectors
+        with open(self.vectors_path, "ab") as f:
+            f.truncate(new_capacity * self.dim * 2)
+        self.vectors = np.memmap(self.vectors_path, dtype=np.float16, mode="r+", shape=(new_capacity, self.dim))
+
+    def enqueue(self, title, text):
+        """Queue a note for encoding, replacing any earlier version, unless its row already holds this text"""
+        with self.lock:
+            if title not in self.pending and self.hashes.get(title) == content_hash(text):
+                return
+            self.pending[title] = text
+            if self.background and self.backfill is None:
+                self.backfill = threading.Thread(target=self._backfill, daemon=True)
+                self.backfill.start()
+
+    def _backfill(self):
+        """Flush queued notes until none are left (background thread)"""
+        failed = False
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"Encoding queued notes failed: {e}")
+            failed = True
+        with self.lock:
+            self.backfill = None
+            # Notes queued after the flush found the queue empty
+            if self.pending and not failed:
+                self.backfill = threading.Thread(target=self._backfill, daemon=True)
+                self.backfill.start()
+
+    def flush(self):
+        """Encode queued notes in batches and write them to the index
+
+        Searches are only blocked while a batch is written, not while it is encoded.
+        """
+        with self.flush_lock:
+            while self.available:
+                with self.lock:
+                    titles = list(itertools.islice(self.pending, FLUSH_BATCH_SIZE))
+                    if not titles:
+                        return
+                    texts = [self.pending.pop(title) for title in titles]
+                try:
+                    vectors = _normalize(self.embed(texts))
+                except Exception:
+                    with self.lock:
+                        # Requeue, unless a newer version was queued meanwhile
+                        for title, text in zip(titles, texts):
+                            self.pending.setdefault(title, text)
+                    raise
+                with self.lock, self._file_lock():
+                    self._write(titles, texts, vectors)
+
+    def _write(self, titles, texts, vectors):
+        """Store encoded notes, holding the lock file"""
+        # Rows are assigned after the rows other processes added, never over them
+        self._reload()
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        new_titles = [title for title in titles if title not in self.rows]
+        self._ensure_capacity(len(self.titles) + len(new_titles))
+        for title in new_titles:
+            self.rows[title] = len(self.titles)
+            self.titles.append(title)
+        for title, text in zip(titles, texts):
+            self.hashes[title] = content_hash(text)
+        rows = np.array([self.rows[title] for title in titles])
+        self.vectors[rows] = vectors.astype(np.float16)
+        self.vectors.flush()
+        self._save_meta()
+
+        if self.ann is not None:
+            self.ann.resize_index(max(self.ann.get_max_elements(), len(self.titles)))
+            self.ann.add_items(vectors, rows)
+            self.ann.save_index(str(self.ann_path))
+        if self.ivf is not None:
+            self.ivf.update(rows, vectors, len(self.titles))
+
+    def vectors_of(self, titles):
+        """Stored unit vectors of notes, skipping notes not encoded yet
+
+        Returns:
+            The titles found and a float32 matrix with one row per title
+        """
+        with self.lock:
+            self._reload()
+            found = [title for title in titles if title in self.rows]
+            if not found:
+                return [], np.zeros((0, self.dim or 0), dtype=np.float32)
+            rows = np.fromiter((self.rows[title] for title in found), dtype=np.int64, count=len(found))
+            return found, np.asarray(self.vectors[rows], dtype=np.float32)
+
+    def _ann_index(self):
+        """Load or build the HNSW index once the garden is large enough"""
+        if hnswlib is None or len(self.titles) < ANN_MIN_VECTORS:
+            return None
+        if self.ann is None:
+            ann = hnswlib.Index(space="ip", dim=self.dim)
+            if self.ann_path.exists():
+                ann.load_index(str(self.ann_path), max_elements=len(self.titles))
+            if ann.get_current_count() != len(self.titles):
+                ann = hnswlib.Index(space="ip", dim=self.dim)
+                ann.init_index(max_elements=len(self.titles), ef_construction=200, M=16)
+                for start in range(0, len(self.titles), SEARCH_BLOCK_ROWS):
+                    end = min(start + SEARCH_BLOCK_ROWS, len(self.titles))
+                    ann.add_items(np.asarray(self.vectors[start:end], dtype=np.float32), np.arange(start, end))
+                ann.save_index(str(self.ann_path))
+            ann.set_ef(100)
+            self.ann = ann
+        return self.ann
+
+    def _ivf_index(self):
+        """Load or (re)train the IVF index once the garden is large enough"""
+        count = len(self.titles)
+        if hnswlib is not None or count < ANN_MIN_VECTORS:
+            return None
+        if self.ivf is None:
+            self.ivf = IVFIndex(self.ivf_path)
+        # Retrain when the lists were never trained or the garden has doubled since
+        if self.ivf.centroids is None or len(self.ivf.assignments) > count or count >= 2 * self.ivf.trained_count:
+            self.ivf.train(self.vectors, count)
+        elif len(self.ivf.assignments) < count:
+            # Rows added by another process since the lists were saved
+            missing = np.arange(len(self.ivf.assignments), count)
+            self.ivf.update(missing, np.asarray(self.vectors[missing], dtype=np.float32), count)
+        return self.ivf
+
+    def search_vector(self, vector, limit=5):
+        """Return the `limit` most similar (title, cosine similarity) pairs, best first"""
+        with self.lock:
+            self._reload()
+            count = len(self.titles)
+            if not count or limit <= 0:
+                return []
+            query = _normalize(vector).reshape(-1)
+            limit = min(limit, count)
+
+            ann = self._ann_index()
+            if ann is not None:
+                labels, distances = ann.knn_query(query, k=limit)
+                return [(self.titles[row], float(1 - distance)) for row, distance in zip(labels[0], distances[0])]
+
+            ivf = self._ivf_index()
+            if ivf is not None:
+                rows = ivf.candidates(query)
+                scores = np.asarray(self.vectors[rows], dtype=np.float32) @ query
+                top = np.argsort(-scores)[:limit] if len(scores) <= limit \
+                    else np.argpartition(-scores, limit - 1)[:limit]
+                top = top[np.argsort(-scores[top])]
+                return [(self.titles[rows[i]], float(scores[i])) for i in top]
+
+            best_rows = np.empty(0, dtype=np.int64)
+            best_scores = np.empty(0, dtype=np.float32)
+            for start in range(0, count, SEARCH_BLOCK_ROWS):
+                block = np.asarray(self.vectors[start:min(start + SEARCH_BLOCK_ROWS, count)], dtype=np.float32)
+                scores = block @ query
+                if len(scores) > limit:
+                    top = np.argpartition(-scores, limit - 1)[:limit]
+                else:
+                    top = np.arange(len(scores))
+                best_rows = np.concatenate([best_rows, top + start])
+                best_scores = np.concatenate([best_scores, scores[top]])
+            order = np.argsort(-best_scores)[:limit]
+            return [(self.titles[best_rows[i]], float(best_scores[i])) for i in order]
+
+    def search(self, text, limit=5):
+        """Encode a query and return its nearest notes, or [] if no embedding model is available
+
+        Notes still queued for encoding are not found until a flush has written them.
+        """
+        if not self.available:
+            return []
+        try:
+            vector = self.embed([text])[0]
+        except Exception as e:
+            print(f"Could not encode the query ({e}); skipping semantic retrieval")
+            return []
+        return self.search_vector(vector, limit)